@@ -2,10 +2,74 @@
 ParcelPending API Client.
 
 A Python wrapper for the ParcelPending website to get information about packages.
+
+The public names are imported from their modules on first access, so importing
+the package (e.g. to start the command line interface) doesn't load requests
+and BeautifulSoup until something that needs them is used.
 """
 
-from parcelpending.client import ParcelPendingClient
-from parcelpending.exceptions import AuthenticationError, ConnectionError, ParcelPendingError
+import importlib
+
+from parcelpending.exceptions import (
+    AuthenticationError,
+    CancelledError,
+    ConnectionError,
+    FilterError,
+    ParcelPendingError,
+    TimeoutError,
+)
 
 __version__ = "0.1.1"
-__all__ = ["ParcelPendingClient", "AuthenticationError", "ConnectionError", "ParcelPendingError"]
+__all__ = [
+    "ParcelPendingClient",
+    "ParcelStore",
+    "PageArchive",
+    "HistoryCheckpoint",
+    "HistoryRequest",
+    "ParcelFilter",
+    "compile_filter",
+    "ParcelChange",
+    "diff_parcels",
+    "CancelHandle",
+    "JobQueue",
+    "Worker",
+    "Transport",
+    "RequestsTransport",
+    "AuthenticationError",
+    "CancelledError",
+    "ConnectionError",
+    "FilterError",
+    "ParcelPendingError",
+    "TimeoutError",
+]
+
+# Module each lazily imported name is defined in
+_LAZY_IMPORTS = {
+    "PageArchive": "archive",
+    "HistoryRequest": "batch",
+    "HistoryCheckpoint": "checkpoint",
+    "ParcelPendingClient": "client",
+    "CancelHandle": "deadline",
+    "ParcelChange": "diff",
+    "diff_parcels": "diff",
+    "ParcelFilter": "filters",
+    "compile_filter": "filters",
+    "JobQueue": "jobs",
+    "Worker": "jobs",
+    "ParcelStore": "store",
+    "RequestsTransport": "transport",
+    "Transport": "transport",
+}
+
+
+def __getattr__(name):
+    module = _LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
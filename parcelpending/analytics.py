@@ -0,0 +1,268 @@
+"""
+Delivery volume and dwell-time analytics over parcel history.
+
+Parcel dictionaries are converted once into column arrays; every statistic is
+then a single pass over those columns. NumPy is used when it is installed,
+otherwise the same results are computed with plain Python lists.
+"""
+
+import math
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+
+from .utils import parse_timestamp
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised when numpy is not installed
+    np = None
+
+_EPOCH = datetime(1970, 1, 1)
+_SECONDS_PER_DAY = 86400
+_SECONDS_PER_HOUR = 3600
+
+
+def _to_seconds(value):
+    """Convert a parcel timestamp (str or datetime) into seconds since the epoch."""
+    value = parse_timestamp(value)
+    if value is None:
+        return math.nan
+    return (value.replace(tzinfo=None) - _EPOCH).total_seconds()
+
+
+def _to_date(day_number):
+    return date(1970, 1, 1) + timedelta(days=int(day_number))
+
+
+class ParcelColumns:
+    """
+    Column-oriented view of a parcel history.
+
+    Timestamps are stored as float seconds since the epoch (NaN when unknown),
+    text fields as arrays of strings ("" when unknown).
+    """
+
+    def __init__(self, delivered, picked_up, courier, size, status):
+        self.delivered = delivered
+        self.picked_up = picked_up
+        self.courier = courier
+        self.size = size
+        self.status = status
+
+    @classmethod
+    def from_parcels(cls, parcels, use_numpy=None):
+        """
+        Build columns from a list of parcel dictionaries.
+
+        Args:
+            parcels (list): Parcels as returned by the client or the local store
+            use_numpy (bool, optional): Force or disable NumPy arrays. Defaults to
+                using NumPy when it is installed.
+
+        Returns:
+            ParcelColumns: The column arrays
+        """
+        if use_numpy is None:
+            use_numpy = np is not None
+
+        delivered = [_to_seconds(p.get("delivery_date")) for p in parcels]
+        picked_up = [_to_seconds(p.get("pickup_date")) for p in parcels]
+        courier = [p.get("courier") or "" for p in parcels]
+        size = [p.get("size") or "" for p in parcels]
+        status = [p.get("status") or "" for p in parcels]
+
+        if use_numpy:
+            return cls(
+                np.array(delivered, dtype=np.float64),
+                np.array(picked_up, dtype=np.float64),
+                np.array(courier, dtype=object),
+                np.array(size, dtype=object),
+                np.array(status, dtype=object),
+            )
+        return cls(delivered, picked_up, courier, size, status)
+
+    @property
+    def is_numpy(self):
+        """bool: Whether the columns are NumPy arrays."""
+        return np is not None and isinstance(self.delivered, np.ndarray)
+
+    def __len__(self):
+        return len(self.delivered)
+
+
+def _columns(data):
+    """Accept either ParcelColumns or a list of parcels."""
+    if isinstance(data, ParcelColumns):
+        return data
+    return ParcelColumns.from_parcels(data)
+
+
+def _value_counts(values):
+    if np is not None and isinstance(values, np.ndarray):
+        keys, counts = np.unique(values.astype(str), return_counts=True)
+        return {str(key): int(count) for key, count in zip(keys, counts)}
+    return dict(Counter(values))
+
+
+def daily_counts(data):
+    """
+    Count delivered parcels per day.
+
+    Args:
+        data (ParcelColumns or list): Parcel columns or parcel dictionaries
+
+    Returns:
+        dict: Mapping of date to number of parcels delivered that day
+    """
+    columns = _columns(data)
+    if columns.is_numpy:
+        delivered = columns.delivered[~np.isnan(columns.delivered)]
+        days, counts = np.unique(delivered // _SECONDS_PER_DAY, return_counts=True)
+        return {_to_date(day): int(count) for day, count in zip(days, counts)}
+
+    counts = Counter(
+        int(seconds // _SECONDS_PER_DAY) for seconds in columns.delivered if not math.isnan(seconds)
+    )
+    return {_to_date(day): counts[day] for day in sorted(counts)}
+
+
+def hourly_counts(data):
+    """
+    Count delivered parcels per hour of the day.
+
+    Args:
+        data (ParcelColumns or list): Parcel columns or parcel dictionaries
+
+    Returns:
+        list: 24 counts, index 0 being midnight to 1am
+    """
+    columns = _columns(data)
+    if columns.is_numpy:
+        delivered = columns.delivered[~np.isnan(columns.delivered)]
+        hours = (delivered // _SECONDS_PER_HOUR).astype(np.int64) % 24
+        return [int(count) for count in np.bincount(hours, minlength=24)]
+
+    counts = [0] * 24
+    for seconds in columns.delivered:
+        if not math.isnan(seconds):
+            counts[int(seconds // _SECONDS_PER_HOUR) % 24] += 1
+    return counts
+
+
+def daily_counts_by_courier(data):
+    """
+    Count delivered parcels per courier per day.
+
+    Args:
+        data (ParcelColumns or list): Parcel columns or parcel dictionaries
+
+    Returns:
+        dict: Mapping of courier to a mapping of date to parcel count
+    """
+    columns = _columns(data)
+    result = defaultdict(dict)
+
+    if columns.is_numpy:
+        mask = ~np.isnan(columns.delivered)
+        days = (columns.delivered[mask] // _SECONDS_PER_DAY).astype(np.int64)
+        if not len(days):
+            return {}
+        couriers, courier_index = np.unique(columns.courier[mask].astype(str), return_inverse=True)
+        first_day = days.min()
+        span = int(days.max() - first_day) + 1
+        keys, counts = np.unique(
+            courier_index.astype(np.int64) * span + (days - first_day), return_counts=True
+        )
+        for key, count in zip(keys, counts):
+            courier = str(couriers[key // span])
+            result[courier][_to_date(first_day + key % span)] = int(count)
+        return dict(result)
+
+    counts = Counter(
+        (courier, int(seconds // _SECONDS_PER_DAY))
+        for courier, seconds in zip(columns.courier, columns.delivered)
+        if not math.isnan(seconds)
+    )
+    for courier, day in sorted(counts):
+        result[courier][_to_date(day)] = counts[(courier, day)]
+    return dict(result)
+
+
+def courier_distribution(data):
+    """
+    Count parcels per courier.
+
+    Args:
+        data (ParcelColumns or list): Parcel columns or parcel dictionaries
+
+    Returns:
+        dict: Mapping of courier name to parcel count ("" for unknown couriers)
+    """
+    return _value_counts(_columns(data).courier)
+
+
+def size_distribution(data):
+    """
+    Count parcels per locker size.
+
+    Args:
+        data (ParcelColumns or list): Parcel columns or parcel dictionaries
+
+    Returns:
+        dict: Mapping of size to parcel count ("" for unknown sizes)
+    """
+    return _value_counts(_columns(data).size)
+
+
+def dwell_times(data):
+    """
+    Compute how long picked-up parcels stayed in their locker.
+
+    Args:
+        data (ParcelColumns or list): Parcel columns or parcel dictionaries
+
+    Returns:
+        array or list: Dwell times in hours for parcels with both timestamps
+    """
+    columns = _columns(data)
+    if columns.is_numpy:
+        dwell = columns.picked_up - columns.delivered
+        return dwell[~np.isnan(dwell) & (dwell >= 0)] / _SECONDS_PER_HOUR
+
+    return [
+        (picked_up - delivered) / _SECONDS_PER_HOUR
+        for delivered, picked_up in zip(columns.delivered, columns.picked_up)
+        if not math.isnan(picked_up - delivered) and picked_up >= delivered
+    ]
+
+
+def _percentile(sorted_values, percentile):
+    """Linear-interpolation percentile, matching numpy.percentile's default."""
+    position = (len(sorted_values) - 1) * percentile / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def dwell_time_percentiles(data, percentiles=(50, 90, 99)):
+    """
+    Compute locker dwell-time percentiles.
+
+    Args:
+        data (ParcelColumns or list): Parcel columns or parcel dictionaries
+        percentiles (tuple): Percentiles to compute, between 0 and 100
+
+    Returns:
+        dict: Mapping of percentile to dwell time in hours, empty if no parcel
+            has both a delivery and a pickup time
+    """
+    dwell = dwell_times(data)
+    if not len(dwell):
+        return {}
+
+    if np is not None and isinstance(dwell, np.ndarray):
+        values = np.percentile(dwell, percentiles)
+        return {p: float(value) for p, value in zip(percentiles, values)}
+
+    dwell = sorted(dwell)
+    return {p: _percentile(dwell, p) for p in percentiles}
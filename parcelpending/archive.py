@@ -0,0 +1,217 @@
+"""
+Append-only archive of raw parcel history pages.
+
+Recording the raw HTML of every history page means parsed data can be rebuilt
+offline after a parser fix, and gives a real-world corpus for benchmarking the
+parser. Each page is stored as an independently compressed record in a data
+file; a JSON-lines index next to it maps request parameters and page numbers
+to record offsets.
+"""
+
+import gzip
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from . import parser
+from .exceptions import ParcelPendingError
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - exercised when zstandard is not installed
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+CODECS = ("zstd", "gzip")
+
+
+def params_key(params):
+    """
+    Build a stable key for history request parameters, ignoring the page number.
+
+    Args:
+        params (dict): History request query parameters
+
+    Returns:
+        str: Canonical JSON representation of the parameters
+    """
+    return json.dumps(
+        {name: value for name, value in params.items() if name != "page"}, sort_keys=True
+    )
+
+
+class ArchivedPage:
+    """A recorded history page."""
+
+    def __init__(self, params, page, html, recorded_at=None):
+        self.params = params
+        self.page = page
+        self.html = html
+        self.recorded_at = recorded_at
+
+    def __repr__(self):
+        return f"ArchivedPage(page={self.page}, recorded_at={self.recorded_at!r})"
+
+
+class PageArchive:
+    """
+    Compressed, append-only archive of raw history pages.
+
+    Records are compressed with zstd when the ``zstandard`` package is installed,
+    gzip otherwise. Archives can mix both codecs.
+    """
+
+    def __init__(self, path, codec=None):
+        """
+        Open (and create if needed) a page archive.
+
+        Args:
+            path (str): Path of the archive data file. The index is stored at
+                ``path + ".idx"``.
+            codec (str, optional): "zstd" or "gzip". Defaults to zstd when available.
+
+        Raises:
+            ParcelPendingError: If the requested codec is unknown or unavailable
+        """
+        if codec is None:
+            codec = "zstd" if zstandard is not None else "gzip"
+        if codec not in CODECS:
+            raise ParcelPendingError(f"Unknown archive codec: {codec}")
+        if codec == "zstd" and zstandard is None:
+            raise ParcelPendingError("The zstd codec requires the zstandard package")
+
+        self.path = str(path)
+        self.index_path = self.path + ".idx"
+        self.codec = codec
+        self._lock = threading.Lock()
+        self._index = None
+
+    def _compress(self, data):
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor().compress(data)
+        return gzip.compress(data)
+
+    @staticmethod
+    def _decompress(data, codec):
+        if codec == "zstd":
+            if zstandard is None:
+                raise ParcelPendingError("Reading zstd records requires the zstandard package")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def record(self, params, page, html):
+        """
+        Append a raw history page to the archive.
+
+        Args:
+            params (dict): Query parameters the page was requested with
+            page (int): Page number
+            html (str): Raw HTML of the page
+        """
+        data = self._compress(html.encode("utf-8"))
+        entry = {
+            "key": params_key(params),
+            "page": page,
+            "codec": self.codec,
+            "length": len(data),
+            "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        }
+
+        with self._lock:
+            with open(self.path, "ab") as data_file:
+                entry["offset"] = data_file.tell()
+                data_file.write(data)
+            with open(self.index_path, "a", encoding="utf-8") as index_file:
+                index_file.write(json.dumps(entry) + "\n")
+            if self._index is not None:
+                self._index.append(entry)
+
+        logger.debug("Archived page %s (%s bytes, %s)", page, len(data), self.codec)
+
+    def _entries(self):
+        """Load (once) and return the index entries in recording order."""
+        with self._lock:
+            if self._index is None:
+                self._index = []
+                if os.path.exists(self.index_path):
+                    with open(self.index_path, encoding="utf-8") as index_file:
+                        self._index = [json.loads(line) for line in index_file if line.strip()]
+            return list(self._index)
+
+    def __len__(self):
+        return len(self._entries())
+
+    def _read(self, data_file, entry):
+        data_file.seek(entry["offset"])
+        html = self._decompress(data_file.read(entry["length"]), entry["codec"]).decode("utf-8")
+        return ArchivedPage(json.loads(entry["key"]), entry["page"], html, entry["recorded_at"])
+
+    def __iter__(self):
+        """Iterate over all archived pages in recording order."""
+        entries = self._entries()
+        if not entries:
+            return
+        with open(self.path, "rb") as data_file:
+            for entry in entries:
+                yield self._read(data_file, entry)
+
+    def get(self, params, page):
+        """
+        Look up the most recently recorded copy of a page.
+
+        Args:
+            params (dict): Query parameters the page was requested with
+            page (int): Page number
+
+        Returns:
+            ArchivedPage or None: The archived page if it was recorded
+        """
+        key = params_key(params)
+        for entry in reversed(self._entries()):
+            if entry["key"] == key and entry["page"] == page:
+                with open(self.path, "rb") as data_file:
+                    return self._read(data_file, entry)
+        return None
+
+    def reparse(self, workers=None, batch_size=256):
+        """
+        Re-run the parser over every archived page.
+
+        Args:
+            workers (int, optional): Number of worker processes to parse with.
+                Pages are parsed in the calling process when not given.
+            batch_size (int): Number of pages decompressed and handed to the
+                pool at a time, bounding memory use
+
+        Yields:
+            tuple: (ArchivedPage, parcels) in recording order
+        """
+        if not workers:
+            for archived in self:
+                yield archived, parser.parse_page(archived.html, archived.page)[0]
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            batch = []
+            for archived in self:
+                batch.append(archived)
+                if len(batch) >= batch_size:
+                    yield from self._parse_batch(pool, batch, workers)
+                    batch = []
+            if batch:
+                yield from self._parse_batch(pool, batch, workers)
+
+    @staticmethod
+    def _parse_batch(pool, batch, workers):
+        results = pool.map(
+            parser.parse_page,
+            [archived.html for archived in batch],
+            [archived.page for archived in batch],
+            chunksize=max(1, len(batch) // (workers * 4)),
+        )
+        for archived, (parcels, _, _, _) in zip(batch, results):
+            yield archived, parcels
@@ -0,0 +1,117 @@
+"""
+Planning for batches of parcel history requests over overlapping date windows.
+"""
+
+from datetime import timedelta
+
+from .filters import compile_filter
+from .utils import parse_timestamp, to_datetime
+
+
+class HistoryRequest:
+    """
+    One date window of a batch, with an optional parcel filter.
+
+    Dates are inclusive and compared by day, like the parcel history page does.
+    """
+
+    def __init__(self, start_date, end_date, parcel_filter=None):
+        """
+        Initialize a history request.
+
+        Args:
+            start_date (str or datetime): Start date of the window
+            end_date (str or datetime): End date of the window
+            parcel_filter (callable or str, optional): Predicate selecting parcels to
+                keep, or a filter expression (see parcelpending.filters)
+        """
+        if isinstance(parcel_filter, str):
+            parcel_filter = compile_filter(parcel_filter)
+
+        self.start = to_datetime(start_date).date()
+        self.end = to_datetime(end_date).date()
+        self.parcel_filter = parcel_filter
+
+    @classmethod
+    def coerce(cls, request):
+        """
+        Build a HistoryRequest from a (start, end) or (start, end, filter) tuple.
+
+        Args:
+            request (HistoryRequest or tuple): The request to convert
+
+        Returns:
+            HistoryRequest: The converted request
+        """
+        if isinstance(request, cls):
+            return request
+        return cls(*request)
+
+    def __repr__(self):
+        return f"HistoryRequest({self.start.isoformat()}, {self.end.isoformat()})"
+
+
+def plan_fetch_ranges(requests):
+    """
+    Merge request windows into the minimum set of non-overlapping fetch ranges.
+
+    Overlapping and adjacent windows are merged, so every day covered by any
+    request is fetched exactly once.
+
+    Args:
+        requests (list): HistoryRequest objects
+
+    Returns:
+        list: (start, end) date pairs, sorted and non-overlapping
+    """
+    ranges = []
+    for request in sorted(requests, key=lambda r: r.start):
+        if ranges and request.start <= ranges[-1][1] + timedelta(days=1):
+            if request.end > ranges[-1][1]:
+                ranges[-1] = (ranges[-1][0], request.end)
+        else:
+            ranges.append((request.start, request.end))
+    return ranges
+
+
+def delivery_day(parcel):
+    """
+    Get the day a parcel was delivered.
+
+    Args:
+        parcel (dict): Parcel dictionary
+
+    Returns:
+        date or None: Delivery day, None if unknown
+    """
+    delivered = parse_timestamp(parcel.get("delivery_date"))
+    return delivered.date() if delivered else None
+
+
+def slice_history(ranges, range_parcels, request):
+    """
+    Select the parcels of one request from the fetched ranges.
+
+    Parcels without a known delivery date can't be placed within a range, so
+    they are kept for every request served by the range they were fetched for.
+
+    Args:
+        ranges (list): Fetch ranges from plan_fetch_ranges
+        range_parcels (list): Parcels fetched for each range, as (day, parcel)
+            pairs with day None for undated parcels
+        request (HistoryRequest): The request to slice out
+
+    Returns:
+        list: Parcels in the request's window that pass its filter
+    """
+    parcels = []
+    for (start, end), fetched in zip(ranges, range_parcels):
+        if end < request.start or start > request.end:
+            continue
+        for day, parcel in fetched:
+            if day is not None and not request.start <= day <= request.end:
+                continue
+            if request.parcel_filter is not None and not request.parcel_filter(parcel):
+                continue
+            parcels.append(parcel)
+    return parcels
@@ -0,0 +1,156 @@
+"""
+Checkpoints for resumable parcel history fetches.
+"""
+
+import json
+import logging
+import os
+
+from .archive import params_key
+from .exceptions import ParcelPendingError
+from .utils import json_default, restore_dates
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryCheckpoint:
+    """
+    Progress of a parcel history fetch: the request, the next page to fetch and
+    the parcels of every page completed so far.
+
+    A checkpoint is attached as ``resume_token`` to errors raised by
+    ``get_parcel_history`` and can be passed back as ``resume=`` to continue from
+    the failed page. When given a path, it is saved to disk after every page.
+
+    The file holds JSON lines: a header with the request parameters, then one
+    line per completed page with its parcels. Each page is appended, so saving
+    costs the size of the page rather than of the whole history.
+
+    ``on_page``, if set, is called with the parcels of every completed page.
+    """
+
+    def __init__(self, params, next_page=1, parcels=None, path=None):
+        """
+        Initialize a checkpoint.
+
+        Args:
+            params (dict): Query parameters of the history request
+            next_page (int): Next page to fetch
+            parcels (list, optional): Parcels from the pages completed so far
+            path (str, optional): File the checkpoint is saved to after every page
+        """
+        self.params = params
+        self.next_page = next_page
+        self.parcels = parcels if parcels is not None else []
+        self.path = str(path) if path is not None else None
+        self.on_page = None
+        # File that is up to date with the pages completed so far, to append to
+        self._saved_to = None
+
+    def __repr__(self):
+        return f"HistoryCheckpoint(next_page={self.next_page}, parcels={len(self.parcels)})"
+
+    def matches(self, params):
+        """
+        Check whether this checkpoint belongs to a history request.
+
+        Args:
+            params (dict): Query parameters of the history request
+
+        Returns:
+            bool: True if the checkpoint was taken for the same request
+        """
+        return params_key(self.params) == params_key(params)
+
+    def complete_page(self, page, parcels):
+        """
+        Record a completed page.
+
+        Pages must be completed in order.
+
+        Args:
+            page (int): Page number that was completed
+            parcels (list): Parcels parsed from the page
+        """
+        if page != self.next_page:
+            raise ParcelPendingError(f"Expected page {self.next_page} to complete, got {page}")
+
+        self.parcels.extend(parcels)
+        self.next_page = page + 1
+
+        if self.path is not None:
+            if self._saved_to == self.path:
+                self._append(page, parcels)
+            else:
+                self.save(self.path)
+        if self.on_page is not None:
+            self.on_page(parcels)
+
+    def to_dict(self):
+        """Return a JSON-serializable representation of the checkpoint."""
+        return {"params": self.params, "next_page": self.next_page, "parcels": self.parcels}
+
+    def save(self, path):
+        """
+        Atomically write the whole checkpoint to a file.
+
+        Later pages completed with the same path are appended to it.
+
+        Args:
+            path (str): Destination file
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as checkpoint_file:
+            header = {"params": self.params, "next_page": self.next_page}
+            checkpoint_file.write(json.dumps(header, default=json_default) + "\n")
+            if self.parcels:
+                record = {"page": self.next_page - 1, "parcels": self.parcels}
+                checkpoint_file.write(json.dumps(record, default=json_default) + "\n")
+        os.replace(tmp_path, path)
+        self._saved_to = str(path)
+        logger.debug("Saved checkpoint before page %s to %s", self.next_page, path)
+
+    def _append(self, page, parcels):
+        line = json.dumps({"page": page, "parcels": parcels}, default=json_default) + "\n"
+        with open(self.path, "a", encoding="utf-8") as checkpoint_file:
+            checkpoint_file.write(line)
+        logger.debug("Saved checkpoint before page %s to %s", self.next_page, self.path)
+
+    def discard(self):
+        """Remove the on-disk copy of a checkpoint once its fetch has finished."""
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a checkpoint saved with save().
+
+        Args:
+            path (str): Checkpoint file
+
+        Returns:
+            HistoryCheckpoint: The loaded checkpoint, saving back to the same path
+        """
+        with open(path, encoding="utf-8") as checkpoint_file:
+            lines = checkpoint_file.read().splitlines()
+        header = json.loads(lines[0])
+        next_page = header["next_page"]
+        parcels = []
+        torn = False
+        for number, line in enumerate(lines[1:], 2):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                if number < len(lines):
+                    raise
+                # The process died while appending the last page; fetch it again
+                torn = True
+                break
+            parcels.extend(restore_dates(parcel) for parcel in record["parcels"])
+            next_page = max(next_page, record["page"] + 1)
+
+        checkpoint = cls(header["params"], next_page, parcels, path=path)
+        if not torn:
+            checkpoint._saved_to = checkpoint.path
+        return checkpoint
@@ -1,61 +1,394 @@
 #!/usr/bin/env python3
 """
 Command line interface for the ParcelPending client.
+
+Only light modules are imported at startup. The client (and with it requests
+and BeautifulSoup), archives and job queues are imported by the commands that
+use them, so --help and argument errors return quickly.
 """
 
 import argparse
+import json
 import logging
 import sys
+import time
+from collections import Counter
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 
-from parcelpending import ParcelPendingClient
-from parcelpending.exceptions import AuthenticationError, ConnectionError
+from parcelpending.batch import HistoryRequest
+from parcelpending.diff import NEW, REMOVED, STATUS_CHANGED, diff_parcels
+from parcelpending.exceptions import AuthenticationError, ConnectionError, FilterError
+from parcelpending.filters import compile_filter
+from parcelpending.output import DEFAULT_COLUMNS, WRITERS, create_writer, parse_columns
+from parcelpending.utils import restore_dates
 
 
 def setup_logging(debug=False):
     """Set up logging configuration based on debug mode."""
     level = logging.DEBUG if debug else logging.INFO
-    logging.basicConfig(level=level, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    # Logs go to stderr so stdout carries only the listed parcels
+    logging.basicConfig(
+        level=level,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        stream=sys.stderr,
+    )
     return logging.getLogger(__name__)
 
 
-def list_parcels(client, days, active_only=False, courier=None, debug=False):
-    """List parcels with optional filtering."""
+def display_parcels(parcels, logger, writer=None):
+    """Write parcels to stdout, as a table unless another writer is given."""
+    if parcels:
+        logger.info("Found %s parcels", len(parcels))
+        writer = writer or create_writer("table")
+        writer.write(parcels)
+        writer.close()
+        return parcels
+    else:
+        logger.info("No parcels found matching your criteria.")
+        return []
+
+
+def export_parcels(client, parcels, export_format, output, logger):
+    """Export parcels to a CSV or JSON file, naming it after the current time by default."""
+    if not parcels:
+        logger.warning("No parcels to export")
+        return None
+
+    output_file = output or f"parcels_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    if export_format == "csv":
+        client.export_to_csv(parcels, output_file)
+    else:  # json
+        client.export_to_json(parcels, output_file)
+    logger.info("Exported %s parcels to %s", len(parcels), output_file)
+    return output_file
+
+
+def filter_expression(active_only=False, courier=None, expression=None):
+    """Combine the list/export filter options into one filter expression, or None."""
+    parts = []
+    if expression:
+        parts.append(f"({expression})")
+    if active_only:
+        parts.append('status != "picked up"')
+    if courier:
+        escaped = courier.replace("\\", "\\\\").replace('"', '\\"')
+        parts.append(f'courier ~ "{escaped}"')
+    return " and ".join(parts) or None
+
+
+def load_batch_specs(path):
+    """
+    Load the query specs of a batch file.
+
+    The file holds a JSON list of objects, each with a "command" ("list" or
+    "export") and optionally "days", "active", "courier", "filter" (a filter
+    expression), and for exports "format" ("csv" or "json") and "output".
+    """
+    with open(path, encoding="utf-8") as batch_file:
+        specs = json.load(batch_file)
+
+    if not isinstance(specs, list):
+        raise ValueError("Batch file must contain a JSON list of query specs")
+    for number, spec in enumerate(specs, 1):
+        if not isinstance(spec, dict) or spec.get("command") not in ("list", "export"):
+            raise ValueError(f"Query {number}: command must be 'list' or 'export'")
+        if spec.get("format", "csv") not in ("csv", "json"):
+            raise ValueError(f"Query {number}: format must be 'csv' or 'json'")
+        if spec.get("filter") is not None:
+            try:
+                compile_filter(spec["filter"])
+            except FilterError as e:
+                raise ValueError(f"Query {number}: {e}")
+    return specs
+
+
+def run_batch(client, specs, days, debug=False):
+    """Answer several list/export queries from a single history fetch."""
+    logger = setup_logging(debug)
+
+    end_date = datetime.now()
+    history_requests = [
+        HistoryRequest(
+            end_date - timedelta(days=spec.get("days", days)),
+            end_date,
+            filter_expression(spec.get("active", False), spec.get("courier"), spec.get("filter")),
+        )
+        for spec in specs
+    ]
+
+    logger.info("Running %s queries...", len(specs))
+    results = client.get_parcel_histories(history_requests)
+
+    for number, (spec, parcels) in enumerate(zip(specs, results), 1):
+        logger.info("Query %s: %s (%s parcels)", number, spec["command"], len(parcels))
+        if spec["command"] == "list":
+            display_parcels(parcels, logger)
+        else:
+            export_parcels(client, parcels, spec.get("format", "csv"), spec.get("output"), logger)
+
+    return results
+
+
+def load_accounts(path):
+    """
+    Load account credentials for the job queue commands.
+
+    Args:
+        path (str): JSON file mapping account emails to passwords
+
+    Returns:
+        dict: Password by email
+
+    Raises:
+        ValueError: If the file isn't such a mapping
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        accounts = json.load(f)
+    if not isinstance(accounts, dict) or not all(
+        isinstance(password, str) for password in accounts.values()
+    ):
+        raise ValueError("expected a JSON object mapping account emails to passwords")
+    return accounts
+
+
+def enqueue_jobs(queue_path, accounts, days, expression=None, debug=False):
+    """Queue a history job over the last days for every account."""
+    from parcelpending.jobs import JobQueue
+
+    logger = setup_logging(debug)
+
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days)
+    with JobQueue(queue_path) as queue:
+        for account in accounts:
+            job_id = queue.enqueue(account, start_date, end_date, expression)
+            logger.info("Queued job %s for %s", job_id, account)
+        logger.info("Queue: %s", queue.counts())
+
+
+def run_worker(
+    queue_path, store, credentials, max_jobs=None, idle_timeout=None, debug=False, **client_kwargs
+):
+    """Run jobs from the queue, saving the parcels to the shared store."""
+    from parcelpending.jobs import JobQueue, Worker
+
+    logger = setup_logging(debug)
+
+    with JobQueue(queue_path) as queue:
+        worker = Worker(queue, store, credentials, **client_kwargs)
+        logger.info("Worker %s polling %s", worker.worker_id, queue_path)
+        try:
+            return worker.run(max_jobs=max_jobs, idle_timeout=idle_timeout)
+        finally:
+            worker.close()
+
+
+def list_parcels(
+    client, days, active_only=False, courier=None, debug=False, expression=None, writer=None
+):
+    """
+    List parcels with optional filtering.
+
+    With a writer, parcels are written as each history page arrives; otherwise
+    they are only collected (e.g. for export).
+    """
     logger = setup_logging(debug)
 
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days)
+    combined = filter_expression(active_only, courier, expression)
+
     try:
-        if active_only:
-            logger.info(f"Retrieving active parcels from the last {days} days...")
-            parcels = client.get_active_parcels(days=days)
-        elif courier:
-            logger.info(f"Retrieving parcels from {courier} from the last {days} days...")
-            parcels = client.get_parcels_by_courier(courier, days=days)
+        if combined:
+            logger.info("Retrieving parcels matching %s from the last %s days...", combined, days)
         else:
-            # Get all parcels for the specified days
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
+            logger.info(
+                "Retrieving parcel history from %s to %s...", start_date.date(), end_date.date()
+            )
+        parcels = client.get_parcel_history(
+            start_date,
+            end_date,
+            filters=combined,
+            on_page=writer.write if writer is not None else None,
+        )
+    except Exception as e:
+        logger.error("Error listing parcels: %s", e)
+        return []
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if parcels:
+        logger.info("Found %s parcels", len(parcels))
+    else:
+        logger.info("No parcels found matching your criteria.")
+    return parcels
+
+
+def replay_archive(client, archive_path, workers=None, debug=False):
+    """Reparse every page of a recorded archive and report parser throughput."""
+    from parcelpending.archive import PageArchive
+
+    logger = setup_logging(debug)
+
+    archive = PageArchive(archive_path)
+    logger.info("Reparsing %s archived page(s) from %s...", len(archive), archive_path)
+
+    parcels = []
+    pages = 0
+    started = time.perf_counter()
+    with client.profile_phase("replay"):
+        for _, page_parcels in archive.reparse(workers=workers):
+            pages += 1
+            parcels.extend(page_parcels)
+    elapsed = time.perf_counter() - started
+
+    rate = pages / elapsed if elapsed else 0.0
+    logger.info(
+        "Reparsed %s parcels from %s page(s) in %.3fs (%.1f pages/s)",
+        len(parcels),
+        pages,
+        elapsed,
+        rate,
+    )
+
+    if client.store is not None:
+        client.store.save_parcels(parcels)
+        logger.info("Saved reparsed parcels to %s", client.store.path)
+
+    return parcels
+
+
+def load_history(path):
+    """Load a parcel history exported with ``export --format json``."""
+    with open(path, encoding="utf-8") as history_file:
+        return [restore_dates(parcel) for parcel in json.load(history_file)]
+
+
+def diff_histories(client, days, old_path=None, new_path=None, output=None, debug=False):
+    """Report new, removed and status-changed parcels between two history snapshots."""
+    logger = setup_logging(debug)
+
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days)
 
+    if old_path and new_path:
+        logger.info("Comparing %s with %s...", old_path, new_path)
+        changes = diff_parcels(load_history(old_path), load_history(new_path))
+    elif old_path:
+        logger.info("Comparing %s with the parcel history of the last %s days...", old_path, days)
+        changes = diff_parcels(load_history(old_path), client.get_parcel_history(start_date, end_date))
+    else:
+        logger.info(
+            "Comparing the local store with the parcel history of the last %s days...", days
+        )
+        changes = client.diff_with_store(start_date, end_date)
+
+    reported = []
+    for change in changes:
+        reported.append(change)
+        parcel = change.parcel
+        if change.kind == STATUS_CHANGED:
             logger.info(
-                f"Retrieving parcel history from {start_date.date()} to {end_date.date()}..."
+                "~ %s %s: %s -> %s",
+                change.package_code,
+                parcel.get("courier", ""),
+                change.old_status,
+                change.new_status,
             )
-            parcels = client.get_parcel_history(start_date, end_date)
-
-        # Display results
-        if parcels:
-            logger.info(f"Found {len(parcels)} parcels:")
-            for i, parcel in enumerate(parcels, 1):
-                logger.info(f"Parcel {i}:")
-                for key, value in parcel.items():
-                    logger.info(f"  {key.capitalize()}: {value}")
-                logger.info("---")
-            return parcels
         else:
-            logger.info("No parcels found matching your criteria.")
-            return []
+            sign = "+" if change.kind == NEW else "-"
+            logger.info(
+                "%s %s %s (%s)",
+                sign,
+                change.package_code,
+                parcel.get("courier", ""),
+                parcel.get("status"),
+            )
 
-    except Exception as e:
-        logger.error(f"Error listing parcels: {e}")
-        return []
+    counts = Counter(change.kind for change in reported)
+    logger.info(
+        "%s new, %s removed, %s status changed",
+        counts[NEW],
+        counts[REMOVED],
+        counts[STATUS_CHANGED],
+    )
+
+    if output:
+        with open(output, "w", encoding="utf-8") as output_file:
+            json.dump([change.to_dict() for change in reported], output_file, indent=2)
+        logger.info("Wrote %s change(s) to %s", len(reported), output)
+
+    return reported
+
+
+def parse_counts(specs):
+    """
+    Parse NAME=EXPRESSION count specs of the summary command.
+
+    Args:
+        specs (list): Count specs; a bare NAME counts all parcels
+
+    Returns:
+        dict: Filter expression (None for all parcels) by count name
+
+    Raises:
+        ValueError: If a spec has no name or an invalid filter
+    """
+    counts = {}
+    for spec in specs:
+        name, _, expression = spec.partition("=")
+        name, expression = name.strip(), expression.strip() or None
+        if not name:
+            raise ValueError(f"missing count name in {spec!r}")
+        if expression is not None:
+            try:
+                compile_filter(expression)
+            except FilterError as e:
+                raise ValueError(f"{name}: {e}")
+        counts[name] = expression
+    return counts
+
+
+def summarize(client, days, counts=None, debug=False):
+    """Print parcel counts for the last days, one "name<TAB>count" line each."""
+    logger = setup_logging(debug)
+
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days)
+
+    logger.info("Counting parcels of the last %s days...", days)
+    summary = client.get_summary(start_date, end_date, counts)
+    sys.stdout.write("".join(f"{name}\t{count}\n" for name, count in summary.items()))
+    sys.stdout.flush()
+    return summary
+
+
+def search_parcels(client, fragment, limit=None, writer=None, debug=False):
+    """Write the stored parcels whose numbers contain a fragment."""
+    logger = setup_logging(debug)
+
+    parcels = client.search_parcels(fragment, limit=limit)
+    writer = writer or create_writer()
+    try:
+        writer.write(parcels)
+    finally:
+        writer.close()
+    logger.info("Found %s parcels matching %r", len(parcels), fragment)
+    return parcels
+
+
+def rebuild_aggregates(store, debug=False):
+    """Recompute the store's aggregates, reporting the ones that were out of date."""
+    logger = setup_logging(debug)
+
+    stale = store.rebuild_aggregates()
+    if stale:
+        logger.warning("Out-of-date aggregates rebuilt: %s", ", ".join(stale))
+    else:
+        logger.info("Aggregates were consistent")
+    return stale
 
 
 def main():
@@ -69,6 +402,49 @@ def main():
     parser.add_argument(
         "--days", type=int, default=30, help="Number of days in the past to check (default: 30)"
     )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        help="Parse history pages in this many worker processes (for large histories)",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Download the next history page while the current one is parsed",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Parse each history page while it downloads, row by row",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print a per-phase time and memory breakdown to stderr when done",
+    )
+    parser.add_argument(
+        "--profile-collapsed",
+        metavar="PATH",
+        help="Also write sampled call stacks for flamegraph tools to PATH (implies --profile)",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=30.0,
+        help="Seconds to wait for the server on each request (default: 30)",
+    )
+    parser.add_argument(
+        "--snapshot-dir",
+        metavar="DIR",
+        help="Save history pages that can't be parsed to DIR, once per page layout",
+    )
+    parser.add_argument("--record", help="Record raw history pages to this archive")
+    parser.add_argument("--store", help="Path to a local parcel store to persist history to")
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Answer from the local store without connecting (requires --store)",
+    )
 
     # Command subparsers
     subparsers = parser.add_subparsers(dest="command", help="Command to execute")
@@ -79,6 +455,23 @@ def main():
         "--active", "-a", action="store_true", help="Show only active (not picked up) parcels"
     )
     list_parser.add_argument("--courier", "-c", help="Filter by courier name")
+    list_parser.add_argument(
+        "--filter",
+        dest="expression",
+        help='Filter expression, e.g. \'courier in (USPS, Amazon) and status != "picked up"\'',
+    )
+    list_parser.add_argument(
+        "--output-format",
+        "-F",
+        choices=sorted(WRITERS),
+        default="table",
+        help="Output format written to stdout as pages arrive (default: table)",
+    )
+    list_parser.add_argument(
+        "--columns",
+        help=f"Comma-separated fields to output (default: {','.join(DEFAULT_COLUMNS)}; "
+        "ndjson: all fields)",
+    )
 
     # Export command
     export_parser = subparsers.add_parser("export", help="Export parcels to a file")
@@ -94,6 +487,107 @@ def main():
         "--active", "-a", action="store_true", help="Export only active (not picked up) parcels"
     )
     export_parser.add_argument("--courier", "-c", help="Filter by courier name")
+    export_parser.add_argument(
+        "--filter", dest="expression", help="Filter expression (see the list command)"
+    )
+
+    # Replay command
+    replay_parser = subparsers.add_parser(
+        "replay", help="Reparse a recorded page archive without connecting"
+    )
+    replay_parser.add_argument("archive", help="Path to the page archive")
+    replay_parser.add_argument(
+        "--workers", "-w", type=int, help="Number of worker processes to parse with"
+    )
+    replay_parser.add_argument("--output", "-o", help="Write reparsed parcels to this JSON file")
+
+    # Batch command
+    batch_parser = subparsers.add_parser(
+        "batch", help="Run several list/export queries from one history download"
+    )
+    batch_parser.add_argument(
+        "queries",
+        help='JSON file with a list of query specs, e.g. [{"command": "list", "active": true}, '
+        '{"command": "export", "courier": "USPS", "format": "json", "output": "usps.json"}]',
+    )
+
+    # Diff command
+    diff_parser = subparsers.add_parser(
+        "diff", help="Show new, removed and status-changed parcels between two snapshots"
+    )
+    diff_parser.add_argument(
+        "old",
+        nargs="?",
+        help="Older snapshot (JSON export). Defaults to the local store (--store).",
+    )
+    diff_parser.add_argument(
+        "new", nargs="?", help="Newer snapshot (JSON export). Defaults to a fresh download."
+    )
+    diff_parser.add_argument("--output", "-o", help="Write the changes to this JSON file")
+
+    # Summary command
+    summary_parser = subparsers.add_parser(
+        "summary", help="Print parcel counts, reading only page 1 where the website can count"
+    )
+    summary_parser.add_argument(
+        "--count",
+        action="append",
+        default=[],
+        metavar="NAME=FILTER",
+        help="Count the parcels matching a filter expression (repeatable); replaces the "
+        "default total/active/picked_up counts",
+    )
+
+    # Search command
+    search_parser = subparsers.add_parser(
+        "search",
+        help="Find parcels in the local store (--store) by part of their tracking number, "
+        "package code or order number",
+    )
+    search_parser.add_argument("fragment", help="Part of the number, e.g. its last 4 digits")
+    search_parser.add_argument("--limit", "-n", type=int, help="Show at most this many parcels")
+    search_parser.add_argument(
+        "--output-format",
+        "-F",
+        choices=sorted(WRITERS),
+        default="table",
+        help="Output format written to stdout (default: table)",
+    )
+    search_parser.add_argument(
+        "--columns", help="Comma-separated fields to output (see the list command)"
+    )
+
+    # Rebuild aggregates command
+    subparsers.add_parser(
+        "rebuild-aggregates",
+        help="Recompute the aggregates of the local store (--store) and report inconsistencies",
+    )
+
+    # Job queue commands
+    enqueue_parser = subparsers.add_parser(
+        "enqueue", help="Queue history jobs for workers (see the worker command)"
+    )
+    enqueue_parser.add_argument("queue", help="Path to the shared job queue database")
+    enqueue_parser.add_argument(
+        "--accounts",
+        help="JSON file mapping account emails to passwords; queues every account in it "
+        "instead of EMAIL",
+    )
+    enqueue_parser.add_argument("--filter", dest="expression", help="Filter expression")
+
+    worker_parser = subparsers.add_parser(
+        "worker", help="Run queued history jobs, saving the parcels to --store"
+    )
+    worker_parser.add_argument("queue", help="Path to the shared job queue database")
+    worker_parser.add_argument(
+        "--accounts", help="JSON file mapping account emails to passwords, besides EMAIL"
+    )
+    worker_parser.add_argument("--max-jobs", type=int, help="Stop after this many jobs")
+    worker_parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        help="Stop after this many seconds without a due job (default: run forever)",
+    )
 
     # Parse arguments
     args = parser.parse_args()
@@ -102,49 +596,146 @@ def main():
     if not args.command:
         args.command = "list"
 
+    if args.offline and not args.store:
+        parser.error("--offline requires --store")
+
+    if args.command == "diff":
+        if not args.old and not args.store:
+            parser.error("diff needs an older snapshot file or --store")
+        if args.offline and not args.new:
+            parser.error("diff against a fresh download can't run with --offline")
+
+    if getattr(args, "expression", None):
+        try:
+            compile_filter(args.expression)
+        except FilterError as e:
+            parser.error(f"Invalid filter: {e}")
+
+    if args.command == "batch":
+        try:
+            specs = load_batch_specs(args.queries)
+        except (OSError, ValueError) as e:
+            parser.error(f"Invalid batch file: {e}")
+
+    if args.command in ("search", "rebuild-aggregates") and not args.store:
+        parser.error(f"{args.command} requires --store")
+
+    if args.command == "summary":
+        try:
+            counts = parse_counts(args.count) or None
+        except ValueError as e:
+            parser.error(f"Invalid count: {e}")
+
+    if args.command in ("enqueue", "worker"):
+        if args.command == "worker" and not args.store:
+            parser.error("worker requires --store")
+        accounts = {args.email: args.password}
+        if args.accounts:
+            try:
+                loaded = load_accounts(args.accounts)
+            except (OSError, ValueError) as e:
+                parser.error(f"Invalid accounts file: {e}")
+            accounts = loaded if args.command == "enqueue" else {**accounts, **loaded}
+
     # Set up logging
     logger = setup_logging(args.debug)
 
     # Initialize client
-    client = ParcelPendingClient()
+    from parcelpending.client import ParcelPendingClient
+    from parcelpending.deadline import DEFAULT_TIMEOUT
+
+    client = ParcelPendingClient(
+        email=args.email,
+        store=args.store,
+        offline=args.offline,
+        parse_workers=args.parse_workers,
+        pipeline=args.pipeline,
+        stream=args.stream,
+        record_to=args.record,
+        timeout=(min(args.timeout, DEFAULT_TIMEOUT[0]), args.timeout),
+        snapshot_dir=args.snapshot_dir,
+    )
+
+    profiling = nullcontext()
+    if args.profile or args.profile_collapsed:
+        profiling = client.profile(collapsed_path=args.profile_collapsed)
 
     try:
-        # Login
-        logger.info("Attempting to log in...")
-        client.login(email=args.email, password=args.password)
-        logger.info("Login successful!")
-
-        # Execute command
-        if args.command == "list":
-            list_parcels(client, args.days, args.active, args.courier, args.debug)
-
-        elif args.command == "export":
-            parcels = list_parcels(client, args.days, args.active, args.courier, args.debug)
-
-            if parcels:
-                if args.format == "csv":
-                    output_file = (
-                        args.output or f"parcels_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-                    )
-                    client.export_to_csv(parcels, output_file)
-                    logger.info(f"Exported {len(parcels)} parcels to {output_file}")
-                else:  # json
-                    output_file = (
-                        args.output or f"parcels_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-                    )
-                    client.export_to_json(parcels, output_file)
-                    logger.info(f"Exported {len(parcels)} parcels to {output_file}")
-            else:
-                logger.warning("No parcels to export")
+        with profiling:
+            # Login
+            offline_diff = args.command == "diff" and args.new
+            no_login = ("replay", "enqueue", "worker", "search", "rebuild-aggregates")
+            if not args.offline and args.command not in no_login and not offline_diff:
+                logger.info("Attempting to log in...")
+                client.login(email=args.email, password=args.password)
+                logger.info("Login successful!")
+
+            # Execute command
+            if args.command == "list":
+                columns = parse_columns(args.columns) if args.columns else None
+                writer = create_writer(args.output_format, columns=columns)
+                list_parcels(
+                    client,
+                    args.days,
+                    args.active,
+                    args.courier,
+                    args.debug,
+                    args.expression,
+                    writer,
+                )
+
+            elif args.command == "export":
+                parcels = list_parcels(
+                    client, args.days, args.active, args.courier, args.debug, args.expression
+                )
+                export_parcels(client, parcels, args.format, args.output, logger)
+
+            elif args.command == "batch":
+                run_batch(client, specs, args.days, args.debug)
+
+            elif args.command == "replay":
+                parcels = replay_archive(client, args.archive, args.workers, args.debug)
+                if args.output:
+                    client.export_to_json(parcels, args.output)
+
+            elif args.command == "diff":
+                diff_histories(client, args.days, args.old, args.new, args.output, args.debug)
+
+            elif args.command == "search":
+                columns = parse_columns(args.columns) if args.columns else None
+                writer = create_writer(args.output_format, columns=columns)
+                search_parcels(client, args.fragment, args.limit, writer, args.debug)
+
+            elif args.command == "rebuild-aggregates":
+                rebuild_aggregates(client.store, args.debug)
+
+            elif args.command == "summary":
+                summarize(client, args.days, counts, args.debug)
+
+            elif args.command == "enqueue":
+                enqueue_jobs(args.queue, accounts, args.days, args.expression, args.debug)
+
+            elif args.command == "worker":
+                run_worker(
+                    args.queue,
+                    args.store,
+                    accounts,
+                    args.max_jobs,
+                    args.idle_timeout,
+                    args.debug,
+                    stream=args.stream,
+                    timeout=client.timeout,
+                    snapshot_dir=args.snapshot_dir,
+                )
 
     except AuthenticationError as e:
-        logger.error(f"Authentication failed: {e}")
+        logger.error("Authentication failed: %s", e)
         sys.exit(1)
     except ConnectionError as e:
-        logger.error(f"Connection error: {e}")
+        logger.error("Connection error: %s", e)
         sys.exit(1)
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
         sys.exit(1)
 
     sys.exit(0)
@@ -2,17 +2,53 @@
 Client for interacting with the ParcelPending website.
 """
 
+import codecs
 import logging
-import re
+import math
+import queue
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 from datetime import datetime, timedelta
+from urllib.parse import urlparse
 
 import requests
 from bs4 import BeautifulSoup
 
-from .exceptions import AuthenticationError, ConnectionError, ParcelPendingError
+from . import batch, diff, parser
+from .archive import PageArchive
+from .checkpoint import HistoryCheckpoint
+from .deadline import DEFAULT_TIMEOUT, FetchControl
+from .exceptions import (
+    AuthenticationError,
+    CancelledError,
+    ConnectionError,
+    ParcelPendingError,
+    TimeoutError,
+)
+from .filters import compile_filter
+from .profiling import Profiler
+from .store import ParcelStore
+from .transport import DEFAULT_POOL_SIZE, RequestsTransport
+from .utils import json_default
 
 logger = logging.getLogger(__name__)
 
+# Bytes read at a time from a streamed history page
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# Default counts of get_summary(): filter expression by name, None for all parcels
+SUMMARY_COUNTS = {
+    "total": None,
+    "active": 'status != "picked up"',
+    "picked_up": 'status = "picked up"',
+}
+
+# Default counts the website can't answer, as (minuend, subtrahend) counts they
+# are the difference of, so the default summary only reads page 1 of two queries
+_SUMMARY_DIFFERENCES = {"active": ("total", "picked_up")}
+
 
 class ParcelPendingClient:
     """
@@ -25,18 +61,133 @@ class ParcelPendingClient:
     LOGIN_URL = f"{BASE_URL}/login"
     PARCEL_HISTORY_URL = f"{BASE_URL}/parcel-history"
 
-    def __init__(self, email=None, password=None):
+    def __init__(
+        self,
+        email=None,
+        password=None,
+        store=None,
+        offline=False,
+        parse_workers=None,
+        pipeline=False,
+        transport=None,
+        pool_size=None,
+        record_to=None,
+        auto_relogin=True,
+        stream=False,
+        timeout=DEFAULT_TIMEOUT,
+        snapshot_dir=None,
+    ):
         """
         Initialize the ParcelPending client.
 
         Args:
             email (str): Email or username for authentication
             password (str): Password for authentication
+            store (ParcelStore or str, optional): Local store (or path to one) that
+                retrieved parcel history is persisted to
+            offline (bool): Answer history queries from the local store instead
+                of the website. Requires a store.
+            parse_workers (int, optional): Default number of worker processes used
+                to parse history pages (see get_parcel_history)
+            pipeline (bool): Fetch the next history page while the current one is
+                parsed by default (see get_parcel_history)
+            transport (Transport, optional): HTTP transport to use. Defaults to a
+                pooled RequestsTransport.
+            pool_size (int, optional): Connection pool size for the default transport
+            record_to (PageArchive or str, optional): Archive (or path to one) that
+                every raw history page is recorded to, for later offline reparsing
+            auto_relogin (bool): Log in again and retry the page when the session
+                expires in the middle of a request, instead of raising
+                AuthenticationError
+            stream (bool): Parse history pages while they download by default
+                (see get_parcel_history)
+            timeout (float or tuple, optional): Timeout in seconds for every request,
+                or a (connect, read) pair. None waits forever.
+            snapshot_dir (str, optional): Directory where the raw HTML of history
+                pages no parse strategy understands is saved, once per page layout
         """
         self.email = email
         self.password = password
-        self.session = requests.Session()
+        self.transport = transport or RequestsTransport(pool_size=pool_size or DEFAULT_POOL_SIZE)
         self.authenticated = False
+        self.auto_relogin = auto_relogin
+        self.timeout = timeout
+
+        # Serializes logins; the generation counts successful logins so requests
+        # that hit an expired session can tell whether someone already logged in again
+        self._login_lock = threading.RLock()
+        self._session_generation = 0
+
+        if store is not None and not isinstance(store, ParcelStore):
+            store = ParcelStore(store, account=email or "")
+        self.store = store
+
+        if offline and store is None:
+            raise ParcelPendingError("Offline mode requires a local store")
+        self.offline = offline
+        self._profiler = None
+
+        # Remembers the parse strategy per page layout; see parser.stats for metrics
+        self.parser = parser.ParcelParser(snapshot_dir=snapshot_dir)
+
+        if record_to is not None and not isinstance(record_to, PageArchive):
+            record_to = PageArchive(record_to)
+        self.archive = record_to
+
+        self.parse_workers = parse_workers
+        self.pipeline = pipeline
+        self.stream = stream
+
+    @property
+    def session(self):
+        """
+        requests.Session: The calling thread's session of the default transport.
+
+        None for custom transports.
+        """
+        return getattr(self.transport, "session", None)
+
+    @contextmanager
+    def profile(self, collapsed_path=None, output=None):
+        """
+        Profile the client calls made inside the block.
+
+        Prints a per-phase breakdown (login, each page's network, parse and
+        pagination check, export) with wall time, CPU time and peak memory when
+        the block exits.
+
+        Args:
+            collapsed_path (str, optional): Also sample call stacks and write them
+                to this file in the collapsed format read by flamegraph tools
+            output (file, optional): Where to print the breakdown (default: stderr).
+                Pass False to skip printing.
+
+        Yields:
+            Profiler: The profiler collecting the measurements
+        """
+        profiler = Profiler(collapsed_path=collapsed_path)
+        self._profiler = profiler
+        try:
+            with profiler:
+                yield profiler
+        finally:
+            self._profiler = None
+            if output is not False:
+                print(profiler.report(), file=output or sys.stderr)
+
+    def profile_phase(self, name):
+        """
+        Time a named phase if profiling is enabled.
+
+        Args:
+            name (str): Phase name
+
+        Returns:
+            context manager: The profiler phase, or a no-op when not profiling
+        """
+        if self._profiler is None:
+            return nullcontext()
+        return self._profiler.phase(name)
 
     def login(self, email=None, password=None):
         """
@@ -55,6 +206,48 @@ class ParcelPendingClient:
             AuthenticationError: If authentication fails
             ConnectionError: If connection to the server fails
         """
+        generation = self._session_generation
+        with self._login_lock:
+            if (
+                self._session_generation != generation
+                and self.authenticated
+                and email in (None, self.email)
+                and password in (None, self.password)
+            ):
+                # Single-flight: a concurrent call logged in while this one waited
+                logger.debug("Already logged in by a concurrent call")
+                return True
+
+            try:
+                with self.profile_phase("login"):
+                    return self._login(email, password)
+            except Exception:
+                self.authenticated = False
+                raise
+
+    def _relogin(self, stale_generation):
+        """
+        Log in again after a request found the session expired.
+
+        Single-flight: concurrent requests that hit the same expired session
+        wait for one re-login instead of each logging in.
+
+        Args:
+            stale_generation (int): Session generation the failed request was sent with
+
+        Raises:
+            AuthenticationError: If logging in again fails
+            ConnectionError: If connection to the server fails
+        """
+        with self._login_lock:
+            if self._session_generation != stale_generation:
+                logger.debug("Session already renewed by another request")
+                return
+            logger.info("Session expired, logging in again")
+            self.login()
+
+    def _login(self, email, password):
+        """Log in to the ParcelPending website; see login()."""
         email = email or self.email
         password = password or self.password
 
@@ -62,13 +255,14 @@ class ParcelPendingClient:
             raise AuthenticationError("Email and password are required")
 
         try:
-            # Clear any existing session
-            self.session = requests.Session()
-            self.authenticated = False
+            # Clear any existing session state, keeping pooled connections alive.
+            # authenticated stays set until the login fails, so concurrent
+            # requests keep going (and retry if they hit the login page).
+            self.transport.reset()
 
             # First, get the login page to extract CSRF token and form details
             logger.info("Fetching login page")
-            response = self.session.get(self.LOGIN_URL)
+            response = self.transport.get(self.LOGIN_URL, timeout=self.timeout)
             response.raise_for_status()
 
             # Parse the login page
@@ -102,7 +296,7 @@ class ParcelPendingClient:
                 if name and name not in ["username", "password", "signin", "signin_mobile"]:
                     value = input_field.get("value", "")
                     form_data[name] = value
-                    logger.debug(f"Found form field: {name} = {value}")
+                    logger.debug("Found form field: %s = %s", name, value)
 
             # Add credentials - ParcelPending uses 'username' for email field
             form_data["username"] = email
@@ -111,7 +305,11 @@ class ParcelPendingClient:
             # Add signin field - this is the submit button value
             form_data["signin"] = "signin"
 
-            logger.debug(f"Prepared form data (without password): {form_data}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Prepared form data (without password): %s",
+                    {name: value for name, value in form_data.items() if name != "password"},
+                )
 
             # Determine the form submission URL
             form_action = login_form.get("action", "")
@@ -126,10 +324,11 @@ class ParcelPendingClient:
                     login_url = f"{self.BASE_URL}/{form_action}"
 
             # Submit login form
-            logger.info(f"Submitting login form to {login_url}")
-            login_response = self.session.post(
+            logger.info("Submitting login form to %s", login_url)
+            login_response = self.transport.post(
                 login_url,
                 data=form_data,
+                timeout=self.timeout,
                 headers={
                     "Referer": self.LOGIN_URL,
                     "Content-Type": "application/x-www-form-urlencoded",
@@ -142,409 +341,660 @@ class ParcelPendingClient:
                 logger.error("Login failed - authentication error message detected")
                 raise AuthenticationError("Invalid username or password")
 
-            # Verify login success
+            # Verify login success; remember the credentials for re-login on session expiry
+            self.email = email
+            self.password = password
             self.authenticated = True
+            self._session_generation += 1
             logger.info("Login successful!")
             return True
 
         except requests.exceptions.RequestException as e:
-            logger.error(f"Connection error during login: {str(e)}")
+            logger.error("Connection error during login: %s", e)
             raise ConnectionError(f"Failed to connect to ParcelPending: {str(e)}")
         except AuthenticationError:
             raise
         except Exception as e:
-            logger.error(f"Unexpected error during login: {str(e)}")
+            logger.error("Unexpected error during login: %s", e)
             raise ParcelPendingError(f"Unexpected error during login: {str(e)}")
 
-    def get_parcel_history(self, start_date, end_date):
+    def get_parcel_history(
+        self,
+        start_date,
+        end_date,
+        parse_workers=None,
+        pipeline=None,
+        stream=None,
+        resume=None,
+        checkpoint_path=None,
+        filters=None,
+        on_page=None,
+        deadline=None,
+        cancel=None,
+        partial=False,
+    ):
         """
         Retrieve parcel history within a specified date range.
 
+        Progress is checkpointed after every page. If the fetch fails, the raised
+        error carries the checkpoint as ``resume_token``; passing it back as
+        ``resume=`` continues from the failed page instead of page 1.
+
         Args:
             start_date (str or datetime): Start date for parcel history
             end_date (str or datetime): End date for parcel history
+            parse_workers (int, optional): Parse pages in a pool of this many worker
+                processes while the next pages are downloaded. Useful for large
+                histories, where HTML parsing dominates. Defaults to the value
+                given to the client.
+            pipeline (bool, optional): Download the next page in a background thread
+                while the current page is parsed. Ignored when parse_workers is set.
+                Defaults to the value given to the client.
+            stream (bool, optional): Read each page in chunks and parse its parcel
+                rows as they arrive, overlapping download and parsing within a
+                page and holding one row at a time instead of the whole page.
+                Ignored when parse_workers or pipeline is set. Defaults to the
+                value given to the client.
+            resume (HistoryCheckpoint or str, optional): Resume token from a failed
+                fetch of the same date range, or the path of a saved checkpoint
+            checkpoint_path (str, optional): Save the checkpoint to this file after
+                every page, so a backfill can be resumed after the process exits.
+                The file is removed once the fetch completes.
+            filters (str or ParcelFilter, optional): Filter expression the parcels
+                must match, e.g. ``courier in (USPS, Amazon) and status != "picked up"``.
+                Parts the website can filter on are sent as query parameters.
+            on_page (callable, optional): Called with the (filtered) parcels of every
+                page as soon as it is parsed, in page order, to stream results.
+                When resuming, first called with the parcels already fetched.
+            deadline (float, optional): Seconds the whole fetch may take. The time
+                left is spread across the remaining pages as request timeouts.
+            cancel (CancelHandle, optional): Handle to abort the fetch from another
+                thread
+            partial (bool): On timeout or cancellation, return the parcels fetched
+                so far instead of raising. The checkpoint file, if any, is kept.
 
         Returns:
             list: List of parcels within the specified date range
 
         Raises:
-            AuthenticationError: If not logged in
+            AuthenticationError: If not logged in, or the session expired and
+                logging in again failed
             ConnectionError: If connection to the server fails
+            TimeoutError: If a request timed out or the deadline passed
+            CancelledError: If the fetch was cancelled
+            ParcelPendingError: If the resume token belongs to a different request
+            FilterError: If the filter expression is invalid
         """
+        parcel_filter = compile_filter(filters) if filters is not None else None
+
+        if self.offline:
+            parcels = self.store.query(start_date, end_date)
+            if parcel_filter is not None:
+                parcels = parcel_filter.apply(parcels)
+            if on_page is not None:
+                on_page(parcels)
+            return parcels
+
         if not self.authenticated:
             raise AuthenticationError("You must login before retrieving parcel history")
 
+        params = self._history_params(start_date, end_date, parcel_filter)
+        start_date = params["parcel_delivery_date_start"]
+        end_date = params["parcel_delivery_date_end"]
+
+        if resume is None:
+            checkpoint = HistoryCheckpoint(params, path=checkpoint_path)
+        else:
+            checkpoint = resume
+            if not isinstance(checkpoint, HistoryCheckpoint):
+                checkpoint = HistoryCheckpoint.load(checkpoint)
+            if not checkpoint.matches(params):
+                raise ParcelPendingError("Resume token does not match this parcel history request")
+            if checkpoint_path is not None:
+                checkpoint.path = str(checkpoint_path)
+            logger.info("Resuming parcel history at page %s", checkpoint.next_page)
+
+        checkpoint.on_page = None
+        if on_page is not None:
+            if parcel_filter is not None:
+                checkpoint.on_page = lambda parcels: on_page(parcel_filter.apply(parcels))
+            else:
+                checkpoint.on_page = on_page
+            if checkpoint.parcels:
+                checkpoint.on_page(checkpoint.parcels)
+
+        control = FetchControl(self.timeout, deadline, cancel)
+        interrupted = None
+
+        try:
+            logger.info(
+                "Requesting parcel history with delivery dates from %s to %s", start_date, end_date
+            )
+
+            if parse_workers is None:
+                parse_workers = self.parse_workers
+            if pipeline is None:
+                pipeline = self.pipeline
+            if stream is None:
+                stream = self.stream
+
+            if parse_workers:
+                page_count = self._fetch_history_with_pool(
+                    params, checkpoint, parse_workers, control
+                )
+            elif pipeline:
+                page_count = self._fetch_history_pipelined(params, checkpoint, control)
+            elif stream:
+                page_count = self._fetch_history_streamed(params, checkpoint, control)
+            else:
+                page_count = self._fetch_history(params, checkpoint, control)
+
+        except requests.exceptions.Timeout as e:
+            interrupted = TimeoutError(
+                f"Timed out retrieving parcel history: {str(e)}", resume_token=checkpoint
+            )
+            interrupted.__cause__ = e
+        except (TimeoutError, CancelledError) as e:
+            e.resume_token = checkpoint
+            interrupted = e
+        except (AuthenticationError, ConnectionError) as e:
+            # Re-login failed while fetching
+            e.resume_token = checkpoint
+            raise
+        except requests.exceptions.RequestException as e:
+            logger.error("Connection error retrieving parcel history: %s", e)
+            raise ConnectionError(
+                f"Failed to retrieve parcel history: {str(e)}", resume_token=checkpoint
+            )
+        except Exception as e:
+            logger.error("Unexpected error retrieving parcel history: %s", e)
+            raise ParcelPendingError(
+                f"Failed to retrieve parcel history: {str(e)}", resume_token=checkpoint
+            )
+
+        if interrupted is not None:
+            if not partial:
+                logger.error(str(interrupted))
+                raise interrupted
+            logger.warning(
+                "%s; returning the %s parcels fetched so far", interrupted, len(checkpoint.parcels)
+            )
+            page_count = checkpoint.next_page - 1
+
+        all_parcels = checkpoint.parcels
+        checkpoint.on_page = None
+        if interrupted is None:
+            checkpoint.discard()
+        logger.info(
+            "Retrieved a total of %s parcels across %s page(s)", len(all_parcels), page_count
+        )
+
+        if parcel_filter is not None:
+            all_parcels = parcel_filter.apply(all_parcels)
+            logger.debug("%s parcels match %r", len(all_parcels), parcel_filter.expression)
+
+        if self.store is not None:
+            self.store.save_parcels(all_parcels)
+
+        return all_parcels
+
+    def _history_params(self, start_date, end_date, parcel_filter=None):
+        """
+        Build the query parameters of a parcel history request.
+
+        Args:
+            start_date (str or datetime): Start date in MM/DD/YYYY format or datetime object
+            end_date (str or datetime): End date in MM/DD/YYYY format or datetime object
+            parcel_filter (ParcelFilter, optional): Filter whose server_params to apply
+
+        Returns:
+            dict: Base query parameters for all pages of the request
+        """
         # Convert datetime objects to strings in MM/DD/YYYY format
         if isinstance(start_date, datetime):
             start_date = start_date.strftime("%m/%d/%Y")
         if isinstance(end_date, datetime):
             end_date = end_date.strftime("%m/%d/%Y")
 
-        try:
-            # Base parameters for all requests
-            params = {
-                "occupant_first_name": "",
-                "occupant_last_name": "",
-                "occupant_email": "",
-                "parcel_delivery_date_start": start_date,
-                "parcel_delivery_date_end": end_date,
-                "parcel_pickup_date_start": "",
-                "parcel_pickup_date_end": "",
-                "parcel_id": "",
-                "tracking_number": "",
-                "package_code": "",
-                "order_number": "",
-                "package_status": "",
-                "pick_up_origin": "",
-                "sort_by": "deliveryDate",
-                "sort_order": "DESC",
-            }
+        # Base parameters for all requests
+        params = {
+            "occupant_first_name": "",
+            "occupant_last_name": "",
+            "occupant_email": "",
+            "parcel_delivery_date_start": start_date,
+            "parcel_delivery_date_end": end_date,
+            "parcel_pickup_date_start": "",
+            "parcel_pickup_date_end": "",
+            "parcel_id": "",
+            "tracking_number": "",
+            "package_code": "",
+            "order_number": "",
+            "package_status": "",
+            "pick_up_origin": "",
+            "sort_by": "deliveryDate",
+            "sort_order": "DESC",
+        }
+        if parcel_filter is not None:
+            params.update(parcel_filter.server_params)
+        return params
+
+    def _fetch_page(self, params, page, control=None):
+        """
+        Download one parcel history page.
 
-            logger.info(
-                f"Requesting parcel history with delivery dates from {start_date} to {end_date}"
-            )
+        If the session has expired, the website answers with (or redirects to) its
+        login page. The client then logs in again and retries the page once.
 
-            all_parcels = []
-            current_page = 1
-            has_more_pages = True
+        Args:
+            params (dict): Base query parameters for the history request
+            page (int): Page number to fetch
+            control (FetchControl, optional): Timeouts, deadline and cancellation
 
-            while has_more_pages:
-                # Add page parameter for pages after the first
-                page_params = params.copy()
-                if current_page > 1:
-                    page_params["page"] = current_page
+        Returns:
+            str: Raw HTML of the page
 
-                logger.debug(f"Fetching page {current_page}")
+        Raises:
+            AuthenticationError: If the session expired and auto_relogin is off,
+                or the login page is still served after logging in again
+        """
+        page_params = self._page_params(params, page)
+        control = control or FetchControl(self.timeout)
+        logger.debug("Fetching page %s", page)
+
+        def download():
+            with self.profile_phase(f"page {page} network"):
+                response = self.transport.get(
+                    self.PARCEL_HISTORY_URL, params=page_params, timeout=control.timeout(page)
+                )
+                expired = self._is_login_response(response)
+                if not expired:
+                    response.raise_for_status()
+            return expired, response.text
+
+        return self._retry_on_expiry(page, download)
+
+    def _stream_page(self, params, page, control=None):
+        """
+        Download one parcel history page and parse it while it downloads.
 
-                response = self.session.get(self.PARCEL_HISTORY_URL, params=page_params)
-                response.raise_for_status()
+        The response is read in chunks that are fed to a
+        parser.StreamingPageParser, which parses every parcel row as soon as it
+        is complete. Session expiry is handled like in _fetch_page.
 
-                soup = BeautifulSoup(response.text, "html.parser")
+        Args:
+            params (dict): Base query parameters for the history request
+            page (int): Page number to fetch
+            control (FetchControl, optional): Timeouts, deadline and cancellation,
+                also checked between chunks
 
-                # Parse parcels from current page
-                parcels = self._parse_parcels(soup)
-                all_parcels.extend(parcels)
+        Returns:
+            tuple: ((parcels, has_next, total, strategy) like parser.parse_page, html),
+                where html is the raw page when recording to an archive, else None
+        """
+        page_params = self._page_params(params, page)
+        control = control or FetchControl(self.timeout)
+        logger.debug("Streaming page %s", page)
 
-                logger.debug(f"Found {len(parcels)} parcels on page {current_page}")
+        def download():
+            page_parser = parser.StreamingPageParser(
+                page, self.parser, keep_html=self.archive is not None
+            )
+            parcels = []
+            with self.profile_phase(f"page {page} stream"):
+                response = self.transport.get(
+                    self.PARCEL_HISTORY_URL,
+                    params=page_params,
+                    stream=True,
+                    timeout=control.timeout(page),
+                )
+                try:
+                    if self._is_redirected_to_login(response):
+                        return True, None
+                    response.raise_for_status()
+
+                    for chunk in self._iter_text(response):
+                        control.check(page)
+                        parcels.extend(page_parser.parse_chunk(chunk))
+                        if page_parser.login_page:
+                            return True, None
+                finally:
+                    close = getattr(response, "close", None)
+                    if close is not None:
+                        close()
+
+                remaining, has_next, total, strategy = page_parser.finish()
+            parcels.extend(remaining)
+            return False, (page_parser, (parcels, has_next, total, strategy))
+
+        page_parser, result = self._retry_on_expiry(page, download)
+        return result, page_parser.html
+
+    def _complete_page(self, checkpoint, params, page, parcels, html=None):
+        """
+        Record a completed page in the checkpoint and, when recording, the archive.
 
-                # Check if there are more pages
-                has_more_pages = self._has_next_page(soup, current_page)
+        Pages are archived here rather than when downloaded, so pages fetched
+        speculatively and then discarded never end up in the archive.
 
-                if has_more_pages:
-                    current_page += 1
-                else:
-                    logger.debug("No more pages found")
+        Args:
+            checkpoint (HistoryCheckpoint): Progress to update
+            params (dict): Base query parameters for the history request
+            page (int): Page number that was completed
+            parcels (list): Parcels parsed from the page
+            html (str, optional): Raw HTML of the page
+        """
+        if self.archive is not None and html is not None:
+            self.archive.record(params, page, html)
+        checkpoint.complete_page(page, parcels)
+
+    @staticmethod
+    def _iter_text(response):
+        """Decode a streamed response body chunk by chunk."""
+        iter_content = getattr(response, "iter_content", None)
+        if iter_content is None:
+            # Transports without streaming support deliver the whole body
+            yield response.text
+            return
+
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+        for chunk in iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    @staticmethod
+    def _page_params(params, page):
+        """Add the page parameter for pages after the first."""
+        page_params = params.copy()
+        if page > 1:
+            page_params["page"] = page
+        return page_params
+
+    def _retry_on_expiry(self, page, attempt):
+        """
+        Run a page request, logging in again and retrying once if the session expired.
 
-            logger.info(f"Retrieved a total of {len(all_parcels)} parcels across {current_page} page(s)")
-            return all_parcels
+        Args:
+            page (int): Page number, for messages
+            attempt (callable): Sends the request and returns (expired, result)
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Connection error retrieving parcel history: {str(e)}")
-            raise ConnectionError(f"Failed to retrieve parcel history: {str(e)}")
-        except Exception as e:
-            logger.error(f"Unexpected error retrieving parcel history: {str(e)}")
-            raise ParcelPendingError(f"Failed to retrieve parcel history: {str(e)}")
+        Returns:
+            The result of the successful attempt
 
-    def _has_next_page(self, soup, current_page):
+        Raises:
+            AuthenticationError: If the session expired and auto_relogin is off,
+                or the login page is still served after logging in again
         """
-        Determine if there is a next page of results.
+        relogged_in = False
+        while True:
+            generation = self._session_generation
+            expired, result = attempt()
+            if not expired:
+                return result
+            if not self.auto_relogin:
+                raise AuthenticationError(f"Session expired while fetching page {page}")
+            if relogged_in:
+                raise AuthenticationError(
+                    f"Still served the login page for page {page} after logging in again"
+                )
+            logger.warning("Session expired while fetching page %s", page)
+            self._relogin(generation)
+            relogged_in = True
+
+    def _is_login_response(self, response):
+        """
+        Check whether a history request was answered with the login page.
 
         Args:
-            soup (BeautifulSoup): Parsed HTML of the current page
-            current_page (int): Current page number
+            response: Transport response
 
         Returns:
-            bool: True if there is a next page, False otherwise
+            bool: True if the session is no longer valid
         """
-        try:
-            # Look for pagination elements
-            pagination = soup.find("div", class_="dataTables_paginate")
-            if not pagination:
-                # Try alternative pagination elements
-                pagination = soup.find("ul", class_="pagination")
-
-            if pagination:
-                # Look for "next" button/link that is not disabled
-                next_link = pagination.find("li", class_="next")
-                if next_link and "disabled" not in next_link.get("class", []):
-                    return True
-
-                # Check if there's a link to a page higher than current_page
-                page_links = pagination.find_all("a")
-                for link in page_links:
-                    if link.text.isdigit() and int(link.text) > current_page:
-                        return True
-
-                # Check if we can determine the total number of entries
-                info_div = soup.find("div", class_="dataTables_info")
-                if info_div:
-                    info_text = info_div.get_text(strip=True)
-                    matches = re.search(r'Showing \d+ to \d+ of (\d+) entries', info_text)
-                    if matches:
-                        total_entries = int(matches.group(1))
-                        entries_per_page = 20  # ParcelPending seems to use 20 entries per page
-                        return current_page * entries_per_page < total_entries
-
-            return False
-        except Exception as e:
-            logger.warning(f"Error checking for next page: {str(e)}")
-            # If we can't determine, assume no more pages
-            return False
+        return self._is_redirected_to_login(response) or parser.is_login_page(response.text)
 
-    def _parse_parcels(self, soup):
+    @staticmethod
+    def _is_redirected_to_login(response):
+        """Check the status and final URL of a response for an expired session."""
+        if response.status_code == 401:
+            return True
+        path = urlparse(getattr(response, "url", "") or "").path.rstrip("/")
+        return path.endswith("/login")
+
+    def _fetch_history_streamed(self, params, checkpoint, control):
         """
-        Parse parcels from the HTML soup.
+        Fetch history pages one after the other, parsing each while it downloads.
 
         Args:
-            soup (BeautifulSoup): Parsed HTML
+            params (dict): Base query parameters for the history request
+            checkpoint (HistoryCheckpoint): Progress to start from and to update
 
         Returns:
-            list: Extracted parcels with structured data
-        """
-        parcels = []
-
-        # First, try to parse from table rows which seems to be the actual structure
-        parcel_rows = soup.find_all("tr")
-        if parcel_rows:
-            logger.debug(f"Found {len(parcel_rows)} table rows to check for parcels")
-            # Filter rows that contain package info
-            valid_rows = [row for row in parcel_rows if row.find(string=lambda t: t and "Package Code:" in t)]
-            if valid_rows:
-                logger.debug(f"Found {len(valid_rows)} rows containing package information")
-                return self._parse_parcels_from_table_rows(valid_rows)
-
-        # If table parsing fails, fall back to original method and alternatives
-        parcel_sections = soup.find_all("div", class_="parcel-section")
-
-        # If that doesn't work, try some alternative approaches
-        if not parcel_sections:
-            logger.debug("No parcel sections found with class='parcel-section', trying alternatives")
-
-            # Look for generic containers that might contain parcel information
-            parcel_containers = soup.find_all(["div", "section", "article"],
-                                              class_=lambda c: c and ("parcel" in c.lower()
-                                              or "package" in c.lower()
-                                              or "delivery" in c.lower()))
-
-            if parcel_containers:
-                logger.debug(f"Found {len(parcel_containers)} potential parcel containers")
-                parcel_sections = parcel_containers
-            else:
-                package_code_elements = soup.find_all(string=lambda t: t and "Package Code:" in t)
-                if package_code_elements:
-                    logger.debug(f"Found {len(package_code_elements)} package code elements")
-                    return self._parse_parcels_from_code_elements(package_code_elements)
-                else:
-                    logger.debug("No parcel data could be found in any expected format")
-                    html_snippet = str(soup)[:1000] + "..." if len(str(soup)) > 1000 else str(soup)
-                    logger.debug(f"HTML snippet: {html_snippet}")
-                    return parcels
-
-        logger.debug(f"Found {len(parcel_sections)} parcel sections")
-
-        # Process each parcel section
-        for section in parcel_sections:
-            parcel = {}
-
-            # Extract package code
-            package_code_div = section.find(string=lambda t: t and "Package Code:" in t)
-            if package_code_div:
-                package_code = package_code_div.strip()
-                package_code = package_code.replace("Package Code:", "").strip()
-                parcel["package_code"] = package_code
-
-            # Extract status - need to find the span after "Package Status:"
-            status_text = section.find(string=lambda t: t and "Package Status:" in t)
-            if status_text:
-                # Find the parent element containing "Package Status:"
-                parent = status_text.parent
-                # Look for the span that contains the actual status
-                status_span = parent.find("span")
-                if status_span:
-                    status = status_span.get_text(strip=True)
-                    parcel["status"] = status
-                else:
-                    # Fallback to original approach
-                    status = status_text.strip().replace("Package Status:", "").strip()
-                    parcel["status"] = status
-
-            # Extract locker box and size
-            locker_box_div = section.find(string=lambda t: t and "Locker Box #:" in t)
-            if locker_box_div:
-                locker_text = locker_box_div.strip()
-                locker_text = locker_text.replace("Locker Box #:", "").strip()
-                size_match = re.search(r'\(([^)]+)\)', locker_text)
-                locker_number = locker_text.split("(")[0].strip() if "(" in locker_text else locker_text
-                parcel["locker_box"] = locker_number
-                if size_match:
-                    parcel["size"] = size_match.group(1)
-
-            # Extract courier
-            courier_div = section.find(string=lambda t: t and "Courier:" in t)
-            if courier_div:
-                courier = courier_div.strip()
-                courier = courier.replace("Courier:", "").strip()
-                parcel["courier"] = courier
-
-            if parcel:  # Only add if we found any data
-                parcels.append(parcel)
-
-        logger.info(f"Found {len(parcels)} parcels")
-        return parcels
-
-    def _parse_parcels_from_table_rows(self, rows):
-        """
-        Parse parcels from table rows that match the current HTML structure.
+            int: Number of the last page fetched
+        """
+        current_page = checkpoint.next_page
+        while True:
+            (parcels, has_next, total, _), html = self._stream_page(params, current_page, control)
+            control.learn_total(total)
+            logger.debug("Found %s parcels on page %s", len(parcels), current_page)
+            self._complete_page(checkpoint, params, current_page, parcels, html)
+
+            if not has_next:
+                logger.debug("No more pages found")
+                return current_page
+            current_page += 1
+
+    def _fetch_history(self, params, checkpoint, control):
+        """
+        Fetch and parse history pages one after the other.
 
         Args:
-            rows (list): List of table row elements containing parcel data
+            params (dict): Base query parameters for the history request
+            checkpoint (HistoryCheckpoint): Progress to start from and to update
 
         Returns:
-            list: Extracted parcels
-        """
-        parcels = []
-
-        for row in rows:
-            parcel = {}
-
-            # Extract package code
-            package_code_text = row.find(string=lambda t: t and "Package Code:" in t)
-            if package_code_text:
-                package_code = package_code_text.strip().replace("Package Code:", "").strip()
-                parcel["package_code"] = package_code
-
-            # Extract package status - need to examine the structure more carefully
-            status_div = row.find(string=lambda t: t and "Package Status:" in t)
-            if status_div:
-                # Try to find the status in a span element within the same parent cell
-                parent_cell = status_div.find_parent("td")
-                if parent_cell:
-                    status_span = parent_cell.find("span", id=lambda i: i and i.startswith("status-"))
-                    if status_span:
-                        status = status_span.get_text(strip=True)
-                        parcel["status"] = status
-                    else:
-                        # Fallback: get text after "Package Status:" string
-                        status_text = status_div.strip().replace("Package Status:", "").strip()
-                        if status_text:
-                            parcel["status"] = status_text
-
-            # Extract locker information
-            locker_text = row.find(string=lambda t: t and "Locker Box #:" in t)
-            if locker_text:
-                locker_str = locker_text.strip().replace("Locker Box #:", "").strip()
-                # Check for size in parentheses
-                size_match = re.search(r'\(([^)]+)\)', locker_str)
-                if size_match:
-                    parcel["size"] = size_match.group(1)
-                    parcel["locker_box"] = locker_str.split("(")[0].strip()
-                else:
-                    parcel["locker_box"] = locker_str
-
-            # Extract courier - traverse up to find containing element for more context
-            courier_text = row.find(string=lambda t: t and "Courier:" in t)
-            if courier_text:
-                # Look for the text immediately following the "Courier:" label
-                courier_parent = courier_text.find_parent()
-                if courier_parent:
-                    # Get the full text and extract what comes after "Courier:"
-                    full_text = courier_parent.get_text(strip=True)
-                    courier_match = re.search(r'Courier:(.*?)(?:$|Tracking:|Locker)', full_text)
-                    if courier_match:
-                        courier = courier_match.group(1).strip()
-                        parcel["courier"] = courier
-                    else:
-                        # Fallback to basic text extraction
-                        courier = full_text.replace("Courier:", "").strip()
-                        parcel["courier"] = courier
-
-            # Extract tracking number if available
-            tracking_text = row.find(string=lambda t: t and "Tracking:" in t)
-            if tracking_text:
-                tracking = tracking_text.strip().replace("Tracking:", "").strip()
-                parcel["tracking_number"] = tracking
-
-            # Extract delivery date from the parcel-activity cell
-            activity_cell = row.find("td", class_="parcel-activity")
-            if activity_cell:
-                delivery_text = activity_cell.get_text()
-                delivery_match = re.search(r'Delivered:\s+(\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2}:\d{2}\s+[ap]m)', delivery_text)
-                if delivery_match:
-                    parcel["delivery_date"] = delivery_match.group(1)
-
-            if parcel:  # Only add if we found any data
-                parcels.append(parcel)
-
-        logger.info(f"Found {len(parcels)} parcels from table rows")
-        return parcels
-
-    def _parse_parcels_from_code_elements(self, code_elements):
-        """
-        Parse parcels starting from package code elements and working outward.
+            int: Number of the last page fetched
+        """
+        current_page = checkpoint.next_page
+        has_more_pages = True
+
+        while has_more_pages:
+            html = self._fetch_page(params, current_page, control)
+
+            with self.profile_phase(f"page {current_page} parse"):
+                soup = BeautifulSoup(html, "html.parser")
+
+                # Parse parcels from current page
+                parcels = self._parse_parcels(soup, html)
+
+            logger.debug("Found %s parcels on page %s", len(parcels), current_page)
+
+            # Check if there are more pages
+            with self.profile_phase(f"page {current_page} pagination"):
+                has_more_pages = self._has_next_page(soup, current_page)
+            control.learn_total(parser.total_entries(soup))
+            self._complete_page(checkpoint, params, current_page, parcels, html)
+
+            if has_more_pages:
+                current_page += 1
+            else:
+                logger.debug("No more pages found")
+
+        return current_page
+
+    def _fetch_history_pipelined(self, params, checkpoint, control, prefetch=1):
+        """
+        Fetch history pages in a background thread while parsing in this one.
+
+        The producer thread speculatively downloads up to ``prefetch`` pages ahead
+        of the page being parsed. Once a page turns out to be the last one, any
+        speculative page is discarded.
 
         Args:
-            code_elements (list): List of elements containing package codes
+            params (dict): Base query parameters for the history request
+            checkpoint (HistoryCheckpoint): Progress to start from and to update
+            prefetch (int): Maximum number of pages downloaded ahead of parsing
 
         Returns:
-            list: Extracted parcels
+            int: Number of the last page fetched
         """
-        parcels = []
+        pages = queue.Queue(maxsize=prefetch)
+        slots = threading.BoundedSemaphore(prefetch)
+        stop = threading.Event()
+
+        def produce():
+            page = checkpoint.next_page
+            while not stop.is_set():
+                # Wait for a free slot so we never run more than `prefetch` pages ahead
+                while not slots.acquire(timeout=0.05):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+                try:
+                    pages.put((page, self._fetch_page(params, page, control), None))
+                except Exception as e:
+                    pages.put((page, None, e))
+                    return
+                page += 1
+
+        producer = threading.Thread(target=produce, name="parcelpending-prefetch", daemon=True)
+        producer.start()
 
-        for element in code_elements:
-            parcel = {}
+        try:
+            while True:
+                current_page, html, error = pages.get()
+                slots.release()
+                if error is not None:
+                    raise error
 
-            # Get the package code
-            code_text = element.strip()
-            package_code = code_text.replace("Package Code:", "").strip()
-            parcel["package_code"] = package_code
+                with self.profile_phase(f"page {current_page} parse"):
+                    soup = BeautifulSoup(html, "html.parser")
+                    parcels = self._parse_parcels(soup, html)
 
-            # Try to find a common parent element that contains all parcel info
-            parent = element.parent
-            for _ in range(3):  # Try up to 3 levels up
-                if not parent:
-                    break
+                logger.debug("Found %s parcels on page %s", len(parcels), current_page)
 
-                # Look for other parcel attributes within this parent
-                for label, key in [
-                    ("Package Status:", "status"),
-                    ("Locker Box #:", "locker_box"),
-                    ("Courier:", "courier")
-                ]:
-                    status_element = parent.find(string=lambda t: t and label in t)
-                    if status_element:
-                        value = status_element.strip().replace(label, "").strip()
-                        parcel[key] = value
+                with self.profile_phase(f"page {current_page} pagination"):
+                    has_more_pages = self._has_next_page(soup, current_page)
+                control.learn_total(parser.total_entries(soup))
+                self._complete_page(checkpoint, params, current_page, parcels, html)
 
-                # If we found a locker box, check for size in parentheses
-                if "locker_box" in parcel:
-                    locker_text = parcel["locker_box"]
-                    size_match = re.search(r'\(([^)]+)\)', locker_text)
-                    if size_match:
-                        parcel["size"] = size_match.group(1)
-                        parcel["locker_box"] = locker_text.split("(")[0].strip()
+                if not has_more_pages:
+                    logger.debug("No more pages found")
+                    return current_page
+        finally:
+            stop.set()
+            # Wait for an in-flight speculative request so the transport is idle again
+            producer.join()
+            while not pages.empty():
+                discarded_page = pages.get_nowait()[0]
+                logger.debug("Discarding speculatively fetched page %s", discarded_page)
+
+    def _fetch_history_with_pool(self, params, checkpoint, workers, control):
+        """
+        Fetch history pages while a process pool parses the pages already downloaded.
 
-                parent = parent.parent
+        The first page is parsed in-process to learn the total number of entries
+        and the page size. The remaining pages are then handed to the pool as soon
+        as they arrive and their results are reassembled in page order. If the
+        page doesn't report a total, pagination has to be decided page by page and
+        parsing stays in-process; the same goes for any pages found after the
+        expected last one.
+
+        Args:
+            params (dict): Base query parameters for the history request
+            checkpoint (HistoryCheckpoint): Progress to start from and to update
+            workers (int): Number of worker processes
+
+        Returns:
+            int: Number of the last page fetched
+        """
+        first_page = checkpoint.next_page
+        html = self._fetch_page(params, first_page, control)
+        with self.profile_phase(f"page {first_page} parse"):
+            parcels, has_next, total, _ = parser.parse_page(html, first_page, self.parser)
+        control.learn_total(total)
+        self._complete_page(checkpoint, params, first_page, parcels, html)
+        if not has_next:
+            return first_page
+
+        # A page followed by another one is full, so it tells the page size
+        page_size = len(parcels)
+        if total is None or not page_size:
+            logger.debug("Total entries or page size unknown, parsing pages in-process")
+            return self._fetch_history(params, checkpoint, control)
+
+        page_count = max(first_page + 1, math.ceil(total / page_size))
+        logger.debug(
+            "Parsing %s more page(s) with %s worker process(es)", page_count - first_page, workers
+        )
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = []
+            # Raw pages are only kept until completed when they are to be archived
+            htmls = []
+            try:
+                for page in range(first_page + 1, page_count + 1):
+                    html = self._fetch_page(params, page, control)
+                    futures.append(
+                        pool.submit(
+                            parser.parse_page, html, page, None, self.parser.snapshot_dir
+                        )
+                    )
+                    htmls.append(html if self.archive is not None else None)
+            finally:
+                # Complete every page already handed to the pool, in page order, so
+                # a failed download still checkpoints the pages before it
+                strategies = []
+                for page, (future, html) in enumerate(zip(futures, htmls), first_page + 1):
+                    parcels, has_next, _, strategy = future.result()
+                    self._complete_page(checkpoint, params, page, parcels, html)
+                    strategies.append(strategy)
+                self.parser.count_strategies(strategies)
+
+        if has_next:
+            logger.debug("Page %s isn't the last one, parsing the rest in-process", page_count)
+            return self._fetch_history(params, checkpoint, control)
+        return page_count
+
+    def _has_next_page(self, soup, current_page):
+        """
+        Determine if there is a next page of results.
+
+        See parser.has_next_page.
+        """
+        return parser.has_next_page(soup, current_page)
 
-            if parcel:  # Only add if we found any data
-                parcels.append(parcel)
+    def _parse_parcels(self, soup, html=None):
+        """
+        Parse parcels from the HTML soup.
 
-        logger.info(f"Found {len(parcels)} parcels from code elements")
-        return parcels
+        The parse strategy is chosen by the client's ParcelParser, which
+        remembers what worked for each page layout. See parser.ParcelParser.
+        """
+        return self.parser.parse(soup, html)
 
-    def get_active_parcels(self, days=30):
+    def get_active_parcels(self, days=30, **kwargs):
         """
         Get parcels that haven't been picked up yet.
 
         Args:
             days (int): Number of days to look back for active parcels
+            **kwargs: Passed to get_parcel_history (e.g. deadline, cancel)
 
         Returns:
             list: Active parcels awaiting pickup
         """
+        if self.offline:
+            return self.store.get_active_parcels(days=days)
+
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
 
-        all_parcels = self.get_parcel_history(start_date, end_date)
+        all_parcels = self.get_parcel_history(start_date, end_date, **kwargs)
 
         # Filter for parcels that haven't been picked up
         active_parcels = [
@@ -555,21 +1005,25 @@ class ParcelPendingClient:
 
         return active_parcels
 
-    def get_parcels_by_courier(self, courier_name, days=30):
+    def get_parcels_by_courier(self, courier_name, days=30, **kwargs):
         """
         Get parcels delivered by a specific courier.
 
         Args:
             courier_name (str): Name of the courier (e.g., "USPS", "Amazon")
             days (int): Number of days to look back
+            **kwargs: Passed to get_parcel_history (e.g. deadline, cancel)
 
         Returns:
             list: Parcels delivered by the specified courier
         """
+        if self.offline:
+            return self.store.get_parcels_by_courier(courier_name, days=days)
+
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
 
-        all_parcels = self.get_parcel_history(start_date, end_date)
+        all_parcels = self.get_parcel_history(start_date, end_date, **kwargs)
 
         # Filter for parcels from the specified courier
         courier_parcels = [
@@ -580,21 +1034,25 @@ class ParcelPendingClient:
 
         return courier_parcels
 
-    def get_parcel_by_code(self, package_code, days=90):
+    def get_parcel_by_code(self, package_code, days=90, **kwargs):
         """
         Find a specific parcel by its package code.
 
         Args:
             package_code (str): The package code to search for
             days (int): Number of days to look back
+            **kwargs: Passed to get_parcel_history (e.g. deadline, cancel)
 
         Returns:
             dict or None: The parcel if found, None otherwise
         """
+        if self.offline:
+            return self.store.get_parcel_by_code(package_code, days=days)
+
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
 
-        all_parcels = self.get_parcel_history(start_date, end_date)
+        all_parcels = self.get_parcel_history(start_date, end_date, **kwargs)
 
         # Look for the package code
         for parcel in all_parcels:
@@ -603,6 +1061,224 @@ class ParcelPendingClient:
 
         return None
 
+    def count_parcels(self, start_date, end_date, filters=None, **kwargs):
+        """
+        Count the parcels in a date window without downloading every page.
+
+        When the website applies the whole filter itself (no filter, or only
+        package code, tracking and order number equalities), only page 1 is
+        downloaded and its total entry count is returned. Other filters need
+        every parcel checked, so the history is fetched.
+
+        Args:
+            start_date (str or datetime): Start date in MM/DD/YYYY format or datetime object
+            end_date (str or datetime): End date in MM/DD/YYYY format or datetime object
+            filters (str or ParcelFilter, optional): Filter expression
+            **kwargs: Passed to get_parcel_history when the history is fetched
+
+        Returns:
+            int: Number of matching parcels
+
+        Raises:
+            AuthenticationError: If not logged in
+            ConnectionError: If connection to the server fails
+            FilterError: If the filter expression is invalid
+        """
+        parcel_filter = compile_filter(filters) if filters is not None else None
+
+        if not self.offline and (parcel_filter is None or parcel_filter.pushed_down):
+            count = self._count_on_server(start_date, end_date, parcel_filter)
+            if count is not None:
+                return count
+
+        return len(self.get_parcel_history(start_date, end_date, filters=parcel_filter, **kwargs))
+
+    def _count_on_server(self, start_date, end_date, parcel_filter=None):
+        """
+        Read the number of parcels of a history query from its first page.
+
+        Args:
+            start_date (str or datetime): Start date of the window
+            end_date (str or datetime): End date of the window
+            parcel_filter (ParcelFilter, optional): Filter the website applies completely
+
+        Returns:
+            int or None: Total entries, None if page 1 doesn't tell
+        """
+        if not self.authenticated:
+            raise AuthenticationError("You must login before counting parcels")
+
+        params = self._history_params(start_date, end_date, parcel_filter)
+        try:
+            html = self._fetch_page(params, 1)
+        except (AuthenticationError, ConnectionError):
+            raise
+        except requests.exceptions.RequestException as e:
+            logger.error("Connection error counting parcels: %s", e)
+            raise ConnectionError(f"Failed to count parcels: {str(e)}")
+
+        soup = BeautifulSoup(html, "html.parser")
+        total = parser.total_entries(soup)
+        if total is None and not self._has_next_page(soup, 1):
+            # A single page without an entry count: count its parcels
+            total = len(self._parse_parcels(soup, html))
+        logger.debug(
+            "Page 1 of %s - %s reports %s entries",
+            params["parcel_delivery_date_start"],
+            params["parcel_delivery_date_end"],
+            total,
+        )
+        return total
+
+    def get_summary(self, start_date, end_date, counts=None, workers=None):
+        """
+        Count parcels for several filters at once, e.g. for a dashboard.
+
+        If every count is one the website can answer from page 1 of a query
+        (see count_parcels), those pages are read concurrently. Otherwise the
+        window has to be downloaded anyway, so that single download answers
+        every count, without extra page 1 requests.
+
+        With the default counts, "active" is counted as "total" minus
+        "picked_up", so only page 1 of those two queries is read.
+
+        Args:
+            start_date (str or datetime): Start date in MM/DD/YYYY format or datetime object
+            end_date (str or datetime): End date in MM/DD/YYYY format or datetime object
+            counts (dict, optional): Filter expression (None for all parcels) by
+                count name. Defaults to SUMMARY_COUNTS.
+            workers (int, optional): Maximum number of concurrent queries
+
+        Returns:
+            dict: Number of matching parcels by count name, in the order of ``counts``
+
+        Raises:
+            AuthenticationError: If not logged in
+            ConnectionError: If connection to the server fails
+            FilterError: If a filter expression is invalid
+        """
+        differences = {}
+        if counts is None:
+            counts = SUMMARY_COUNTS
+            if not self.offline:
+                differences = _SUMMARY_DIFFERENCES
+        filters = {
+            name: compile_filter(expression) if expression is not None else None
+            for name, expression in counts.items()
+            if name not in differences
+        }
+
+        on_server = all(
+            parcel_filter is None or parcel_filter.pushed_down for parcel_filter in filters.values()
+        )
+        if self.offline or not on_server:
+            parcels = self.get_parcel_history(start_date, end_date)
+            return {
+                name: len(parcels) if parcel_filter is None else len(parcel_filter.apply(parcels))
+                for name, parcel_filter in filters.items()
+            }
+
+        tasks = len(filters)
+        with ThreadPoolExecutor(max_workers=min(workers or tasks, tasks) or 1) as pool:
+            futures = {
+                name: pool.submit(self._count_on_server, start_date, end_date, parcel_filter)
+                for name, parcel_filter in filters.items()
+            }
+            results = {name: future.result() for name, future in futures.items()}
+
+        for name, count in results.items():
+            if count is None:
+                # Page 1 didn't tell the total; count the parcels
+                parcels = self.get_parcel_history(start_date, end_date, filters=filters[name])
+                results[name] = len(parcels)
+
+        for name, (minuend, subtrahend) in differences.items():
+            results[name] = results[minuend] - results[subtrahend]
+        return {name: results[name] for name in counts}
+
+    def get_parcel_histories(self, history_requests, **kwargs):
+        """
+        Retrieve parcel history for several, possibly overlapping, date windows.
+
+        The windows are merged into the minimum set of non-overlapping ranges,
+        each range is fetched once, and the results are sliced back out for
+        every request. For example last 7, 30 and 90 days cost a single 90-day fetch.
+
+        Args:
+            history_requests (list): HistoryRequest objects or (start, end) /
+                (start, end, filter) tuples, where filter is a predicate on parcels
+            **kwargs: Extra arguments passed to get_parcel_history for every range
+
+        Returns:
+            list: One list of parcels per request, in request order
+        """
+        history_requests = [
+            batch.HistoryRequest.coerce(request) for request in history_requests
+        ]
+        ranges = batch.plan_fetch_ranges(history_requests)
+        logger.info(
+            "Fetching %s date range(s) for %s request(s)", len(ranges), len(history_requests)
+        )
+
+        range_parcels = []
+        for start, end in ranges:
+            fetched = self.get_parcel_history(
+                start.strftime("%m/%d/%Y"), end.strftime("%m/%d/%Y"), **kwargs
+            )
+            range_parcels.append([(batch.delivery_day(parcel), parcel) for parcel in fetched])
+
+        return [batch.slice_history(ranges, range_parcels, request) for request in history_requests]
+
+    def diff_with_store(self, start_date, end_date, parcels=None, **kwargs):
+        """
+        Compare a parcel history with the local store's copy of the same window.
+
+        Without ``parcels``, the history is fetched (which also saves it to the
+        store), after taking the store's snapshot to compare against.
+
+        Args:
+            start_date (str or datetime): Start date of the window
+            end_date (str or datetime): End date of the window
+            parcels (iterable, optional): History to compare instead of fetching one
+            **kwargs: Extra arguments passed to get_parcel_history
+
+        Returns:
+            iterator: ParcelChange objects for new, removed and status-changed
+                parcels (see diff.diff_parcels)
+
+        Raises:
+            ParcelPendingError: If the client has no local store
+        """
+        if self.store is None:
+            raise ParcelPendingError("Diffing against the store requires a local store")
+
+        previous = self.store.query(start_date, end_date)
+        if parcels is None:
+            parcels = self.get_parcel_history(start_date, end_date, **kwargs)
+        return diff.diff_parcels(previous, parcels)
+
+    def search_parcels(self, fragment, limit=None):
+        """
+        Find stored parcels by part of their tracking number, package code or
+        order number, e.g. the last digits a resident reads out.
+
+        Answered from the local store's search index, which is updated whenever
+        history is saved to it, without network access or a scan of the history.
+
+        Args:
+            fragment (str): Part of the number to look for (case-insensitive)
+            limit (int, optional): Maximum number of parcels to return
+
+        Returns:
+            list: Matching parcels, newest delivery first
+
+        Raises:
+            ParcelPendingError: If the client has no local store
+        """
+        if self.store is None:
+            raise ParcelPendingError("Searching parcels requires a local store")
+        return self.store.search(fragment, limit=limit)
+
     def export_to_csv(self, parcels, filepath="parcels.csv"):
         """
         Export parcel data to a CSV file.
@@ -628,16 +1304,18 @@ class ParcelPendingClient:
         fieldnames = sorted(list(fieldnames))
 
         try:
-            with open(filepath, "w", newline="", encoding="utf-8") as csvfile:
+            with self.profile_phase("export"), open(
+                filepath, "w", newline="", encoding="utf-8"
+            ) as csvfile:
                 writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
                 writer.writeheader()
                 for parcel in parcels:
                     writer.writerow(parcel)
 
-            logger.info(f"Exported {len(parcels)} parcels to {filepath}")
+            logger.info("Exported %s parcels to %s", len(parcels), filepath)
             return filepath
         except Exception as e:
-            logger.error(f"Error exporting to CSV: {str(e)}")
+            logger.error("Error exporting to CSV: %s", e)
             return None
 
     def export_to_json(self, parcels, filepath="parcels.json"):
@@ -658,11 +1336,11 @@ class ParcelPendingClient:
             return None
 
         try:
-            with open(filepath, "w", encoding="utf-8") as jsonfile:
-                json.dump(parcels, jsonfile, indent=2)
+            with self.profile_phase("export"), open(filepath, "w", encoding="utf-8") as jsonfile:
+                json.dump(parcels, jsonfile, indent=2, default=json_default)
 
-            logger.info(f"Exported {len(parcels)} parcels to {filepath}")
+            logger.info("Exported %s parcels to %s", len(parcels), filepath)
             return filepath
         except Exception as e:
-            logger.error(f"Error exporting to JSON: {str(e)}")
+            logger.error("Error exporting to JSON: %s", e)
             return None
@@ -0,0 +1,126 @@
+"""
+Timeouts, deadlines and cancellation for parcel history fetches.
+"""
+
+import math
+import threading
+import time
+
+from .exceptions import CancelledError, TimeoutError
+from .utils import ENTRIES_PER_PAGE
+
+# (connect, read) timeout in seconds for every request
+DEFAULT_TIMEOUT = (10.0, 30.0)
+
+
+class CancelHandle:
+    """
+    Handle to abort a running history fetch, e.g. from another thread.
+
+    Pass it as ``cancel=`` and call ``cancel()``. The fetch stops before its next
+    page (or, when streaming, its next chunk) and raises CancelledError, or
+    returns the parcels fetched so far when called with ``partial=True``.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """Request the fetch to stop."""
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        """bool: True once cancel() has been called."""
+        return self._event.is_set()
+
+
+class FetchControl:
+    """
+    Request timeouts, deadline and cancellation of one history fetch.
+
+    The time left until the deadline is spread across the pages that remain,
+    once the first page has told how many there are: every request's timeouts
+    are capped at its share, so a single stalled page can't use up the time of
+    the pages after it.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, deadline=None, cancel=None):
+        """
+        Initialize the fetch control.
+
+        Args:
+            timeout (float or tuple, optional): Per-request timeout in seconds, or a
+                (connect, read) pair. None disables timeouts.
+            deadline (float, optional): Seconds the whole fetch may take
+            cancel (CancelHandle, optional): Handle to abort the fetch
+        """
+        if isinstance(timeout, (tuple, list)):
+            self.connect_timeout, self.read_timeout = timeout
+        else:
+            self.connect_timeout = self.read_timeout = timeout
+        self.expires_at = time.monotonic() + deadline if deadline is not None else None
+        self.cancel = cancel
+        self.total_pages = None
+
+    def remaining(self):
+        """float or None: Seconds left until the deadline, None without one."""
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+    def learn_total(self, total):
+        """
+        Record the total number of entries reported by a page.
+
+        Args:
+            total (int or None): Total entries, None if unknown
+        """
+        if total is not None:
+            self.total_pages = max(1, math.ceil(total / ENTRIES_PER_PAGE))
+
+    def check(self, page):
+        """
+        Stop the fetch if it was cancelled or its deadline has passed.
+
+        Args:
+            page (int): Page about to be fetched, for the error message
+
+        Raises:
+            CancelledError: If the fetch was cancelled
+            TimeoutError: If the deadline has passed
+        """
+        if self.cancel is not None and self.cancel.cancelled:
+            raise CancelledError(f"Parcel history fetch cancelled at page {page}")
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise TimeoutError(f"Deadline exceeded before fetching page {page}")
+
+    def timeout(self, page):
+        """
+        Get the timeouts for a page request.
+
+        Args:
+            page (int): Page about to be fetched
+
+        Returns:
+            tuple: (connect, read) timeout in seconds, for ``requests``' ``timeout=``
+
+        Raises:
+            CancelledError: If the fetch was cancelled
+            TimeoutError: If the deadline has passed
+        """
+        self.check(page)
+        remaining = self.remaining()
+        if remaining is None:
+            return (self.connect_timeout, self.read_timeout)
+
+        pages_left = 1
+        if self.total_pages is not None:
+            pages_left = max(1, self.total_pages - page + 1)
+        share = remaining / pages_left
+        return (_cap(self.connect_timeout, share), _cap(self.read_timeout, share))
+
+
+def _cap(timeout, share):
+    return share if timeout is None else min(timeout, share)
@@ -0,0 +1,118 @@
+"""
+Comparison of two parcel history snapshots.
+
+Parcels are matched by package code in a single pass: the older snapshot is
+indexed in a dictionary and the newer one is streamed against it, so changes
+are yielded as soon as they are found and the newer snapshot can be any
+iterable (e.g. a generator over a large export).
+"""
+
+NEW = "new"
+REMOVED = "removed"
+STATUS_CHANGED = "status_changed"
+
+
+class ParcelChange:
+    """
+    A difference between two snapshots for one parcel.
+
+    Attributes:
+        kind (str): NEW, REMOVED or STATUS_CHANGED
+        package_code (str): Package code of the parcel
+        old (dict or None): The parcel in the older snapshot (None if new)
+        new (dict or None): The parcel in the newer snapshot (None if removed)
+    """
+
+    def __init__(self, kind, package_code, old=None, new=None):
+        self.kind = kind
+        self.package_code = package_code
+        self.old = old
+        self.new = new
+
+    @property
+    def old_status(self):
+        """str: Status in the older snapshot, None if the parcel is new."""
+        return self.old.get("status") if self.old else None
+
+    @property
+    def new_status(self):
+        """str: Status in the newer snapshot, None if the parcel was removed."""
+        return self.new.get("status") if self.new else None
+
+    @property
+    def parcel(self):
+        """dict: The most recent version of the parcel."""
+        return self.new if self.new is not None else self.old
+
+    def __eq__(self, other):
+        if not isinstance(other, ParcelChange):
+            return NotImplemented
+        return (self.kind, self.package_code, self.old, self.new) == (
+            other.kind,
+            other.package_code,
+            other.old,
+            other.new,
+        )
+
+    def __repr__(self):
+        if self.kind == STATUS_CHANGED:
+            return (
+                f"ParcelChange({self.kind}, {self.package_code}: "
+                f"{self.old_status!r} -> {self.new_status!r})"
+            )
+        return f"ParcelChange({self.kind}, {self.package_code})"
+
+    def to_dict(self):
+        """Return a JSON-serializable summary of the change."""
+        parcel = self.parcel
+        return {
+            "change": self.kind,
+            "package_code": self.package_code,
+            "courier": parcel.get("courier"),
+            "old_status": self.old_status,
+            "new_status": self.new_status,
+        }
+
+
+def _status_key(parcel):
+    status = parcel.get("status")
+    return status.strip().lower() if status else None
+
+
+def diff_parcels(old_parcels, new_parcels):
+    """
+    Compare two parcel history snapshots.
+
+    Runs in linear time. New and status-changed parcels are yielded in the order
+    of ``new_parcels``, followed by the removed parcels in the order of
+    ``old_parcels``. Status comparisons ignore case. Parcels without a package
+    code can't be matched and are skipped.
+
+    Args:
+        old_parcels (iterable): Parcels of the older snapshot
+        new_parcels (iterable): Parcels of the newer snapshot
+
+    Yields:
+        ParcelChange: Each new, removed or status-changed parcel
+    """
+    previous = {}
+    for parcel in old_parcels:
+        code = parcel.get("package_code")
+        if code is not None:
+            previous[code] = parcel
+
+    seen = set()
+    for parcel in new_parcels:
+        code = parcel.get("package_code")
+        if code is None or code in seen:
+            continue
+        seen.add(code)
+
+        old = previous.pop(code, None)
+        if old is None:
+            yield ParcelChange(NEW, code, new=parcel)
+        elif _status_key(old) != _status_key(parcel):
+            yield ParcelChange(STATUS_CHANGED, code, old=old, new=parcel)
+
+    for code, parcel in previous.items():
+        yield ParcelChange(REMOVED, code, old=parcel)
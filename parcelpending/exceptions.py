@@ -4,9 +4,18 @@ Exceptions for the ParcelPending API wrapper.
 
 
 class ParcelPendingError(Exception):
-    """Base exception for all ParcelPending related errors."""
+    """
+    Base exception for all ParcelPending related errors.
 
-    pass
+    Attributes:
+        resume_token (HistoryCheckpoint): For failed history fetches, the progress
+            made before the failure. Pass it as ``resume=`` to retry from the
+            failed page.
+    """
+
+    def __init__(self, *args, resume_token=None):
+        super().__init__(*args)
+        self.resume_token = resume_token
 
 
 class AuthenticationError(ParcelPendingError):
@@ -19,3 +28,21 @@ class ConnectionError(ParcelPendingError):
     """Raised when connection to ParcelPending fails."""
 
     pass
+
+
+class FilterError(ParcelPendingError):
+    """Raised when a filter expression is invalid."""
+
+    pass
+
+
+class TimeoutError(ConnectionError):
+    """Raised when a request times out or a fetch runs past its deadline."""
+
+    pass
+
+
+class CancelledError(ParcelPendingError):
+    """Raised when a fetch is aborted through its CancelHandle."""
+
+    pass
@@ -0,0 +1,360 @@
+"""
+Filter expressions for parcels.
+
+A small expression language for selecting parcels, for example::
+
+    courier in (USPS, Amazon) and status != "picked up" and size = L
+    delivery_date >= 06/01/2023 and not locker_box = 42
+    tracking ~ 8490 or code = 12345678
+
+Comparisons are case-insensitive. ``~`` tests for a substring, ``!~`` for its
+absence. ``<``, ``<=``, ``>`` and ``>=`` compare the date fields by day. A
+comparison on a field the parcel doesn't have is always false.
+
+An expression is compiled once into a single predicate. Tests the website can
+filter on themselves (equality of package code, tracking number, order number
+and status, and bounds on the pickup date) are also extracted as query
+parameters when they must hold for every match, so the server returns fewer
+pages.
+"""
+
+import re
+from datetime import timedelta
+
+from .exceptions import FilterError
+from .utils import parse_date, parse_timestamp
+
+FIELDS = {
+    "package_code": "package_code",
+    "code": "package_code",
+    "status": "status",
+    "courier": "courier",
+    "locker_box": "locker_box",
+    "locker": "locker_box",
+    "size": "size",
+    "tracking_number": "tracking_number",
+    "tracking": "tracking_number",
+    "order_number": "order_number",
+    "order": "order_number",
+    "delivery_date": "delivery_date",
+    "delivered": "delivery_date",
+    "pickup_date": "pickup_date",
+    "picked_up": "pickup_date",
+}
+
+DATE_FIELDS = {"delivery_date", "pickup_date"}
+
+# Fields the parcel history page can filter on, mapped to their query parameter
+SERVER_PARAMS = {
+    "package_code": "package_code",
+    "tracking_number": "tracking_number",
+    "order_number": "order_number",
+    "status": "package_status",
+}
+
+# Date fields the parcel history page can bound, mapped to their (start, end)
+# query parameters. Both bounds are inclusive days.
+SERVER_DATE_PARAMS = {
+    "pickup_date": ("parcel_pickup_date_start", "parcel_pickup_date_end"),
+}
+
+_TOKEN_RE = re.compile(
+    r"""
+    \s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<op>==|!=|<=|>=|!~|=|~|<|>|\(|\)|,)
+      | (?P<word>[^\s"'(),=!~<>]+)
+    )
+    """,
+    re.VERBOSE,
+)
+
+_KEYWORDS = {"and", "or", "not", "in"}
+
+
+def _tokenize(expression):
+    """Split an expression into (kind, value) tokens."""
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN_RE.match(expression, position)
+        if not match:
+            raise FilterError(f"Unexpected character at position {position}: {expression!r}")
+        position = match.end()
+        if match.group("string") is not None:
+            value = re.sub(r"\\(.)", r"\1", match.group("string")[1:-1])
+            tokens.append(("value", value))
+        elif match.group("op") is not None:
+            tokens.append(("op", match.group("op")))
+        elif match.group("word").lower() in _KEYWORDS:
+            tokens.append(("keyword", match.group("word").lower()))
+        else:
+            tokens.append(("value", match.group("word")))
+    return tokens
+
+
+def _parcel_day(value):
+    """Get the day of a parcel date field value (str or datetime)."""
+    value = parse_timestamp(value)
+    return value.date() if value else None
+
+
+class _Parser:
+    """Recursive-descent parser producing a predicate and pushdown candidates."""
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.position = 0
+        # Whether the expression is a plain conjunction, and of how many comparisons
+        self.conjunctive = True
+        self.comparisons = 0
+
+    def _peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def _next(self):
+        token = self._peek()
+        if token[0] is None:
+            raise FilterError(f"Unexpected end of filter expression: {self.expression!r}")
+        self.position += 1
+        return token
+
+    def _expect(self, kind, value=None):
+        token = self._next()
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise FilterError(f"Expected {value or kind!r} but found {token[1]!r}")
+        return token[1]
+
+    def parse(self):
+        predicate, constraints = self._or()
+        if self._peek()[0] is not None:
+            raise FilterError(f"Unexpected {self._peek()[1]!r} in filter expression")
+        return predicate, constraints
+
+    # Each rule returns (predicate, constraints), where constraints are the
+    # (field, operator, value) equality tests and date bounds that hold for
+    # every parcel the rule matches.
+
+    def _or(self):
+        predicate, constraints = self._and()
+        operands = [predicate]
+        while self._peek() == ("keyword", "or"):
+            self._next()
+            operands.append(self._and()[0])
+            constraints = []
+            self.conjunctive = False
+        if len(operands) == 1:
+            return predicate, constraints
+        return (lambda parcel: any(operand(parcel) for operand in operands)), constraints
+
+    def _and(self):
+        predicate, constraints = self._not()
+        operands = [predicate]
+        constraints = list(constraints)
+        while self._peek() == ("keyword", "and"):
+            self._next()
+            operand, operand_constraints = self._not()
+            operands.append(operand)
+            constraints.extend(operand_constraints)
+        if len(operands) == 1:
+            return predicate, constraints
+        return (lambda parcel: all(operand(parcel) for operand in operands)), constraints
+
+    def _not(self):
+        if self._peek() == ("keyword", "not"):
+            self._next()
+            self.conjunctive = False
+            operand, _ = self._not()
+            return (lambda parcel: not operand(parcel)), []
+        return self._atom()
+
+    def _atom(self):
+        if self._peek() == ("op", "("):
+            self._next()
+            result = self._or()
+            self._expect("op", ")")
+            return result
+        return self._comparison()
+
+    def _comparison(self):
+        self.comparisons += 1
+        name = self._expect("value")
+        field = FIELDS.get(name.lower())
+        if field is None:
+            raise FilterError(f"Unknown field {name!r}; expected one of {', '.join(sorted(FIELDS))}")
+
+        kind, operator = self._next()
+        negate = False
+        if (kind, operator) == ("keyword", "not"):
+            negate = True
+            kind, operator = self._next()
+        if kind == "keyword" and operator == "in":
+            return self._membership(field, negate), []
+        if kind != "op" or negate or operator not in ("=", "==", "!=", "~", "!~", "<", "<=", ">", ">="):
+            raise FilterError(f"Expected a comparison operator after {name!r}, found {operator!r}")
+
+        value = self._expect("value")
+        if operator in ("<", "<=", ">", ">="):
+            return self._date_comparison(field, operator, value)
+
+        needle = value.lower()
+        if operator in ("=", "=="):
+            return self._text_test(field, lambda text: text == needle), [(field, "=", value)]
+        if operator == "!=":
+            return self._text_test(field, lambda text: text != needle), []
+        if operator == "~":
+            return self._text_test(field, lambda text: needle in text), []
+        return self._text_test(field, lambda text: needle not in text), []
+
+    def _membership(self, field, negate):
+        self._expect("op", "(")
+        values = {self._expect("value").lower()}
+        while self._peek() == ("op", ","):
+            self._next()
+            values.add(self._expect("value").lower())
+        self._expect("op", ")")
+        if negate:
+            return self._text_test(field, lambda text: text not in values)
+        return self._text_test(field, lambda text: text in values)
+
+    @staticmethod
+    def _text_test(field, test):
+        def predicate(parcel):
+            value = parcel.get(field)
+            if value is None:
+                return False
+            if field in DATE_FIELDS and not isinstance(value, str):
+                value = value.strftime("%m/%d/%Y %I:%M:%S %p")
+            return test(str(value).lower())
+
+        return predicate
+
+    def _date_comparison(self, field, operator, value):
+        if field not in DATE_FIELDS:
+            raise FilterError(f"{operator!r} can only compare date fields, not {field!r}")
+        try:
+            bound = parse_date(value).date()
+        except ValueError as e:
+            raise FilterError(str(e))
+
+        compare = {
+            "<": lambda day: day < bound,
+            "<=": lambda day: day <= bound,
+            ">": lambda day: day > bound,
+            ">=": lambda day: day >= bound,
+        }[operator]
+
+        def predicate(parcel):
+            day = _parcel_day(parcel.get(field))
+            return day is not None and compare(day)
+
+        return predicate, [(field, operator, bound)]
+
+
+class ParcelFilter:
+    """
+    A compiled filter expression.
+
+    Call it with a parcel dictionary to test whether the parcel matches.
+
+    Attributes:
+        expression (str): The source expression
+        server_params (dict): Query parameters the website can apply for this
+            filter. Parcels the server returns are still checked against the
+            full predicate.
+        pushed_down (bool): True if server_params express the whole filter, so
+            the website's entry count for the query is the number of matches
+    """
+
+    def __init__(self, expression):
+        """
+        Compile a filter expression.
+
+        Args:
+            expression (str): The filter expression
+
+        Raises:
+            FilterError: If the expression is invalid
+        """
+        self.expression = expression
+        parser = _Parser(expression)
+        self._predicate, constraints = parser.parse()
+
+        self.server_params = {}
+        conflicting = set()
+        bounds = {}
+        pushable = 0
+        for field, operator, value in constraints:
+            if operator != "=":
+                if field not in SERVER_DATE_PARAMS:
+                    continue
+                pushable += 1
+                start_param, end_param = SERVER_DATE_PARAMS[field]
+                # Turn exclusive bounds into the inclusive days the website takes
+                if operator in (">", ">="):
+                    param, tightest = start_param, max
+                    day = value + timedelta(days=1) if operator == ">" else value
+                else:
+                    param, tightest = end_param, min
+                    day = value - timedelta(days=1) if operator == "<" else value
+                bounds[param] = tightest(bounds[param], day) if param in bounds else day
+                continue
+
+            param = SERVER_PARAMS.get(field)
+            if param is None:
+                continue
+            pushable += 1
+            if param in conflicting:
+                continue
+            if self.server_params.get(param, value) != value:
+                # Contradictory equalities; leave it to the predicate to match nothing
+                conflicting.add(param)
+                self.server_params.pop(param)
+                continue
+            self.server_params[param] = value
+        for param, day in bounds.items():
+            self.server_params[param] = day.strftime("%m/%d/%Y")
+
+        self.pushed_down = (
+            parser.conjunctive
+            and not conflicting
+            and parser.comparisons == len(constraints) == pushable
+        )
+
+    def __call__(self, parcel):
+        return self._predicate(parcel)
+
+    def __repr__(self):
+        return f"ParcelFilter({self.expression!r})"
+
+    def apply(self, parcels):
+        """
+        Select the matching parcels in a single pass.
+
+        Args:
+            parcels (iterable): Parcel dictionaries
+
+        Returns:
+            list: Matching parcels
+        """
+        predicate = self._predicate
+        return [parcel for parcel in parcels if predicate(parcel)]
+
+
+def compile_filter(expression):
+    """
+    Compile a filter expression, passing compiled filters through unchanged.
+
+    Args:
+        expression (str or ParcelFilter): The filter expression
+
+    Returns:
+        ParcelFilter: The compiled filter
+    """
+    if isinstance(expression, ParcelFilter):
+        return expression
+    return ParcelFilter(expression)
@@ -0,0 +1,457 @@
+"""
+Shared job queue and worker for syncing many accounts from several machines.
+
+Jobs (an account and a date window) are kept in a SQLite table that every
+worker opens. A worker leases a job for a limited time and keeps the lease
+alive with heartbeats while it fetches; if the worker dies, the lease runs out
+and another worker picks the job up again. Failed jobs are retried with an
+exponential backoff until they run out of attempts. Results are written to a
+common ParcelStore, so throughput grows by starting more workers.
+"""
+
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from .client import ParcelPendingClient
+from .deadline import CancelHandle
+from .exceptions import AuthenticationError, ParcelPendingError
+from .store import ParcelStore
+from .utils import to_datetime
+
+logger = logging.getLogger(__name__)
+
+# Seconds a worker waits for another worker's write to the shared store
+STORE_TIMEOUT = 60.0
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT NOT NULL,
+    filters TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_available ON jobs (status, available_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs (status, lease_expires);
+"""
+
+
+class Job:
+    """
+    A leased parcel history job.
+
+    Attributes:
+        id (int): Job id in the queue
+        account (str): Account (email) to fetch the history of
+        start_date (datetime): Start of the delivery date window
+        end_date (datetime): End of the delivery date window
+        filters (str or None): Filter expression for the fetch
+        attempts (int): Number of times the job has been leased, this time included
+        worker (str): Id of the worker holding the lease
+    """
+
+    def __init__(self, row, worker):
+        self.id = row["id"]
+        self.account = row["account"]
+        self.start_date = to_datetime(row["start_date"])
+        self.end_date = to_datetime(row["end_date"])
+        self.filters = row["filters"]
+        self.attempts = row["attempts"]
+        self.worker = worker
+
+    def __repr__(self):
+        return (
+            f"Job({self.id}, {self.account}, {self.start_date.date().isoformat()} - "
+            f"{self.end_date.date().isoformat()})"
+        )
+
+
+class JobQueue:
+    """
+    Queue of parcel history jobs in a SQLite database shared by all workers.
+
+    Leasing runs in an immediate transaction, so two workers never lease the
+    same job, whether they are threads, processes or machines sharing the file.
+    Lease times use the wall clock, so the machines' clocks should be in sync.
+    """
+
+    def __init__(self, path, lease_seconds=300, max_attempts=5, retry_delay=30):
+        """
+        Open (and create if needed) a job queue.
+
+        Args:
+            path (str): Path to the SQLite database file
+            lease_seconds (float): How long a lease lasts without a heartbeat
+            max_attempts (int): Leases after which a failing job is given up
+            retry_delay (float): Seconds before the first retry of a failed job,
+                doubled on every further attempt
+        """
+        self.path = str(path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _transaction(self, statements):
+        """
+        Run statements in one immediate (write-locked) transaction.
+
+        Args:
+            statements (callable): Called with the connection; its result is returned
+
+        Returns:
+            The result of ``statements``
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def enqueue(self, account, start_date, end_date, filters=None):
+        """
+        Add a job, unless the same one is already waiting or running.
+
+        Args:
+            account (str): Account (email) to fetch the history of
+            start_date (str or datetime): Start of the delivery date window
+            end_date (str or datetime): End of the delivery date window
+            filters (str, optional): Filter expression for the fetch
+
+        Returns:
+            int: Id of the new job, or of the identical job already queued
+        """
+        start = to_datetime(start_date).date().isoformat()
+        end = to_datetime(end_date).date().isoformat()
+
+        def insert(conn):
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE account = ? AND start_date = ? AND end_date = ? "
+                "AND filters IS ? AND status IN (?, ?)",
+                (account, start, end, filters, PENDING, LEASED),
+            ).fetchone()
+            if row is not None:
+                return row["id"]
+            now = time.time()
+            cursor = conn.execute(
+                "INSERT INTO jobs (account, start_date, end_date, filters, available_at, "
+                "updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (account, start, end, filters, now, now),
+            )
+            return cursor.lastrowid
+
+        return self._transaction(insert)
+
+    def lease(self, worker):
+        """
+        Lease the next job that is due, or whose previous lease ran out.
+
+        Args:
+            worker (str): Id of the leasing worker
+
+        Returns:
+            Job or None: The leased job, None if no job is due
+        """
+
+        def take(conn):
+            now = time.time()
+            # Leases that ran out on their last attempt are given up
+            conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, updated_at = ?, "
+                "last_error = COALESCE(last_error, 'Lease expired') "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, now, LEASED, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE (status = ? AND available_at <= ?) "
+                "OR (status = ? AND lease_expires < ?) ORDER BY available_at, id LIMIT 1",
+                (PENDING, now, LEASED, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (LEASED, worker, now + self.lease_seconds, now, row["id"]),
+            )
+            leased = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            return Job(leased, worker)
+
+        return self._transaction(take)
+
+    def heartbeat(self, job):
+        """
+        Extend the lease of a running job.
+
+        Args:
+            job (Job): The leased job
+
+        Returns:
+            bool: False if the lease was lost (it ran out and the job was leased again)
+        """
+        now = time.time()
+        return self._update_leased(
+            job, "lease_expires = ?, updated_at = ?", (now + self.lease_seconds, now)
+        )
+
+    def complete(self, job):
+        """
+        Mark a job as done.
+
+        Args:
+            job (Job): The leased job
+
+        Returns:
+            bool: False if the lease was lost before completion
+        """
+        return self._update_leased(
+            job,
+            "status = ?, lease_owner = NULL, lease_expires = NULL, last_error = NULL, "
+            "updated_at = ?",
+            (DONE, time.time()),
+        )
+
+    def fail(self, job, error, retry=True):
+        """
+        Record a failed attempt, scheduling a retry while attempts are left.
+
+        Args:
+            job (Job): The leased job
+            error (str): Description of the failure
+            retry (bool): False to give the job up right away
+
+        Returns:
+            bool: False if the lease was lost before the failure was recorded
+        """
+        now = time.time()
+        if retry and job.attempts < self.max_attempts:
+            delay = self.retry_delay * 2 ** (job.attempts - 1)
+            logger.info("%s failed (%s); retrying in %.0fs", job, error, delay)
+            return self._update_leased(
+                job,
+                "status = ?, lease_owner = NULL, lease_expires = NULL, available_at = ?, "
+                "last_error = ?, updated_at = ?",
+                (PENDING, now + delay, str(error), now),
+            )
+
+        logger.warning("%s failed after %s attempt(s): %s", job, job.attempts, error)
+        return self._update_leased(
+            job,
+            "status = ?, lease_owner = NULL, lease_expires = NULL, last_error = ?, "
+            "updated_at = ?",
+            (FAILED, str(error), now),
+        )
+
+    def _update_leased(self, job, assignments, params):
+        """Update a job if the worker still holds its lease."""
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND status = ? AND lease_owner = ?",
+                tuple(params) + (job.id, LEASED, job.worker),
+            )
+            return cursor.rowcount == 1
+
+    def counts(self):
+        """
+        Count the jobs in each state.
+
+        Returns:
+            dict: Number of jobs per status (pending, leased, done, failed)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        counts = dict.fromkeys((PENDING, LEASED, DONE, FAILED), 0)
+        counts.update((row[0], row[1]) for row in rows)
+        return counts
+
+
+def default_worker_id():
+    """str: A worker id unique across machines and processes."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class Worker:
+    """
+    Runs parcel history jobs from a JobQueue, saving the parcels to a shared store.
+
+    One logged-in client is kept per account, so consecutive jobs of an account
+    reuse its session. While a job runs, a heartbeat thread extends its lease;
+    if the lease is lost anyway, the fetch is cancelled and its result dropped.
+    """
+
+    def __init__(
+        self,
+        queue,
+        store,
+        credentials,
+        worker_id=None,
+        heartbeat_interval=None,
+        **client_kwargs,
+    ):
+        """
+        Initialize a worker.
+
+        Args:
+            queue (JobQueue): The shared job queue
+            store (str): Path to the shared parcel store database
+            credentials (dict): Password of every account the worker may sync, by email
+            worker_id (str, optional): Id identifying the worker's leases. Defaults
+                to host name, process id and a random suffix.
+            heartbeat_interval (float, optional): Seconds between heartbeats.
+                Defaults to a third of the lease time.
+            **client_kwargs: Passed to ParcelPendingClient (e.g. timeout, stream)
+        """
+        self.queue = queue
+        self.store = str(store)
+        self.credentials = credentials
+        self.worker_id = worker_id or default_worker_id()
+        self.heartbeat_interval = heartbeat_interval or queue.lease_seconds / 3
+        self.client_kwargs = client_kwargs
+        self._clients = {}
+
+    def close(self):
+        """Close the stores of the cached clients."""
+        for client in self._clients.values():
+            client.store.close()
+        self._clients.clear()
+
+    def _client(self, account):
+        """Get the logged-in client of an account, creating it on first use."""
+        client = self._clients.get(account)
+        if client is None:
+            store = ParcelStore(self.store, account=account, timeout=STORE_TIMEOUT, wal=True)
+            try:
+                client = ParcelPendingClient(
+                    account, self.credentials[account], store=store, **self.client_kwargs
+                )
+                client.login()
+            except Exception:
+                store.close()
+                raise
+            self._clients[account] = client
+        return client
+
+    def run(self, max_jobs=None, idle_timeout=None, poll_interval=5.0):
+        """
+        Lease and run jobs until stopped.
+
+        Args:
+            max_jobs (int, optional): Stop after this many jobs
+            idle_timeout (float, optional): Stop when no job was due for this many
+                seconds. None keeps polling forever.
+            poll_interval (float): Seconds to wait before polling an empty queue again
+
+        Returns:
+            int: Number of jobs completed
+        """
+        completed = 0
+        processed = 0
+        idle_since = time.monotonic()
+
+        while max_jobs is None or processed < max_jobs:
+            job = self.queue.lease(self.worker_id)
+            if job is None:
+                if idle_timeout is not None and time.monotonic() - idle_since >= idle_timeout:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            processed += 1
+            if self.process(job):
+                completed += 1
+            idle_since = time.monotonic()
+
+        logger.info("Worker %s completed %s of %s job(s)", self.worker_id, completed, processed)
+        return completed
+
+    def process(self, job):
+        """
+        Run one leased job.
+
+        Args:
+            job (Job): The leased job
+
+        Returns:
+            bool: True if the job completed
+        """
+        logger.info("Worker %s running %s (attempt %s)", self.worker_id, job, job.attempts)
+        if job.account not in self.credentials:
+            self.queue.fail(job, f"No credentials for account {job.account}", retry=False)
+            return False
+
+        cancel = CancelHandle()
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.heartbeat_interval):
+                if not self.queue.heartbeat(job):
+                    logger.warning("Lease of %s was lost; cancelling", job)
+                    cancel.cancel()
+                    return
+
+        heartbeat = threading.Thread(target=beat, name=f"heartbeat-{job.id}", daemon=True)
+        heartbeat.start()
+        try:
+            client = self._client(job.account)
+            parcels = client.get_parcel_history(
+                job.start_date, job.end_date, filters=job.filters, cancel=cancel
+            )
+        except Exception as e:
+            if not isinstance(e, ParcelPendingError):
+                # E.g. "database is locked" from the shared store; fail the job
+                # rather than the worker, so it is retried without waiting for
+                # the lease to run out
+                logger.exception("Unexpected error running %s", job)
+            if isinstance(e, AuthenticationError):
+                # Log in afresh next time
+                client = self._clients.pop(job.account, None)
+                if client is not None:
+                    client.store.close()
+            if not cancel.cancelled:
+                self.queue.fail(job, str(e))
+            return False
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        logger.info("%s saved %s parcels", job, len(parcels))
+        return self.queue.complete(job)
@@ -0,0 +1,202 @@
+"""
+Writers for the parcel lists printed by the command line interface.
+
+Writers format a whole batch of parcels (e.g. one history page) at a time and
+write it to the stream with a single call, so output can be streamed page by
+page without a write per field.
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+
+from .filters import FIELDS
+from .utils import json_default
+
+DEFAULT_COLUMNS = (
+    "package_code",
+    "status",
+    "courier",
+    "locker_box",
+    "size",
+    "delivery_date",
+    "pickup_date",
+    "tracking_number",
+)
+
+
+def parse_columns(spec):
+    """
+    Parse a comma-separated column list, accepting the filter field aliases.
+
+    Args:
+        spec (str): Columns, e.g. "code,status,delivered"
+
+    Returns:
+        tuple: Parcel field names
+    """
+    columns = []
+    for name in spec.split(","):
+        name = name.strip()
+        if name:
+            columns.append(FIELDS.get(name.lower(), name))
+    return tuple(columns)
+
+
+def _text(value):
+    """Format a field value for the text formats."""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    return str(value)
+
+
+class ParcelWriter:
+    """
+    Base class for parcel list writers.
+
+    Attributes:
+        count (int): Number of parcels written so far
+    """
+
+    def __init__(self, stream=None, columns=None):
+        """
+        Initialize the writer.
+
+        Args:
+            stream (file, optional): Output stream (default: stdout)
+            columns (tuple, optional): Fields to output. Defaults to DEFAULT_COLUMNS
+                for the text formats.
+        """
+        self.stream = stream or sys.stdout
+        self.columns = tuple(columns) if columns else None
+        self.count = 0
+
+    def write(self, parcels):
+        """
+        Write a batch of parcels and flush it.
+
+        Args:
+            parcels (list): Parcel dictionaries
+        """
+        if not parcels:
+            return
+        self._emit(self.format(parcels))
+        self.count += len(parcels)
+
+    def close(self):
+        """Finish the output."""
+        self.stream.flush()
+
+    def format(self, parcels):
+        """Format a batch of parcels as text."""
+        raise NotImplementedError
+
+    def _emit(self, text):
+        try:
+            self.stream.write(text)
+            self.stream.flush()
+        except BrokenPipeError:
+            # The reader went away (e.g. `| head`); stop quietly like other CLI tools
+            if self.stream is sys.stdout:
+                devnull = os.open(os.devnull, os.O_WRONLY)
+                os.dup2(devnull, sys.stdout.fileno())
+            sys.exit(1)
+
+
+class NdjsonWriter(ParcelWriter):
+    """One JSON object per line; all fields unless columns are given."""
+
+    def format(self, parcels):
+        columns = self.columns
+        lines = []
+        for parcel in parcels:
+            if columns is not None:
+                parcel = {column: parcel.get(column) for column in columns}
+            lines.append(json.dumps(parcel, default=json_default))
+        lines.append("")
+        return "\n".join(lines)
+
+
+class TsvWriter(ParcelWriter):
+    """Tab-separated values with a header line."""
+
+    def __init__(self, stream=None, columns=None):
+        super().__init__(stream, columns or DEFAULT_COLUMNS)
+        self._header_written = False
+
+    def _header(self):
+        if self._header_written:
+            return ""
+        self._header_written = True
+        return "\t".join(self.columns) + "\n"
+
+    def format(self, parcels):
+        lines = [self._header()]
+        for parcel in parcels:
+            values = (_text(parcel.get(column)) for column in self.columns)
+            line = "\t".join(value.replace("\t", " ").replace("\n", " ") for value in values)
+            lines.append(line + "\n")
+        return "".join(lines)
+
+    def close(self):
+        if not self._header_written:
+            self._emit(self._header())
+        super().close()
+
+
+class TableWriter(ParcelWriter):
+    """
+    Aligned columns for reading in a terminal.
+
+    Column widths are fixed from the header and the first batch, so the table
+    can be streamed; longer values in later batches widen only their own row.
+    """
+
+    def __init__(self, stream=None, columns=None):
+        super().__init__(stream, columns or DEFAULT_COLUMNS)
+        self._widths = None
+
+    def format(self, parcels):
+        rows = [[_text(parcel.get(column)) for column in self.columns] for parcel in parcels]
+
+        lines = []
+        if self._widths is None:
+            self._widths = [
+                max([len(column)] + [len(row[i]) for row in rows])
+                for i, column in enumerate(self.columns)
+            ]
+            lines.append(self._line(self.columns))
+            lines.append(self._line(["-" * width for width in self._widths]))
+        lines.extend(self._line(row) for row in rows)
+        lines.append("")
+        return "\n".join(lines)
+
+    def _line(self, values):
+        return "  ".join(
+            value.ljust(width) for value, width in zip(values, self._widths)
+        ).rstrip()
+
+
+WRITERS = {
+    "table": TableWriter,
+    "ndjson": NdjsonWriter,
+    "tsv": TsvWriter,
+}
+
+
+def create_writer(output_format="table", stream=None, columns=None):
+    """
+    Create a writer for an output format.
+
+    Args:
+        output_format (str): One of WRITERS
+        stream (file, optional): Output stream (default: stdout)
+        columns (tuple, optional): Fields to output
+
+    Returns:
+        ParcelWriter: The writer
+    """
+    return WRITERS[output_format](stream, columns)
@@ -0,0 +1,748 @@
+"""
+HTML parsing for ParcelPending parcel history pages.
+
+These are plain module-level functions (rather than client methods) so that
+pages can be parsed in worker processes.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+from .utils import DateParser
+
+logger = logging.getLogger(__name__)
+
+# One parser per timestamp column, so each infers its column's format once
+_delivery_dates = DateParser()
+_pickup_dates = DateParser()
+
+
+def parse_page(html, current_page, parcel_parser=None, snapshot_dir=None):
+    """
+    Parse one parcel history page.
+
+    Args:
+        html (str): Raw HTML of the page
+        current_page (int): Page number of the page
+        parcel_parser (ParcelParser, optional): Parser to use. Defaults to the
+            module-level parser of the current process.
+        snapshot_dir (str, optional): Directory to save the page to if no strategy
+            can parse it, for parsers without their own (e.g. in worker processes)
+
+    Returns:
+        tuple: (parcels, has_next, total, strategy) where total is the total number
+            of entries reported by the page (None if not shown) and strategy is the
+            name of the parse strategy that matched (None if none did)
+    """
+    parcel_parser = parcel_parser or _default_parser
+    soup = BeautifulSoup(html, "html.parser")
+    parcels = parcel_parser.parse(soup, html)
+    strategy = parcel_parser.last_strategy
+    if strategy is None and snapshot_dir is not None and parcel_parser.snapshot_dir is None:
+        save_snapshot(snapshot_dir, layout_fingerprint(soup), html)
+    return parcels, has_next_page(soup, current_page), total_entries(soup), strategy
+
+
+# A login form or password field only appears when the session is no longer valid
+_LOGIN_PAGE_RE = re.compile(
+    r"""<form\b[^>]*\b(?:id|name)\s*=\s*["']?login\b|<input\b[^>]*\btype\s*=\s*["']?password\b""",
+    re.IGNORECASE,
+)
+
+
+def is_login_page(html):
+    """
+    Check whether a response is the login page rather than the requested page.
+
+    The website answers requests made with an expired session with its login
+    form, so this is checked on the raw HTML before any parsing.
+
+    Args:
+        html (str): Raw HTML of the response
+
+    Returns:
+        bool: True if the HTML contains the login form
+    """
+    return _LOGIN_PAGE_RE.search(html) is not None
+
+
+def entries_shown(soup):
+    """
+    Read the DataTables info text, e.g. "Showing 21 to 40 of 45 entries".
+
+    Args:
+        soup (BeautifulSoup): Parsed HTML of a parcel history page
+
+    Returns:
+        tuple or None: (first, last, total) entry numbers, or None if the page
+            doesn't show them
+    """
+    info_div = soup.find("div", class_="dataTables_info")
+    if info_div:
+        info_text = info_div.get_text(strip=True)
+        matches = re.search(r"Showing (\d+) to (\d+) of (\d+) entries", info_text)
+        if matches:
+            return tuple(int(group) for group in matches.groups())
+    return None
+
+
+def total_entries(soup):
+    """
+    Read the total number of entries from the DataTables info text.
+
+    Args:
+        soup (BeautifulSoup): Parsed HTML of a parcel history page
+
+    Returns:
+        int or None: Total entries, or None if the page doesn't show them
+    """
+    shown = entries_shown(soup)
+    return shown[2] if shown is not None else None
+
+
+def has_next_page(soup, current_page):
+    """
+    Determine if there is a next page of results.
+
+    Args:
+        soup (BeautifulSoup): Parsed HTML of the current page
+        current_page (int): Current page number
+
+    Returns:
+        bool: True if there is a next page, False otherwise
+    """
+    try:
+        # Look for pagination elements
+        pagination = soup.find("div", class_="dataTables_paginate")
+        if not pagination:
+            # Try alternative pagination elements
+            pagination = soup.find("ul", class_="pagination")
+
+        if pagination:
+            # Look for "next" button/link that is not disabled
+            next_link = pagination.find("li", class_="next")
+            if next_link and "disabled" not in next_link.get("class", []):
+                return True
+
+            # Check if there's a link to a page higher than current_page
+            page_links = pagination.find_all("a")
+            for link in page_links:
+                if link.text.isdigit() and int(link.text) > current_page:
+                    return True
+
+            # Check whether the entries shown end before the total, whatever
+            # the page size
+            shown = entries_shown(soup)
+            if shown is not None:
+                return shown[1] < shown[2]
+
+        return False
+    except Exception as e:
+        logger.warning("Error checking for next page: %s", e)
+        # If we can't determine, assume no more pages
+        return False
+
+
+def _parse_table_rows(soup):
+    """Strategy: table rows containing package information (the current layout)."""
+    parcel_rows = soup.find_all("tr")
+    if not parcel_rows:
+        return None
+
+    logger.debug("Found %s table rows to check for parcels", len(parcel_rows))
+    # Filter rows that contain package info
+    valid_rows = [row for row in parcel_rows if row.find(string=lambda t: t and "Package Code:" in t)]
+    if not valid_rows:
+        return None
+
+    logger.debug("Found %s rows containing package information", len(valid_rows))
+    return parse_parcels_from_table_rows(valid_rows)
+
+
+def _parse_parcel_sections(soup):
+    """Strategy: div.parcel-section containers (the original layout)."""
+    parcel_sections = soup.find_all("div", class_="parcel-section")
+    if not parcel_sections:
+        logger.debug("No parcel sections found with class='parcel-section'")
+        return None
+
+    logger.debug("Found %s parcel sections", len(parcel_sections))
+    return parse_parcels_from_sections(parcel_sections)
+
+
+def _parse_parcel_containers(soup):
+    """Strategy: generic containers whose class mentions parcels, packages or deliveries."""
+    parcel_containers = soup.find_all(["div", "section", "article"],
+                                      class_=lambda c: c and ("parcel" in c.lower()
+                                      or "package" in c.lower()
+                                      or "delivery" in c.lower()))
+    if not parcel_containers:
+        return None
+
+    logger.debug("Found %s potential parcel containers", len(parcel_containers))
+    return parse_parcels_from_sections(parcel_containers)
+
+
+def _parse_code_elements(soup):
+    """Strategy: work outward from any "Package Code:" text."""
+    package_code_elements = soup.find_all(string=lambda t: t and "Package Code:" in t)
+    if not package_code_elements:
+        return None
+
+    logger.debug("Found %s package code elements", len(package_code_elements))
+    return parse_parcels_from_code_elements(package_code_elements)
+
+
+# Parse strategies in fallback order. Each returns None when the page doesn't
+# have the structure it looks for.
+STRATEGIES = (
+    ("table_rows", _parse_table_rows),
+    ("parcel_sections", _parse_parcel_sections),
+    ("parcel_containers", _parse_parcel_containers),
+    ("code_elements", _parse_code_elements),
+)
+
+
+def layout_fingerprint(soup, max_elements=64):
+    """
+    Compute a cheap structural fingerprint of a page's layout.
+
+    Only the first two levels of elements below <body> are looked at and runs of
+    identical siblings are collapsed, so the fingerprint costs far less than a
+    full-tree scan and stays the same across pages of the same layout regardless
+    of how many parcels they list.
+
+    Args:
+        soup (BeautifulSoup): Parsed HTML
+        max_elements (int): Maximum number of elements to include
+
+    Returns:
+        tuple: Hashable fingerprint of the layout
+    """
+    root = soup.body or soup
+    fingerprint = []
+    for child in root.find_all(True, recursive=False):
+        for element in [child] + child.find_all(True, recursive=False):
+            signature = (element.name, element.get("id"), tuple(element.get("class", ())))
+            # Collapse runs of identical siblings such as one container per parcel
+            if fingerprint and fingerprint[-1] == signature:
+                continue
+            fingerprint.append(signature)
+            if len(fingerprint) >= max_elements:
+                return tuple(fingerprint)
+    return tuple(fingerprint)
+
+
+# Metrics key for pages no strategy could parse
+NO_STRATEGY = "none"
+
+
+def save_snapshot(directory, fingerprint, html):
+    """
+    Save the HTML of a page no strategy could parse, once per page layout.
+
+    The file is named after the layout fingerprint and never overwritten, so
+    a layout the parser doesn't understand is saved once however many pages
+    of it are fetched, also across processes.
+
+    Args:
+        directory (str): Directory to save to, created if needed
+        fingerprint (tuple): Layout fingerprint of the page (see layout_fingerprint)
+        html (str): Raw HTML of the page
+
+    Returns:
+        str or None: Path of the saved file, None if the layout was already saved
+            or the file couldn't be written
+    """
+    digest = hashlib.sha1(repr(fingerprint).encode("utf-8")).hexdigest()[:16]
+    path = os.path.join(directory, f"unparsed-{digest}.html")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "x", encoding="utf-8") as snapshot:
+            snapshot.write(html)
+    except FileExistsError:
+        return None
+    except OSError as e:
+        logger.warning("Could not save a snapshot of an unparseable page to %s: %s", path, e)
+        return None
+    logger.warning("No parse strategy matched a page; saved it to %s", path)
+    return path
+
+
+class ParcelParser:
+    """
+    Parcel parser that remembers which strategy works for each page layout.
+
+    The first page of a layout goes down the full strategy chain. The strategy
+    that succeeded is memoized by the page's layout fingerprint, so later pages
+    with the same layout go straight to it and only fall back down the chain if
+    it finds nothing.
+
+    ``stats`` counts how often each strategy was used, plus "memo_hits" and
+    "memo_misses" for pages whose layout had a remembered strategy.
+
+    With a ``snapshot_dir``, the raw HTML of pages no strategy can parse is
+    saved there once per layout (see save_snapshot).
+    """
+
+    def __init__(self, snapshot_dir=None):
+        """
+        Initialize the parser.
+
+        Args:
+            snapshot_dir (str, optional): Directory to save unparseable pages to
+        """
+        self.snapshot_dir = str(snapshot_dir) if snapshot_dir is not None else None
+        self._memo = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = Counter()
+
+    @property
+    def last_strategy(self):
+        """str: Strategy that matched the last page parsed by the calling thread."""
+        return getattr(self._local, "strategy", None)
+
+    def parse(self, soup, html=None):
+        """
+        Parse parcels from the HTML soup.
+
+        Args:
+            soup (BeautifulSoup): Parsed HTML
+            html (str, optional): Raw HTML of the page, saved as the snapshot if
+                nothing can be parsed. Defaults to the soup's markup.
+
+        Returns:
+            list: Extracted parcels with structured data
+        """
+        fingerprint = layout_fingerprint(soup)
+        remembered = self._memo.get(fingerprint)
+
+        strategies = STRATEGIES
+        if remembered is not None:
+            strategies = [s for s in STRATEGIES if s[0] == remembered]
+            strategies += [s for s in STRATEGIES if s[0] != remembered]
+
+        for name, strategy in strategies:
+            parcels = strategy(soup)
+            if parcels is not None:
+                self._record(fingerprint, remembered, name)
+                return parcels
+
+        self._record(fingerprint, remembered, None)
+        logger.debug("No parcel data could be found in any expected format")
+        if self.snapshot_dir is not None:
+            save_snapshot(self.snapshot_dir, fingerprint, html if html is not None else str(soup))
+        return []
+
+    def count_strategies(self, names):
+        """
+        Add strategy uses reported by other processes to the metrics.
+
+        Args:
+            names (iterable): Strategy names (None for pages nothing matched)
+        """
+        with self._lock:
+            self.stats.update(name or NO_STRATEGY for name in names)
+
+    def _record(self, fingerprint, remembered, name):
+        """Update the memo and the strategy metrics after a parse."""
+        self._local.strategy = name
+        with self._lock:
+            self.stats[name or NO_STRATEGY] += 1
+            if remembered is not None:
+                self.stats["memo_hits" if name == remembered else "memo_misses"] += 1
+            if name is not None:
+                self._memo[fingerprint] = name
+
+        if name is not None:
+            logger.debug("Parsed page with the %s strategy", name)
+
+
+_default_parser = ParcelParser()
+
+
+def parse_parcels_from_sections(sections):
+    """
+    Parse parcels from container elements that each hold one parcel.
+
+    Args:
+        sections (list): List of container elements
+
+    Returns:
+        list: Extracted parcels
+    """
+    parcels = []
+
+    for section in sections:
+        parcel = {}
+
+        # Extract package code
+        package_code_div = section.find(string=lambda t: t and "Package Code:" in t)
+        if package_code_div:
+            package_code = package_code_div.strip()
+            package_code = package_code.replace("Package Code:", "").strip()
+            parcel["package_code"] = package_code
+
+        # Extract status - need to find the span after "Package Status:"
+        status_text = section.find(string=lambda t: t and "Package Status:" in t)
+        if status_text:
+            # Find the parent element containing "Package Status:"
+            parent = status_text.parent
+            # Look for the span that contains the actual status
+            status_span = parent.find("span")
+            if status_span:
+                status = status_span.get_text(strip=True)
+                parcel["status"] = status
+            else:
+                # Fallback to original approach
+                status = status_text.strip().replace("Package Status:", "").strip()
+                parcel["status"] = status
+
+        # Extract locker box and size
+        locker_box_div = section.find(string=lambda t: t and "Locker Box #:" in t)
+        if locker_box_div:
+            locker_text = locker_box_div.strip()
+            locker_text = locker_text.replace("Locker Box #:", "").strip()
+            size_match = re.search(r'\(([^)]+)\)', locker_text)
+            locker_number = locker_text.split("(")[0].strip() if "(" in locker_text else locker_text
+            parcel["locker_box"] = locker_number
+            if size_match:
+                parcel["size"] = size_match.group(1)
+
+        # Extract courier
+        courier_div = section.find(string=lambda t: t and "Courier:" in t)
+        if courier_div:
+            courier = courier_div.strip()
+            courier = courier.replace("Courier:", "").strip()
+            parcel["courier"] = courier
+
+        if parcel:  # Only add if we found any data
+            parcels.append(parcel)
+
+    logger.info("Found %s parcels", len(parcels))
+    return parcels
+
+
+def parse_parcels_from_table_rows(rows):
+    """
+    Parse parcels from table rows that match the current HTML structure.
+
+    Args:
+        rows (list): List of table row elements containing parcel data
+
+    Returns:
+        list: Extracted parcels
+    """
+    parcels = []
+
+    for row in rows:
+        parcel = parse_table_row(row)
+        if parcel:  # Only add if we found any data
+            parcels.append(parcel)
+
+    logger.info("Found %s parcels from table rows", len(parcels))
+    return parcels
+
+
+def parse_table_row(row):
+    """
+    Parse one parcel from a table row.
+
+    Args:
+        row (Tag): Table row element containing parcel data
+
+    Returns:
+        dict: Extracted fields, empty if the row holds no parcel data
+    """
+    parcel = {}
+
+    # Extract package code
+    package_code_text = row.find(string=lambda t: t and "Package Code:" in t)
+    if package_code_text:
+        package_code = package_code_text.strip().replace("Package Code:", "").strip()
+        parcel["package_code"] = package_code
+
+    # Extract package status - need to examine the structure more carefully
+    status_div = row.find(string=lambda t: t and "Package Status:" in t)
+    if status_div:
+        # Try to find the status in a span element within the same parent cell
+        parent_cell = status_div.find_parent("td")
+        if parent_cell:
+            status_span = parent_cell.find("span", id=lambda i: i and i.startswith("status-"))
+            if status_span:
+                status = status_span.get_text(strip=True)
+                parcel["status"] = status
+            else:
+                # Fallback: get text after "Package Status:" string
+                status_text = status_div.strip().replace("Package Status:", "").strip()
+                if status_text:
+                    parcel["status"] = status_text
+
+    # Extract locker information
+    locker_text = row.find(string=lambda t: t and "Locker Box #:" in t)
+    if locker_text:
+        locker_str = locker_text.strip().replace("Locker Box #:", "").strip()
+        # Check for size in parentheses
+        size_match = re.search(r'\(([^)]+)\)', locker_str)
+        if size_match:
+            parcel["size"] = size_match.group(1)
+            parcel["locker_box"] = locker_str.split("(")[0].strip()
+        else:
+            parcel["locker_box"] = locker_str
+
+    # Extract courier - traverse up to find containing element for more context
+    courier_text = row.find(string=lambda t: t and "Courier:" in t)
+    if courier_text:
+        # Look for the text immediately following the "Courier:" label
+        courier_parent = courier_text.find_parent()
+        if courier_parent:
+            # Get the full text and extract what comes after "Courier:"
+            full_text = courier_parent.get_text(strip=True)
+            courier_match = re.search(r'Courier:(.*?)(?:$|Tracking:|Locker)', full_text)
+            if courier_match:
+                courier = courier_match.group(1).strip()
+                parcel["courier"] = courier
+            else:
+                # Fallback to basic text extraction
+                courier = full_text.replace("Courier:", "").strip()
+                parcel["courier"] = courier
+
+    # Extract tracking number if available
+    tracking_text = row.find(string=lambda t: t and "Tracking:" in t)
+    if tracking_text:
+        tracking = tracking_text.strip().replace("Tracking:", "").strip()
+        parcel["tracking_number"] = tracking
+
+    # Extract delivery and pickup dates from the parcel-activity cell
+    activity_cell = row.find("td", class_="parcel-activity")
+    if activity_cell:
+        activity_text = activity_cell.get_text()
+        delivery_match = re.search(r'Delivered:\s+(\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2}:\d{2}\s+[ap]m)', activity_text)
+        if delivery_match:
+            delivered = delivery_match.group(1)
+            parcel["delivery_date"] = _delivery_dates.parse(delivered) or delivered
+        pickup_match = re.search(r'Picked [Uu]p:\s+(\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2}:\d{2}\s+[ap]m)', activity_text)
+        if pickup_match:
+            picked_up = pickup_match.group(1)
+            parcel["pickup_date"] = _pickup_dates.parse(picked_up) or picked_up
+
+    return parcel
+
+
+def parse_parcels_from_code_elements(code_elements):
+    """
+    Parse parcels starting from package code elements and working outward.
+
+    Args:
+        code_elements (list): List of elements containing package codes
+
+    Returns:
+        list: Extracted parcels
+    """
+    parcels = []
+
+    for element in code_elements:
+        parcel = {}
+
+        # Get the package code
+        code_text = element.strip()
+        package_code = code_text.replace("Package Code:", "").strip()
+        parcel["package_code"] = package_code
+
+        # Try to find a common parent element that contains all parcel info
+        parent = element.parent
+        for _ in range(3):  # Try up to 3 levels up
+            if not parent:
+                break
+
+            # Look for other parcel attributes within this parent
+            for label, key in [
+                ("Package Status:", "status"),
+                ("Locker Box #:", "locker_box"),
+                ("Courier:", "courier")
+            ]:
+                status_element = parent.find(string=lambda t: t and label in t)
+                if status_element:
+                    value = status_element.strip().replace(label, "").strip()
+                    parcel[key] = value
+
+            # If we found a locker box, check for size in parentheses
+            if "locker_box" in parcel:
+                locker_text = parcel["locker_box"]
+                size_match = re.search(r'\(([^)]+)\)', locker_text)
+                if size_match:
+                    parcel["size"] = size_match.group(1)
+                    parcel["locker_box"] = locker_text.split("(")[0].strip()
+
+            parent = parent.parent
+
+        if parcel:  # Only add if we found any data
+            parcels.append(parcel)
+
+    logger.info("Found %s parcels from code elements", len(parcels))
+    return parcels
+
+
+class StreamingPageParser(HTMLParser):
+    """
+    Incremental parser for a history page that is still downloading.
+
+    Chunks of HTML are fed as they arrive. Every table row is buffered on its
+    own and parsed as soon as its ``</tr>`` arrives, so at most one chunk and
+    one row are held rather than the whole page and its DOM. Only the
+    pagination elements are kept until the end of the page.
+
+    Layouts without parcel table rows can't be parsed row by row. Until the
+    first parcel row arrives the page text is therefore kept, and a page that
+    turns out to have none is parsed as a whole by the ParcelParser.
+    """
+
+    # Elements kept whole for the pagination check: (tag, class)
+    PAGINATION_ELEMENTS = (
+        ("div", "dataTables_info"),
+        ("div", "dataTables_paginate"),
+        ("ul", "pagination"),
+    )
+
+    def __init__(self, current_page, parcel_parser=None, keep_html=False):
+        """
+        Initialize the parser.
+
+        Args:
+            current_page (int): Page number of the page
+            parcel_parser (ParcelParser, optional): Parser for pages without parcel
+                table rows. Defaults to the module-level parser.
+            keep_html (bool): Keep the whole page text (e.g. to archive it)
+        """
+        super().__init__(convert_charrefs=False)
+        self.current_page = current_page
+        self.parcel_parser = parcel_parser or _default_parser
+        self.keep_html = keep_html
+        self.login_page = False
+        self.row_count = 0
+
+        self._chunks = []
+        self._captures = []
+        self._fragments = []
+        self._ready = []
+
+    @property
+    def html(self):
+        """str: The page text, if it was kept (see keep_html)."""
+        return "".join(self._chunks) if self._chunks is not None else None
+
+    def parse_chunk(self, chunk):
+        """
+        Feed the next chunk of the page.
+
+        Args:
+            chunk (str): HTML text
+
+        Returns:
+            list: Parcels whose rows were completed by this chunk
+        """
+        if self._chunks is not None:
+            self._chunks.append(chunk)
+        self.feed(chunk)
+        parcels, self._ready = self._ready, []
+        return parcels
+
+    def finish(self):
+        """
+        Finish the page.
+
+        Returns:
+            tuple: (parcels, has_next, total, strategy) like parse_page, where
+                parcels are those not yet returned by parse_chunk
+        """
+        self.close()
+        parcels, self._ready = self._ready, []
+
+        if self.row_count:
+            self.parcel_parser.count_strategies(["table_rows"])
+            soup = BeautifulSoup("".join(self._fragments), "html.parser")
+            return parcels, has_next_page(soup, self.current_page), total_entries(soup), "table_rows"
+
+        html = self.html
+        soup = BeautifulSoup(html, "html.parser")
+        parcels = self.parcel_parser.parse(soup, html)
+        return (
+            parcels,
+            has_next_page(soup, self.current_page),
+            total_entries(soup),
+            self.parcel_parser.last_strategy,
+        )
+
+    def _append(self, text):
+        for capture in self._captures:
+            capture[2].append(text)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        self._check_login(tag, attrs)
+
+        for capture in self._captures:
+            if capture[0] == tag:
+                capture[1] += 1
+        self._append(self.get_starttag_text())
+
+        classes = (attrs.get("class") or "").split()
+        if tag == "tr" and not any(capture[0] == "tr" for capture in self._captures):
+            self._captures.append(["tr", 1, [self.get_starttag_text()]])
+        elif any(tag == t and c in classes for t, c in self.PAGINATION_ELEMENTS):
+            self._captures.append([tag, 1, [self.get_starttag_text()]])
+
+    def handle_startendtag(self, tag, attrs):
+        self._check_login(tag, dict(attrs))
+        self._append(self.get_starttag_text())
+
+    def _check_login(self, tag, attrs):
+        """Flag the login form or a password field, like is_login_page."""
+        if (tag == "form" and "login" in (attrs.get("id"), attrs.get("name"))) or (
+            tag == "input" and (attrs.get("type") or "").lower() == "password"
+        ):
+            self.login_page = True
+
+    def handle_endtag(self, tag):
+        self._append(f"</{tag}>")
+        for capture in list(self._captures):
+            if capture[0] != tag:
+                continue
+            capture[1] -= 1
+            if capture[1] == 0:
+                self._captures.remove(capture)
+                self._complete("".join(capture[2]), tag)
+
+    def handle_data(self, data):
+        self._append(data)
+
+    def handle_entityref(self, name):
+        self._append(f"&{name};")
+
+    def handle_charref(self, name):
+        self._append(f"&#{name};")
+
+    def _complete(self, html, tag):
+        """Handle a completed row or pagination element."""
+        if tag != "tr":
+            self._fragments.append(html)
+            return
+        if "Package Code:" not in html:
+            return
+
+        row = BeautifulSoup(f"<table>{html}</table>", "html.parser").tr
+        parcel = parse_table_row(row)
+        if parcel:
+            self._ready.append(parcel)
+        self.row_count += 1
+        if not self.keep_html:
+            # The page has parcel rows, so it won't need the whole-page fallback
+            self._chunks = None
@@ -0,0 +1,195 @@
+"""
+Lightweight profiler for the client and CLI.
+
+Phases (login, each page's network/parse/pagination check, export) are timed
+with wall time, CPU time and tracemalloc peak memory. Optionally a sampling
+thread records call stacks, prefixed with the active phase, in the collapsed
+format read by flamegraph tools (``flamegraph.pl``, speedscope, inferno).
+"""
+
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+
+class PhaseRecord:
+    """Measurements of one profiled phase."""
+
+    def __init__(self, name, thread_name):
+        self.name = name
+        self.thread_name = thread_name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.start_memory = 0
+        self.peak_traced = 0
+
+    @property
+    def peak_memory(self):
+        """int: Peak traced memory above the phase's starting point, in bytes."""
+        return max(0, self.peak_traced - self.start_memory)
+
+
+class Profiler:
+    """
+    Collects per-phase timings and, optionally, sampled call stacks.
+
+    Phases can be nested; a nested phase is reported as "outer > inner". Peak
+    memory is the highest traced allocation above the phase's starting point.
+    It is only tracked per phase on Python 3.9+ (tracemalloc.reset_peak) and is
+    approximate when phases overlap in several threads.
+    """
+
+    def __init__(self, collapsed_path=None, sample_interval=0.001, trace_memory=True):
+        """
+        Initialize the profiler.
+
+        Args:
+            collapsed_path (str, optional): Write sampled stacks in collapsed
+                format to this file when profiling stops
+            sample_interval (float): Seconds between stack samples
+            trace_memory (bool): Track peak memory with tracemalloc
+        """
+        self.collapsed_path = collapsed_path
+        self.sample_interval = sample_interval
+        self.trace_memory = trace_memory
+        self.phases = []
+        self.samples = Counter()
+        self._local = threading.local()
+        self._active = {}
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._stop = threading.Event()
+        self._started_tracemalloc = False
+
+    def start(self):
+        """Start profiling."""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if self.collapsed_path:
+            self._stop.clear()
+            self._sampler = threading.Thread(
+                target=self._sample, name="parcelpending-profiler", daemon=True
+            )
+            self._sampler.start()
+
+    def stop(self):
+        """Stop profiling and write the collapsed stacks if requested."""
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+            self.write_collapsed(self.collapsed_path)
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time a named phase.
+
+        Args:
+            name (str): Phase name, e.g. "login" or "page 3 parse"
+        """
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        thread = threading.current_thread()
+        record = PhaseRecord(" > ".join([r.name for r in stack] + [name]), thread.name)
+        with self._lock:
+            self.phases.append(record)
+        stack.append(record)
+        self._active[thread.ident] = record.name
+
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            record.start_memory, peak = tracemalloc.get_traced_memory()
+            record.peak_traced = record.start_memory
+            if len(stack) > 1:
+                # Keep the outer phase's peak before resetting it for this phase
+                stack[-2].peak_traced = max(stack[-2].peak_traced, peak)
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield record
+        finally:
+            record.wall = time.perf_counter() - wall_start
+            record.cpu = time.thread_time() - cpu_start
+            if tracing:
+                record.peak_traced = max(record.peak_traced, tracemalloc.get_traced_memory()[1])
+
+            stack.pop()
+            if stack:
+                stack[-1].peak_traced = max(stack[-1].peak_traced, record.peak_traced)
+                self._active[thread.ident] = stack[-1].name
+            else:
+                self._active.pop(thread.ident, None)
+
+    def _sample(self):
+        """Sampling loop: record the stack of every other thread."""
+        own_ident = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.sample_interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+                    frame = frame.f_back
+                frames.reverse()
+
+                prefix = [names.get(ident, str(ident))]
+                phase = self._active.get(ident)
+                if phase:
+                    prefix.extend(phase.split(" > "))
+                self.samples[";".join(prefix + frames)] += 1
+
+    def write_collapsed(self, path):
+        """
+        Write sampled stacks in collapsed ("stack;frames count") format.
+
+        Args:
+            path (str): Destination file
+        """
+        with open(path, "w", encoding="utf-8") as collapsed_file:
+            for stack, count in sorted(self.samples.items()):
+                collapsed_file.write(f"{stack} {count}\n")
+
+    def report(self):
+        """
+        Format the per-phase breakdown as a table.
+
+        Returns:
+            str: The report
+        """
+        width = max([len(record.name) for record in self.phases] + [len("Phase")])
+        lines = [
+            f"{'Phase':<{width}}  {'Wall ms':>10}  {'CPU ms':>10}  {'Peak KiB':>10}",
+            "-" * (width + 36),
+        ]
+        for record in self.phases:
+            lines.append(
+                f"{record.name:<{width}}  {record.wall * 1000:>10.1f}  "
+                f"{record.cpu * 1000:>10.1f}  {record.peak_memory / 1024:>10.1f}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,694 @@
+"""
+Local SQLite store for persisted parcel history.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from .exceptions import ParcelPendingError
+from .utils import json_default, parse_timestamp, restore_dates, to_datetime
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parcels (
+    account TEXT NOT NULL DEFAULT '',
+    package_code TEXT NOT NULL,
+    status TEXT,
+    status_key TEXT,
+    courier TEXT,
+    courier_key TEXT,
+    locker_box TEXT,
+    size TEXT,
+    tracking_number TEXT,
+    delivered_at TEXT,
+    picked_up_at TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (account, package_code)
+);
+CREATE INDEX IF NOT EXISTS idx_parcels_delivered ON parcels (account, delivered_at);
+CREATE INDEX IF NOT EXISTS idx_parcels_courier ON parcels (account, courier_key, delivered_at);
+CREATE INDEX IF NOT EXISTS idx_parcels_status ON parcels (account, status_key, delivered_at);
+CREATE INDEX IF NOT EXISTS idx_parcels_locker ON parcels (account, locker_box, delivered_at);
+"""
+
+
+def _aggregate_sql(row, sign):
+    """
+    Statements adding (sign "+") or removing (sign "-") a parcels row to or from
+    the aggregate tables, for use in triggers with row being NEW or OLD.
+
+    Missing aggregate rows are created with NOT EXISTS rather than INSERT OR
+    IGNORE: inside a trigger, the outer INSERT OR REPLACE's conflict resolution
+    would override the IGNORE and reset the row. Every statement only touches
+    the row's own aggregate keys, so maintenance costs the same however many
+    aggregate rows an account has.
+    """
+    courier = f"COALESCE({row}.courier, '')"
+    size = f"COALESCE({row}.size, '')"
+    active = f"{row}.status_key IS NOT NULL AND {row}.status_key != 'picked up'"
+    dwell = (
+        f"{row}.delivered_at IS NOT NULL AND {row}.picked_up_at IS NOT NULL "
+        f"AND {row}.picked_up_at >= {row}.delivered_at"
+    )
+    seconds = (
+        f"CAST(round((julianday({row}.picked_up_at) - julianday({row}.delivered_at)) * 86400) "
+        f"AS INTEGER)"
+    )
+    return f"""
+    INSERT INTO agg_courier_daily (account, courier, day, parcels)
+        SELECT {row}.account, {courier}, date({row}.delivered_at), 0
+        WHERE {row}.delivered_at IS NOT NULL AND NOT EXISTS (
+            SELECT 1 FROM agg_courier_daily WHERE account = {row}.account
+            AND courier = {courier} AND day = date({row}.delivered_at)
+        );
+    UPDATE agg_courier_daily SET parcels = parcels {sign} 1
+        WHERE {row}.delivered_at IS NOT NULL AND account = {row}.account
+        AND courier = {courier} AND day = date({row}.delivered_at);
+    INSERT INTO agg_active_sizes (account, size, parcels)
+        SELECT {row}.account, {size}, 0 WHERE {active} AND NOT EXISTS (
+            SELECT 1 FROM agg_active_sizes WHERE account = {row}.account AND size = {size}
+        );
+    UPDATE agg_active_sizes SET parcels = parcels {sign} 1
+        WHERE {active} AND account = {row}.account AND size = {size};
+    INSERT INTO agg_dwell (account, parcels, seconds)
+        SELECT {row}.account, 0, 0 WHERE {dwell} AND NOT EXISTS (
+            SELECT 1 FROM agg_dwell WHERE account = {row}.account
+        );
+    UPDATE agg_dwell SET parcels = parcels {sign} 1, seconds = seconds {sign} {seconds}
+        WHERE {dwell} AND account = {row}.account;
+    DELETE FROM agg_courier_daily
+        WHERE {row}.delivered_at IS NOT NULL AND account = {row}.account
+        AND courier = {courier} AND day = date({row}.delivered_at) AND parcels = 0;
+    DELETE FROM agg_active_sizes
+        WHERE {active} AND account = {row}.account AND size = {size} AND parcels = 0;
+    DELETE FROM agg_dwell WHERE {dwell} AND account = {row}.account AND parcels = 0;
+"""
+
+
+# Aggregates kept up to date by triggers on every insert, update and delete
+_AGGREGATES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS agg_courier_daily (
+    account TEXT NOT NULL,
+    courier TEXT NOT NULL,
+    day TEXT NOT NULL,
+    parcels INTEGER NOT NULL,
+    PRIMARY KEY (account, courier, day)
+);
+CREATE TABLE IF NOT EXISTS agg_active_sizes (
+    account TEXT NOT NULL,
+    size TEXT NOT NULL,
+    parcels INTEGER NOT NULL,
+    PRIMARY KEY (account, size)
+);
+CREATE TABLE IF NOT EXISTS agg_dwell (
+    account TEXT NOT NULL PRIMARY KEY,
+    parcels INTEGER NOT NULL,
+    seconds INTEGER NOT NULL
+);
+"""
+
+# Triggers maintaining the aggregates, by name. Stores whose triggers differ
+# (created by an older version) get them replaced when opened.
+_AGGREGATE_TRIGGERS = {
+    "parcels_aggregate_insert": f"""CREATE TRIGGER parcels_aggregate_insert
+AFTER INSERT ON parcels BEGIN
+{_aggregate_sql("NEW", "+")}
+END""",
+    "parcels_aggregate_delete": f"""CREATE TRIGGER parcels_aggregate_delete
+AFTER DELETE ON parcels BEGIN
+{_aggregate_sql("OLD", "-")}
+END""",
+    "parcels_aggregate_update": f"""CREATE TRIGGER parcels_aggregate_update
+AFTER UPDATE ON parcels BEGIN
+{_aggregate_sql("OLD", "-")}
+{_aggregate_sql("NEW", "+")}
+END""",
+}
+
+# Recomputes the aggregate tables from scratch
+_REBUILD_AGGREGATES = """
+DELETE FROM agg_courier_daily;
+DELETE FROM agg_active_sizes;
+DELETE FROM agg_dwell;
+INSERT INTO agg_courier_daily (account, courier, day, parcels)
+    SELECT account, COALESCE(courier, ''), date(delivered_at), COUNT(*) FROM parcels
+    WHERE delivered_at IS NOT NULL GROUP BY 1, 2, 3;
+INSERT INTO agg_active_sizes (account, size, parcels)
+    SELECT account, COALESCE(size, ''), COUNT(*) FROM parcels
+    WHERE status_key IS NOT NULL AND status_key != 'picked up' GROUP BY 1, 2;
+INSERT INTO agg_dwell (account, parcels, seconds)
+    SELECT account, COUNT(*),
+        SUM(CAST(round((julianday(picked_up_at) - julianday(delivered_at)) * 86400) AS INTEGER))
+    FROM parcels
+    WHERE delivered_at IS NOT NULL AND picked_up_at IS NOT NULL AND picked_up_at >= delivered_at
+    GROUP BY 1;
+"""
+
+AGGREGATE_TABLES = ("agg_courier_daily", "agg_active_sizes", "agg_dwell")
+
+# Index of the substrings of the searchable parcel fields
+_SEARCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_grams (
+    account TEXT NOT NULL,
+    gram TEXT NOT NULL,
+    package_code TEXT NOT NULL,
+    PRIMARY KEY (account, gram, package_code)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_search_grams_parcel ON search_grams (account, package_code);
+"""
+
+# Parcel fields search() matches fragments against
+SEARCH_FIELDS = ("tracking_number", "package_code", "order_number")
+
+# Length of the indexed n-grams
+GRAM_SIZE = 3
+
+# SQLite limits the number of parameters of a statement
+_MAX_PARAMS = 500
+
+
+def _search_values(parcel):
+    """Get the lower-cased searchable values of a parcel."""
+    values = []
+    for field in SEARCH_FIELDS:
+        value = parcel.get(field)
+        if value:
+            values.append(str(value).strip().lower())
+    return values
+
+
+def search_grams(parcel):
+    """
+    Get the index entries of a parcel: every substring of GRAM_SIZE characters of
+    its searchable fields, plus their shorter tails.
+
+    Every occurrence of a fragment then starts some entry, so fragments shorter
+    than GRAM_SIZE are found by prefix and longer ones by all of their n-grams.
+
+    Args:
+        parcel (dict): Parcel dictionary
+
+    Returns:
+        set: The parcel's n-grams
+    """
+    grams = set()
+    for value in _search_values(parcel):
+        grams.update(value[i:i + GRAM_SIZE] for i in range(len(value)))
+    return grams
+
+
+# Columns that query() results can be sorted by
+SORT_COLUMNS = {
+    "delivery_date": "delivered_at",
+    "package_code": "package_code",
+    "courier": "courier_key",
+    "status": "status_key",
+    "locker_box": "locker_box",
+    "size": "size",
+}
+
+
+class ParcelStore:
+    """
+    Persisted parcel history backed by an indexed SQLite database.
+
+    Parcels are keyed by package code, so saving the same parcel again updates
+    it in place (for example when its status changes from delivered to picked up).
+
+    A store can be shared between threads: they use one connection, serialized
+    by a lock, so in-memory stores work across threads too.
+
+    Per-courier daily counts, active parcels per locker size and dwell times are
+    kept in aggregate tables that triggers update on every write, so reading
+    them doesn't scan the history.
+    """
+
+    def __init__(self, path=":memory:", account="", timeout=5.0, wal=False):
+        """
+        Open (and create if needed) a parcel store.
+
+        Args:
+            path (str): Path to the SQLite database file, ":memory:" for a transient store
+            account (str): Account the stored parcels belong to, so several accounts
+                can share one database file
+            timeout (float): Seconds to wait for another connection's write lock
+                before failing with "database is locked"
+            wal (bool): Switch the database to write-ahead logging, so readers and a
+                writer in other processes don't block each other
+        """
+        self.path = str(path)
+        self.account = account or ""
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, timeout=timeout, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if wal:
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        # INSERT OR REPLACE only fires the delete triggers with recursive triggers on
+        self._conn.execute("PRAGMA recursive_triggers = ON")
+        self._conn.executescript(_SCHEMA)
+
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(parcels)")}
+        upgraded = "picked_up_at" not in columns
+        if upgraded:
+            with self._conn:
+                self._conn.execute("ALTER TABLE parcels ADD COLUMN picked_up_at TEXT")
+        self._conn.executescript(_AGGREGATES_SCHEMA)
+        self._install_triggers()
+        if upgraded:
+            logger.info("Building the aggregates of %s", self.path)
+            self.rebuild_aggregates()
+
+        indexed = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_grams'"
+        ).fetchone()
+        self._conn.executescript(_SEARCH_SCHEMA)
+        if not indexed:
+            self.rebuild_search_index()
+
+    def _install_triggers(self):
+        """Create the aggregate triggers, replacing outdated ones."""
+        installed = dict(
+            self._conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'")
+        )
+        outdated = [name for name, sql in _AGGREGATE_TRIGGERS.items() if installed.get(name) != sql]
+        if not outdated:
+            return
+        with self._conn:
+            # Swap them in one transaction, so no write is made without them
+            self._conn.execute("BEGIN IMMEDIATE")
+            for name in outdated:
+                self._conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+                self._conn.execute(_AGGREGATE_TRIGGERS[name])
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def _fetch(self, sql, params=()):
+        """Run a query under the connection lock and return all its rows."""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        rows = self._fetch("SELECT COUNT(*) FROM parcels WHERE account = ?", (self.account,))
+        return rows[0][0]
+
+    def save_parcels(self, parcels):
+        """
+        Insert or update parcels in the store.
+
+        Args:
+            parcels (list): List of parcel dictionaries as returned by the client
+
+        Returns:
+            int: Number of parcels written
+        """
+        rows = []
+        grams = []
+        for parcel in parcels:
+            package_code = parcel.get("package_code")
+            if not package_code:
+                logger.debug("Skipping parcel without package code: %s", parcel)
+                continue
+            rows.append(self._to_row(parcel))
+            grams.extend((self.account, gram, package_code) for gram in search_grams(parcel))
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM search_grams WHERE account = ? AND package_code = ?",
+                [(self.account, row[1]) for row in rows],
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO search_grams (account, gram, package_code) VALUES (?, ?, ?)",
+                grams,
+            )
+            self._conn.executemany(
+                """
+                INSERT OR REPLACE INTO parcels (
+                    account, package_code, status, status_key, courier, courier_key,
+                    locker_box, size, tracking_number, delivered_at, picked_up_at, data
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+
+        logger.debug("Saved %s parcels to %s", len(rows), self.path)
+        return len(rows)
+
+    def _to_row(self, parcel):
+        """Convert a parcel dictionary into a parcels table row."""
+        status = parcel.get("status")
+        courier = parcel.get("courier")
+        delivered_at = parse_timestamp(parcel.get("delivery_date"))
+        picked_up_at = parse_timestamp(parcel.get("pickup_date"))
+
+        return (
+            self.account,
+            parcel["package_code"],
+            status,
+            status.lower() if status else None,
+            courier,
+            courier.lower() if courier else None,
+            parcel.get("locker_box"),
+            parcel.get("size"),
+            parcel.get("tracking_number"),
+            delivered_at.isoformat(sep=" ") if delivered_at else None,
+            picked_up_at.isoformat(sep=" ") if picked_up_at else None,
+            json.dumps(parcel, default=json_default),
+        )
+
+    def query(
+        self,
+        start_date=None,
+        end_date=None,
+        courier=None,
+        status=None,
+        locker_box=None,
+        active=None,
+        order_by="delivery_date",
+        descending=True,
+        limit=None,
+        offset=0,
+    ):
+        """
+        Query stored parcels.
+
+        All filters are optional and are combined with AND. Date bounds are
+        inclusive and compared by day, like the parcel history page does.
+
+        Args:
+            start_date (str or datetime, optional): Earliest delivery date
+            end_date (str or datetime, optional): Latest delivery date
+            courier (str or list, optional): Courier name(s), matched case-insensitively
+            status (str or list, optional): Status value(s), matched case-insensitively
+            locker_box (str or list, optional): Locker box number(s)
+            active (bool, optional): True for parcels not picked up yet, False for picked up
+            order_by (str): Field to sort by, one of SORT_COLUMNS
+            descending (bool): Sort in descending order (newest first by default)
+            limit (int, optional): Maximum number of parcels to return
+            offset (int): Number of matching parcels to skip
+
+        Returns:
+            list: Matching parcels
+
+        Raises:
+            ParcelPendingError: If the sort field is unknown
+        """
+        if order_by not in SORT_COLUMNS:
+            raise ParcelPendingError(f"Cannot sort parcels by {order_by!r}")
+
+        clauses = ["account = ?"]
+        params = [self.account]
+
+        if start_date is not None:
+            clauses.append("delivered_at >= ?")
+            params.append(to_datetime(start_date).date().isoformat())
+        if end_date is not None:
+            clauses.append("delivered_at < ?")
+            params.append((to_datetime(end_date).date() + timedelta(days=1)).isoformat())
+
+        for column, values in (
+            ("courier_key", courier),
+            ("status_key", status),
+            ("locker_box", locker_box),
+        ):
+            if values is None:
+                continue
+            if isinstance(values, str):
+                values = [values]
+            if column != "locker_box":
+                values = [value.lower() for value in values]
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+
+        if active is True:
+            clauses.append("status_key IS NOT NULL AND status_key != 'picked up'")
+        elif active is False:
+            clauses.append("status_key = 'picked up'")
+
+        sql = (
+            f"SELECT data FROM parcels WHERE {' AND '.join(clauses)} "
+            f"ORDER BY {SORT_COLUMNS[order_by]} {'DESC' if descending else 'ASC'}, package_code"
+        )
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([-1 if limit is None else limit, offset])
+
+        return [restore_dates(json.loads(row["data"])) for row in self._fetch(sql, params)]
+
+    def couriers(self):
+        """
+        List the distinct couriers in the store.
+
+        Returns:
+            list: Courier names in lower case
+        """
+        rows = self._fetch(
+            "SELECT DISTINCT courier_key FROM parcels WHERE account = ? AND courier_key IS NOT NULL",
+            (self.account,),
+        )
+        return [row[0] for row in rows]
+
+    def get_active_parcels(self, days=30):
+        """
+        Get stored parcels that haven't been picked up yet.
+
+        Args:
+            days (int): Number of days to look back for active parcels
+
+        Returns:
+            list: Active parcels awaiting pickup
+        """
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
+        return self.query(start_date, end_date, active=True)
+
+    def get_parcels_by_courier(self, courier_name, days=30):
+        """
+        Get stored parcels delivered by a specific courier.
+
+        Like the online helper, the courier name matches as a case-insensitive
+        substring. Matching runs against the small set of distinct couriers so
+        the parcel lookup itself stays on the courier index.
+
+        Args:
+            courier_name (str): Name of the courier (e.g., "USPS", "Amazon")
+            days (int): Number of days to look back
+
+        Returns:
+            list: Parcels delivered by the specified courier
+        """
+        needle = courier_name.lower()
+        couriers = [courier for courier in self.couriers() if needle in courier]
+        if not couriers:
+            return []
+
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
+        return self.query(start_date, end_date, courier=couriers)
+
+    def get_parcel_by_code(self, package_code, days=90):
+        """
+        Find a stored parcel by its package code.
+
+        Args:
+            package_code (str): The package code to search for
+            days (int): Number of days to look back. Parcels without a known
+                delivery date are not excluded by the window.
+
+        Returns:
+            dict or None: The parcel if found, None otherwise
+        """
+        rows = self._fetch(
+            "SELECT delivered_at, data FROM parcels WHERE account = ? AND package_code = ?",
+            (self.account, package_code),
+        )
+        if not rows:
+            return None
+        row = rows[0]
+
+        if row["delivered_at"]:
+            cutoff = (datetime.now() - timedelta(days=days)).date().isoformat()
+            if row["delivered_at"] < cutoff:
+                return None
+
+        return restore_dates(json.loads(row["data"]))
+
+    def daily_counts_by_courier(self, start_date=None, end_date=None):
+        """
+        Count delivered parcels per courier per day, from the aggregates.
+
+        Args:
+            start_date (str or datetime, optional): Earliest delivery day
+            end_date (str or datetime, optional): Latest delivery day
+
+        Returns:
+            dict: Mapping of courier to a mapping of date to parcel count, like
+                analytics.daily_counts_by_courier ("" for unknown couriers)
+        """
+        clauses = ["account = ?"]
+        params = [self.account]
+        if start_date is not None:
+            clauses.append("day >= ?")
+            params.append(to_datetime(start_date).date().isoformat())
+        if end_date is not None:
+            clauses.append("day <= ?")
+            params.append(to_datetime(end_date).date().isoformat())
+
+        result = {}
+        rows = self._fetch(
+            f"SELECT courier, day, parcels FROM agg_courier_daily WHERE {' AND '.join(clauses)} "
+            "ORDER BY courier, day",
+            params,
+        )
+        for row in rows:
+            day = datetime.strptime(row["day"], "%Y-%m-%d").date()
+            result.setdefault(row["courier"], {})[day] = row["parcels"]
+        return result
+
+    def active_counts_by_size(self):
+        """
+        Count parcels not picked up yet per locker size, from the aggregates.
+
+        Returns:
+            dict: Mapping of size to parcel count ("" for unknown sizes)
+        """
+        rows = self._fetch(
+            "SELECT size, parcels FROM agg_active_sizes WHERE account = ? ORDER BY size",
+            (self.account,),
+        )
+        return {row["size"]: row["parcels"] for row in rows}
+
+    def average_dwell_time(self):
+        """
+        Average time picked-up parcels stayed in their locker, from the aggregates.
+
+        Returns:
+            float or None: Average dwell time in hours, None if no parcel has both
+                a delivery and a pickup time
+        """
+        rows = self._fetch(
+            "SELECT parcels, seconds FROM agg_dwell WHERE account = ?", (self.account,)
+        )
+        if not rows or not rows[0]["parcels"]:
+            return None
+        return rows[0]["seconds"] / rows[0]["parcels"] / 3600
+
+    def rebuild_aggregates(self):
+        """
+        Recompute the aggregate tables of every account from the stored parcels.
+
+        Pickup times missing from older stores are filled in from the parcel
+        data first. The aggregates are compared before and after, so this also
+        serves as a consistency check.
+
+        Returns:
+            list: Names of the aggregate tables that were out of date
+        """
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT rowid, data FROM parcels WHERE picked_up_at IS NULL"
+            ).fetchall()
+            updates = []
+            for row in rows:
+                picked_up_at = parse_timestamp(json.loads(row["data"]).get("pickup_date"))
+                if picked_up_at is not None:
+                    updates.append((picked_up_at.isoformat(sep=" "), row["rowid"]))
+            self._conn.executemany("UPDATE parcels SET picked_up_at = ? WHERE rowid = ?", updates)
+
+            before = {table: self._snapshot(table) for table in AGGREGATE_TABLES}
+            for statement in _REBUILD_AGGREGATES.split(";"):
+                if statement.strip():
+                    self._conn.execute(statement)
+            stale = [table for table in AGGREGATE_TABLES if self._snapshot(table) != before[table]]
+
+        if stale:
+            logger.warning("Rebuilt out-of-date aggregates in %s: %s", self.path, ", ".join(stale))
+        return stale
+
+    def _snapshot(self, table):
+        """Get the sorted rows of an aggregate table, for comparison."""
+        return sorted(tuple(row) for row in self._conn.execute(f"SELECT * FROM {table}"))
+
+    def search(self, fragment, limit=None):
+        """
+        Find parcels whose tracking number, package code or order number contains
+        a fragment, using the n-gram index instead of scanning the history.
+
+        Args:
+            fragment (str): Part of the number, e.g. its last digits. Case-insensitive.
+            limit (int, optional): Maximum number of parcels to return
+
+        Returns:
+            list: Matching parcels, newest delivery first
+        """
+        needle = fragment.strip().lower()
+        if not needle:
+            return []
+
+        if len(needle) < GRAM_SIZE:
+            rows = self._fetch(
+                "SELECT DISTINCT package_code FROM search_grams "
+                "WHERE account = ? AND gram >= ? AND gram < ?",
+                (self.account, needle, needle + "\U0010ffff"),
+            )
+        else:
+            grams = sorted({needle[i:i + GRAM_SIZE] for i in range(len(needle) - GRAM_SIZE + 1)})
+            rows = self._fetch(
+                f"SELECT package_code FROM search_grams "
+                f"WHERE account = ? AND gram IN ({', '.join('?' * len(grams))}) "
+                f"GROUP BY package_code HAVING COUNT(*) = ?",
+                [self.account, *grams, len(grams)],
+            )
+        candidates = [row[0] for row in rows]
+
+        # The n-grams may come from different fields or positions; check the candidates
+        matches = []
+        for start in range(0, len(candidates), _MAX_PARAMS):
+            chunk = candidates[start:start + _MAX_PARAMS]
+            rows = self._fetch(
+                f"SELECT delivered_at, data FROM parcels WHERE account = ? "
+                f"AND package_code IN ({', '.join('?' * len(chunk))})",
+                [self.account, *chunk],
+            )
+            for row in rows:
+                parcel = json.loads(row["data"])
+                if any(needle in value for value in _search_values(parcel)):
+                    matches.append((row["delivered_at"] or "", parcel))
+
+        matches.sort(key=lambda match: (match[0], match[1]["package_code"]), reverse=True)
+        if limit is not None:
+            matches = matches[:limit]
+        return [restore_dates(parcel) for _, parcel in matches]
+
+    def rebuild_search_index(self):
+        """
+        Rebuild the search index of every account from the stored parcels.
+
+        Returns:
+            int: Number of parcels indexed
+        """
+        with self._lock, self._conn:
+            rows = self._conn.execute("SELECT account, package_code, data FROM parcels").fetchall()
+            self._conn.execute("DELETE FROM search_grams")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO search_grams (account, gram, package_code) VALUES (?, ?, ?)",
+                (
+                    (row["account"], gram, row["package_code"])
+                    for row in rows
+                    for gram in search_grams(json.loads(row["data"]))
+                ),
+            )
+        logger.debug("Indexed %s parcels for search in %s", len(rows), self.path)
+        return len(rows)
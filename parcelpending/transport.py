@@ -0,0 +1,135 @@
+"""
+HTTP transports used by the ParcelPending client.
+
+The client only talks to the website through a transport, so the HTTP stack can be
+tuned or replaced (for example by an in-memory stand-in server in tests).
+"""
+
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 10
+
+
+def _accept_encoding():
+    """Build the Accept-Encoding header for the codecs urllib3 can decode here."""
+    encodings = ["gzip", "deflate"]
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+        except ImportError:
+            return ", ".join(encodings)
+    encodings.append("br")
+    return ", ".join(encodings)
+
+
+class Transport:
+    """
+    Interface for the HTTP stack used by ParcelPendingClient.
+
+    ``get`` and ``post`` take the same arguments as their ``requests`` counterparts and
+    return a response object providing ``text``, ``url``, ``status_code`` and
+    ``raise_for_status()``. For ``get(..., stream=True)`` the response may also provide
+    ``iter_content()``, ``encoding`` and ``close()`` to read the body in chunks. Network failures must be raised as
+    ``requests.exceptions.RequestException`` (or a subclass) so the client can report
+    them as connection errors.
+    """
+
+    def get(self, url, **kwargs):
+        """Send a GET request."""
+        raise NotImplementedError
+
+    def post(self, url, data=None, **kwargs):
+        """Send a POST request."""
+        raise NotImplementedError
+
+    def reset(self):
+        """Forget any authentication state (cookies) before a new login."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release any resources held by the transport."""
+
+
+class RequestsTransport(Transport):
+    """
+    Transport backed by ``requests`` sessions with tuned connection pools.
+
+    Safe for concurrent use: every thread gets its own session
+    (``requests.Session`` isn't thread-safe), while all sessions share one cookie
+    jar, so a single login authenticates every thread, and one mounted adapter,
+    whose thread-safe urllib3 pool keeps connections alive for every thread.
+    Short-lived threads (e.g. a prefetch thread) therefore reuse the connections
+    of earlier ones, and their sessions go away with them.
+
+    Connections are kept alive across logins: ``reset()`` only clears cookies
+    instead of discarding the pooled connections.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, max_retries=0, headers=None):
+        """
+        Initialize the transport.
+
+        Args:
+            pool_size (int): Maximum number of pooled connections per host, shared by
+                all threads. Should be at least the number of concurrent requests.
+            max_retries (int or urllib3.util.Retry): Retry policy for failed connections
+            headers (dict, optional): Extra default headers sent with every request
+        """
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.headers = dict(headers or {})
+        self.cookies = requests.cookies.RequestsCookieJar()
+
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=max_retries
+        )
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        """requests.Session: Session of the calling thread, created on first use."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._new_session()
+        return session
+
+    def _new_session(self):
+        """Create a session using the shared connection pool and cookie jar."""
+        session = requests.Session()
+        session.mount("https://", self._adapter)
+        session.mount("http://", self._adapter)
+
+        session.headers["Accept-Encoding"] = _accept_encoding()
+        session.headers["Connection"] = "keep-alive"
+        session.headers.update(self.headers)
+        session.cookies = self.cookies
+
+        # Only the thread-local slot refers to the session, so it is released when
+        # its thread exits
+        logger.debug("Created session for thread %s", threading.current_thread().name)
+        return session
+
+    def get(self, url, **kwargs):
+        """Send a GET request through the pooled session."""
+        return self.session.get(url, **kwargs)
+
+    def post(self, url, data=None, **kwargs):
+        """Send a POST request through the pooled session."""
+        return self.session.post(url, data=data, **kwargs)
+
+    def reset(self):
+        """Clear the shared cookies while keeping pooled connections alive."""
+        self.cookies.clear()
+
+    def close(self):
+        """Close the pooled connections and forget every thread's session."""
+        self._adapter.close()
+        self._local = threading.local()
@@ -2,8 +2,169 @@
 Utility functions for the ParcelPending API wrapper.
 """
 
+import re
 from datetime import datetime
 
+# Parcel fields holding timestamps
+PARCEL_DATE_FIELDS = ("delivery_date", "pickup_date")
+
+# ParcelPending seems to use 20 entries per page
+ENTRIES_PER_PAGE = 20
+
+
+class DateShape:
+    """
+    One supported date format: a precompiled pattern and a builder for its groups.
+
+    Building the datetime from the regex groups directly avoids the cost of
+    ``datetime.strptime`` on every value.
+    """
+
+    def __init__(self, name, pattern, build):
+        """
+        Initialize a date shape.
+
+        Args:
+            name (str): Human-readable format, e.g. "%Y-%m-%d"
+            pattern (str): Regular expression matching the whole value
+            build (callable): Builds a datetime from the match groups, raising
+                ValueError if they don't form a valid date
+        """
+        self.name = name
+        self.regex = re.compile(pattern, re.IGNORECASE)
+        self.build = build
+
+    def parse(self, text):
+        """Parse text in this shape, or return None if it doesn't match."""
+        match = self.regex.fullmatch(text)
+        if match is None:
+            return None
+        try:
+            return self.build(match.groups())
+        except ValueError:
+            return None
+
+    def __repr__(self):
+        return f"DateShape({self.name!r})"
+
+
+def _slash_date(groups):
+    # Month first, like the website; day first if that isn't a valid date
+    first, second, year = int(groups[0]), int(groups[1]), int(groups[2])
+    try:
+        return datetime(year, first, second)
+    except ValueError:
+        return datetime(year, second, first)
+
+
+def _site_timestamp(groups):
+    hour = int(groups[3])
+    if not 1 <= hour <= 12:
+        raise ValueError(f"Hour out of range: {hour}")
+    if groups[6].lower() == "pm":
+        hour = hour % 12 + 12
+    else:
+        hour = hour % 12
+    return datetime(
+        int(groups[2]), int(groups[0]), int(groups[1]), hour, int(groups[4]), int(groups[5])
+    )
+
+
+# Date arguments, in the order they were historically tried
+DATE_SHAPES = (
+    DateShape(
+        "%Y-%m-%d",
+        r"(\d{4})-(\d{1,2})-(\d{1,2})",
+        lambda g: datetime(int(g[0]), int(g[1]), int(g[2])),
+    ),
+    DateShape("%m/%d/%Y or %d/%m/%Y", r"(\d{1,2})/(\d{1,2})/(\d{4})", _slash_date),
+    DateShape(
+        "%d-%m-%Y",
+        r"(\d{1,2})-(\d{1,2})-(\d{4})",
+        lambda g: datetime(int(g[2]), int(g[1]), int(g[0])),
+    ),
+)
+
+# Parcel timestamps: as shown on the history page, or ISO as written by the client
+TIMESTAMP_SHAPES = (
+    DateShape(
+        "%m/%d/%Y %I:%M:%S %p",
+        r"(\d{1,2})/(\d{1,2})/(\d{4})\s+(\d{1,2}):(\d{2}):(\d{2})\s+([ap]m)",
+        _site_timestamp,
+    ),
+    DateShape(
+        "ISO 8601",
+        r"(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d{6})?)",
+        lambda g: datetime.fromisoformat(g[0]),
+    ),
+)
+
+
+class DateParser:
+    """
+    Parses a column of date strings, inferring their format once.
+
+    The first value is matched against every shape; the shape that matches is
+    then tried first for the following values, and the others only when it
+    misses. Parsed values are memoized, since a column repeats the same dates.
+    """
+
+    def __init__(self, shapes=TIMESTAMP_SHAPES, cache_size=4096):
+        """
+        Initialize the parser.
+
+        Args:
+            shapes (tuple): DateShape objects to infer the format from
+            cache_size (int): Maximum number of memoized values
+        """
+        self.shapes = shapes
+        self.shape = None
+        self.cache_size = cache_size
+        self._cache = {}
+
+    def parse(self, value):
+        """
+        Parse a value of the column.
+
+        Args:
+            value (str or datetime): Value to parse. Datetimes are returned as is.
+
+        Returns:
+            datetime: Parsed datetime object, or None if the value is empty or malformed
+        """
+        if isinstance(value, datetime):
+            return value
+        if not value:
+            return None
+
+        parsed = self._cache.get(value)
+        if parsed is not None:
+            return parsed
+
+        text = value.strip()
+        inferred = self.shape
+        if inferred is not None:
+            parsed = inferred.parse(text)
+        if parsed is None:
+            for shape in self.shapes:
+                if shape is inferred:
+                    continue
+                parsed = shape.parse(text)
+                if parsed is not None:
+                    self.shape = shape
+                    break
+            else:
+                return None
+
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[value] = parsed
+        return parsed
+
+
+_date_parser = DateParser(DATE_SHAPES)
+_timestamp_parser = DateParser(TIMESTAMP_SHAPES)
+
 
 def parse_date(date_str):
     """
@@ -18,12 +179,75 @@ def parse_date(date_str):
     Raises:
         ValueError: If the date string cannot be parsed
     """
-    formats = ["%Y-%m-%d", "%m/%d/%Y", "%d-%m-%Y", "%d/%m/%Y"]
+    parsed = _date_parser.parse(date_str)
+    if parsed is None:
+        raise ValueError(f"Unable to parse date: {date_str}")
+    return parsed
 
-    for fmt in formats:
-        try:
-            return datetime.strptime(date_str, fmt)
-        except ValueError:
-            continue
 
-    raise ValueError(f"Unable to parse date: {date_str}")
+def parse_timestamp(timestamp_str):
+    """
+    Parse a ParcelPending activity timestamp (e.g. "06/01/2023 10:00:00 am").
+
+    ISO timestamps and datetimes (as stored in parsed parcels) are accepted too.
+
+    Args:
+        timestamp_str (str or datetime): Timestamp as shown on the parcel history page
+
+    Returns:
+        datetime: Parsed datetime object, or None if the value is empty or malformed
+    """
+    return _timestamp_parser.parse(timestamp_str)
+
+
+def to_datetime(value):
+    """
+    Convert a date argument (str or datetime) into a datetime.
+
+    Args:
+        value (str or datetime): Date to convert
+
+    Returns:
+        datetime: The converted value
+
+    Raises:
+        ValueError: If the date string cannot be parsed
+    """
+    if isinstance(value, datetime):
+        return value
+    return parse_date(value)
+
+
+def json_default(value):
+    """
+    Serialize the values ``json`` can't, for use as ``json.dump(..., default=json_default)``.
+
+    Args:
+        value: Value to serialize
+
+    Returns:
+        str: ISO 8601 representation of datetimes
+
+    Raises:
+        TypeError: If the value isn't serializable
+    """
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def restore_dates(parcel):
+    """
+    Turn the timestamp fields of a parcel loaded from JSON back into datetimes.
+
+    Args:
+        parcel (dict): Parcel dictionary, updated in place
+
+    Returns:
+        dict: The same parcel
+    """
+    for field in PARCEL_DATE_FIELDS:
+        value = parcel.get(field)
+        if isinstance(value, str):
+            parcel[field] = parse_timestamp(value) or value
+    return parcel
@@ -30,6 +30,9 @@ setup(
         "beautifulsoup4>=4.9.0",
     ],
     extras_require={
+        "analytics": [
+            "numpy>=1.21",
+        ],
         "dev": [
             "pytest>=7.3.1",
             "pytest-cov>=4.1.0",
@@ -0,0 +1,76 @@
+"""
+Tests for the analytics module.
+"""
+
+from datetime import date
+
+import pytest
+
+from parcelpending import analytics
+from parcelpending.analytics import ParcelColumns
+
+PARCELS = [
+    {
+        "package_code": "1",
+        "courier": "USPS",
+        "size": "Small",
+        "delivery_date": "06/01/2023 09:00:00 am",
+        "pickup_date": "06/01/2023 11:00:00 am",
+    },
+    {
+        "package_code": "2",
+        "courier": "Amazon",
+        "size": "Large",
+        "delivery_date": "06/01/2023 02:30:00 pm",
+        "pickup_date": "06/02/2023 02:30:00 pm",
+    },
+    {
+        "package_code": "3",
+        "courier": "USPS",
+        "size": "Small",
+        "delivery_date": "06/02/2023 09:15:00 am",
+    },
+    {"package_code": "4", "courier": "USPS"},
+]
+
+USE_NUMPY = [False]
+if analytics.np is not None:
+    USE_NUMPY.append(True)
+
+
+@pytest.mark.parametrize("use_numpy", USE_NUMPY)
+class TestAnalytics:
+    """Tests for the analytics functions, with and without NumPy."""
+
+    def test_volume_counts(self, use_numpy):
+        """Test daily, hourly and per-courier daily counts."""
+        columns = ParcelColumns.from_parcels(PARCELS, use_numpy=use_numpy)
+
+        assert len(columns) == 4
+        assert analytics.daily_counts(columns) == {date(2023, 6, 1): 2, date(2023, 6, 2): 1}
+
+        hourly = analytics.hourly_counts(columns)
+        assert len(hourly) == 24
+        assert hourly[9] == 2 and hourly[14] == 1 and sum(hourly) == 3
+
+        assert analytics.daily_counts_by_courier(columns) == {
+            "Amazon": {date(2023, 6, 1): 1},
+            "USPS": {date(2023, 6, 1): 1, date(2023, 6, 2): 1},
+        }
+
+    def test_distributions(self, use_numpy):
+        """Test per-courier and per-size distributions."""
+        columns = ParcelColumns.from_parcels(PARCELS, use_numpy=use_numpy)
+
+        assert analytics.courier_distribution(columns) == {"USPS": 3, "Amazon": 1}
+        assert analytics.size_distribution(columns) == {"Small": 2, "Large": 1, "": 1}
+
+    def test_dwell_time_percentiles(self, use_numpy):
+        """Test dwell-time percentiles in hours."""
+        columns = ParcelColumns.from_parcels(PARCELS, use_numpy=use_numpy)
+
+        result = analytics.dwell_time_percentiles(columns, percentiles=(0, 50, 100))
+        assert result == pytest.approx({0: 2.0, 50: 13.0, 100: 24.0})
+
+        empty = ParcelColumns.from_parcels(PARCELS[2:], use_numpy=use_numpy)
+        assert analytics.dwell_time_percentiles(empty) == {}
@@ -0,0 +1,54 @@
+"""
+Tests for the raw page archive.
+"""
+
+import pytest
+
+from parcelpending import PageArchive, ParcelPendingClient
+from parcelpending.exceptions import ParcelPendingError
+
+from .test_transport import HISTORY_HTML, FakeTransport
+
+PARAMS = {"parcel_delivery_date_start": "06/01/2023", "parcel_delivery_date_end": "06/30/2023"}
+
+
+class TestPageArchive:
+    """Tests for the PageArchive class."""
+
+    def test_record_and_lookup(self, tmp_path):
+        """Test records survive reopening and lookups return the latest copy."""
+        archive = PageArchive(tmp_path / "pages.pp", codec="gzip")
+        archive.record(PARAMS, 1, "<html>first</html>")
+        archive.record(dict(PARAMS, page=2), 2, "<html>second</html>")
+        archive.record(PARAMS, 1, "<html>first again</html>")
+
+        reopened = PageArchive(tmp_path / "pages.pp")
+        assert len(reopened) == 3
+        assert [page.page for page in reopened] == [1, 2, 1]
+        assert reopened.get(PARAMS, 1).html == "<html>first again</html>"
+        assert reopened.get(PARAMS, 2).params == PARAMS
+        assert reopened.get(PARAMS, 3) is None
+
+    def test_unknown_codec(self, tmp_path):
+        """Test that unknown codecs are rejected."""
+        with pytest.raises(ParcelPendingError):
+            PageArchive(tmp_path / "pages.pp", codec="lzma")
+
+    @pytest.mark.parametrize("workers", [None, 2])
+    def test_client_recording_and_reparse(self, tmp_path, workers):
+        """Test recording pages through the client and reparsing them."""
+        client = ParcelPendingClient(
+            "test@example.com",
+            "password123",
+            transport=FakeTransport(),
+            record_to=str(tmp_path / "pages.pp"),
+        )
+        client.login()
+        parcels = client.get_parcel_history("06/01/2023", "06/30/2023")
+
+        archive = PageArchive(tmp_path / "pages.pp")
+        assert archive.get(client.transport.requests[-1][2], 1).html == HISTORY_HTML
+
+        reparsed = list(archive.reparse(workers=workers, batch_size=1))
+        assert len(reparsed) == 1
+        assert reparsed[0][1] == parcels
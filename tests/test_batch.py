@@ -0,0 +1,59 @@
+"""
+Tests for batched history requests.
+"""
+
+from datetime import date, datetime
+
+from parcelpending import HistoryRequest, ParcelPendingClient
+from parcelpending.batch import plan_fetch_ranges
+
+PARCELS = [
+    {"package_code": "1", "courier": "USPS", "delivery_date": "06/28/2023 10:00:00 am"},
+    {"package_code": "2", "courier": "Amazon", "delivery_date": "06/10/2023 10:00:00 am"},
+    {"package_code": "3", "courier": "USPS", "delivery_date": "04/15/2023 10:00:00 am"},
+    {"package_code": "4", "courier": "USPS"},
+]
+
+
+class TestBatch:
+    """Tests for range planning and the batch API."""
+
+    def test_plan_fetch_ranges(self):
+        """Test that overlapping and adjacent windows are merged."""
+        requests = [
+            HistoryRequest("06/01/2023", "06/30/2023"),
+            HistoryRequest("06/24/2023", "06/30/2023"),
+            HistoryRequest("04/01/2023", "04/30/2023"),
+            HistoryRequest("05/01/2023", "05/10/2023"),
+            HistoryRequest(datetime(2023, 8, 1), datetime(2023, 8, 2)),
+        ]
+
+        assert plan_fetch_ranges(requests) == [
+            (date(2023, 4, 1), date(2023, 5, 10)),
+            (date(2023, 6, 1), date(2023, 6, 30)),
+            (date(2023, 8, 1), date(2023, 8, 2)),
+        ]
+
+    def test_get_parcel_histories(self, monkeypatch):
+        """Test one fetch per merged range, sliced back out per request."""
+        client = ParcelPendingClient()
+        calls = []
+
+        def fake_history(start_date, end_date, **kwargs):
+            calls.append((start_date, end_date))
+            return PARCELS
+
+        monkeypatch.setattr(client, "get_parcel_history", fake_history)
+
+        last_week, month, usps_quarter = client.get_parcel_histories(
+            [
+                ("06/24/2023", "06/30/2023"),
+                ("06/01/2023", "06/30/2023"),
+                ("04/01/2023", "06/30/2023", lambda p: p.get("courier") == "USPS"),
+            ]
+        )
+
+        assert calls == [("04/01/2023", "06/30/2023")]
+        assert [p["package_code"] for p in last_week] == ["1", "4"]
+        assert [p["package_code"] for p in month] == ["1", "2", "4"]
+        assert [p["package_code"] for p in usps_quarter] == ["1", "3", "4"]
@@ -0,0 +1,301 @@
+"""
+Tests for the command line interface.
+"""
+
+import io
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+import parcelpending
+from parcelpending import ParcelPendingClient, ParcelStore
+from parcelpending.cli import (
+    diff_histories,
+    list_parcels,
+    load_batch_specs,
+    parse_counts,
+    run_batch,
+    search_parcels,
+    summarize,
+)
+from parcelpending.output import create_writer, parse_columns
+
+
+def _timestamp(days_ago):
+    return (datetime.now() - timedelta(days=days_ago)).strftime("%m/%d/%Y %I:%M:%S %p").lower()
+
+
+class TestBatchCommand:
+    """Tests for the batch command."""
+
+    def test_run_batch_single_fetch(self, tmp_path, monkeypatch):
+        """Test that all queries are answered from one history fetch."""
+        store = ParcelStore()
+        store.save_parcels(
+            [
+                {"package_code": "1", "status": "Picked up", "courier": "USPS",
+                 "delivery_date": _timestamp(3)},
+                {"package_code": "2", "status": "Delivered", "courier": "Amazon",
+                 "delivery_date": _timestamp(20)},
+                {"package_code": "3", "status": "Delivered", "courier": "USPS",
+                 "delivery_date": _timestamp(60)},
+            ]
+        )
+        client = ParcelPendingClient(store=store, offline=True)
+
+        fetches = []
+        query = store.query
+        monkeypatch.setattr(store, "query", lambda *args: fetches.append(args) or query(*args))
+
+        batch_file = tmp_path / "queries.json"
+        output = tmp_path / "usps.json"
+        batch_file.write_text(
+            json.dumps(
+                [
+                    {"command": "list"},
+                    {"command": "list", "active": True},
+                    {"command": "export", "courier": "usps", "days": 90, "format": "json",
+                     "output": str(output)},
+                ]
+            )
+        )
+
+        results = run_batch(client, load_batch_specs(batch_file), days=30)
+
+        assert len(fetches) == 1
+        assert [[p["package_code"] for p in parcels] for parcels in results] == [
+            ["1", "2"],
+            ["2"],
+            ["1", "3"],
+        ]
+        assert [p["package_code"] for p in json.loads(output.read_text())] == ["1", "3"]
+
+    def test_batch_filter_expressions(self, tmp_path):
+        """Test filter expressions in batch specs, combined with the other options."""
+        store = ParcelStore()
+        store.save_parcels(
+            [
+                {"package_code": "1", "status": "Delivered", "courier": "USPS", "size": "L",
+                 "delivery_date": _timestamp(3)},
+                {"package_code": "2", "status": "Picked up", "courier": "USPS", "size": "L",
+                 "delivery_date": _timestamp(4)},
+                {"package_code": "3", "status": "Delivered", "courier": 'Say "Hi" Co', "size": "S",
+                 "delivery_date": _timestamp(5)},
+            ]
+        )
+        client = ParcelPendingClient(store=store, offline=True)
+
+        batch_file = tmp_path / "queries.json"
+        batch_file.write_text(
+            json.dumps(
+                [
+                    {"command": "list", "filter": "size = L", "active": True},
+                    {"command": "list", "courier": 'say "hi"'},
+                ]
+            )
+        )
+        results = run_batch(client, load_batch_specs(batch_file), days=30)
+
+        assert [[p["package_code"] for p in parcels] for parcels in results] == [["1"], ["3"]]
+
+        batch_file.write_text(json.dumps([{"command": "list", "filter": "weight > 3"}]))
+        with pytest.raises(ValueError):
+            load_batch_specs(batch_file)
+
+
+class TestDiffCommand:
+    """Tests for the diff command."""
+
+    def test_diff_exported_snapshots(self, tmp_path):
+        """Test diffing two JSON exports without connecting."""
+        client = ParcelPendingClient()
+        old = [
+            {"package_code": "1", "status": "Delivered", "courier": "USPS"},
+            {"package_code": "2", "status": "Delivered", "courier": "USPS"},
+        ]
+        new = [{"package_code": "1", "status": "Picked up", "courier": "USPS"}]
+        client.export_to_json(old, str(tmp_path / "old.json"))
+        client.export_to_json(new, str(tmp_path / "new.json"))
+
+        output = tmp_path / "changes.json"
+        diff_histories(
+            client, 30, str(tmp_path / "old.json"), str(tmp_path / "new.json"), str(output)
+        )
+
+        assert [(c["change"], c["package_code"]) for c in json.loads(output.read_text())] == [
+            ("status_changed", "1"),
+            ("removed", "2"),
+        ]
+
+
+class TestSummaryCommand:
+    """Tests for the summary command."""
+
+    def test_summary_counts(self, capsys):
+        """Test default and custom counts, printed as tab-separated lines."""
+        store = ParcelStore()
+        store.save_parcels(
+            [
+                {"package_code": "1", "status": "Picked up", "courier": "USPS",
+                 "delivery_date": _timestamp(3)},
+                {"package_code": "2", "status": "Delivered", "courier": "Amazon",
+                 "delivery_date": _timestamp(5)},
+            ]
+        )
+        client = ParcelPendingClient(store=store, offline=True)
+
+        assert summarize(client, 30) == {"total": 2, "active": 1, "picked_up": 1}
+        assert capsys.readouterr().out == "total\t2\nactive\t1\npicked_up\t1\n"
+
+        counts = parse_counts(["all", "usps=courier = usps"])
+        assert counts == {"all": None, "usps": "courier = usps"}
+        assert summarize(client, 30, counts) == {"all": 2, "usps": 1}
+
+        with pytest.raises(ValueError):
+            parse_counts(["bad=courier ="])
+
+
+class TestSearchCommand:
+    """Tests for the search command."""
+
+    def test_search_writes_matches(self):
+        """Test that partial numbers are looked up in the store."""
+        store = ParcelStore()
+        store.save_parcels(
+            [
+                {"package_code": "1", "tracking_number": "9400111899223344"},
+                {"package_code": "2", "tracking_number": "9400111899225566"},
+            ]
+        )
+        client = ParcelPendingClient(store=store, offline=True)
+        output = io.StringIO()
+
+        parcels = search_parcels(
+            client, "3344", writer=create_writer("tsv", output, ("package_code",))
+        )
+
+        assert [p["package_code"] for p in parcels] == ["1"]
+        assert output.getvalue() == "package_code\n1\n"
+
+
+class TestListOutput:
+    """Tests for the list command's output formats."""
+
+    PARCELS = [
+        {"package_code": "1", "status": "Delivered", "courier": "USPS",
+         "delivery_date": datetime(2023, 6, 1, 10, 0)},
+        {"package_code": "22", "status": "Picked\tup", "courier": "Amazon"},
+    ]
+
+    def test_formats(self):
+        """Test table, TSV and NDJSON output with column selection."""
+        columns = parse_columns("code, status,delivered")
+        assert columns == ("package_code", "status", "delivery_date")
+
+        stream = io.StringIO()
+        writer = create_writer("table", stream, columns)
+        writer.write(self.PARCELS[:1])
+        writer.write(self.PARCELS[1:])
+        writer.close()
+        assert stream.getvalue().splitlines() == [
+            "package_code  status     delivery_date",
+            "------------  ---------  -------------------",
+            "1             Delivered  2023-06-01 10:00:00",
+            "22            Picked\tup",
+        ]
+
+        stream = io.StringIO()
+        writer = create_writer("tsv", stream, columns)
+        writer.write(self.PARCELS)
+        assert stream.getvalue().splitlines() == [
+            "package_code\tstatus\tdelivery_date",
+            "1\tDelivered\t2023-06-01 10:00:00",
+            "22\tPicked up\t",
+        ]
+
+        stream = io.StringIO()
+        create_writer("ndjson", stream).write(self.PARCELS[:1])
+        assert json.loads(stream.getvalue()) == {
+            "package_code": "1",
+            "status": "Delivered",
+            "courier": "USPS",
+            "delivery_date": "2023-06-01T10:00:00",
+        }
+
+    def test_list_streams_to_writer(self):
+        """Test that list_parcels writes filtered parcels through the writer."""
+        store = ParcelStore()
+        store.save_parcels(
+            [
+                {"package_code": "1", "status": "Delivered", "courier": "USPS",
+                 "delivery_date": _timestamp(1)},
+                {"package_code": "2", "status": "Picked up", "courier": "USPS",
+                 "delivery_date": _timestamp(2)},
+            ]
+        )
+        client = ParcelPendingClient(store=store, offline=True)
+
+        stream = io.StringIO()
+        writer = create_writer("tsv", stream, ("package_code",))
+        parcels = list_parcels(client, 30, active_only=True, writer=writer)
+
+        assert [p["package_code"] for p in parcels] == ["1"]
+        assert stream.getvalue() == "package_code\n1\n"
+
+
+class TestStartup:
+    """Tests for the command line interface's import cost."""
+
+    @staticmethod
+    def _python(*args):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=root)
+        # Verbose import logging would mix "# destroy ..." lines into -X importtime output
+        env.pop("PYTHONVERBOSE", None)
+        return subprocess.run(
+            [sys.executable, *args], capture_output=True, text=True, env=env, check=True
+        )
+
+    def test_cli_import_skips_heavy_modules(self):
+        """Test that starting the CLI doesn't import the client or its dependencies."""
+        result = self._python(
+            "-c",
+            "import sys, parcelpending.cli; "
+            "print(sorted(m for m in ('requests', 'bs4', 'numpy', 'parcelpending.client') "
+            "if m in sys.modules))",
+        )
+        assert result.stdout.strip() == "[]"
+
+    def test_deadline_import_skips_parser(self):
+        """Test that the deadline helpers don't pull in the parser and bs4."""
+        result = self._python(
+            "-c",
+            "import sys, parcelpending.deadline; "
+            "print(sorted(m for m in ('bs4', 'parcelpending.parser') if m in sys.modules))",
+        )
+        assert result.stdout.strip() == "[]"
+
+    @pytest.mark.skipif(
+        "PARCELPENDING_IMPORT_BUDGET_US" not in os.environ,
+        reason="set PARCELPENDING_IMPORT_BUDGET_US to check the CLI import time",
+    )
+    def test_cli_import_time_budget(self):
+        """Test that importing the CLI entry point stays within a given time budget."""
+        result = self._python("-X", "importtime", "-c", "import parcelpending.cli")
+        cumulative = min(
+            int(line.split("|")[1])
+            for line in result.stderr.splitlines()
+            if line.startswith("import time:") and line.rstrip().endswith(" parcelpending.cli")
+        )
+        assert cumulative < int(os.environ["PARCELPENDING_IMPORT_BUDGET_US"])
+
+    def test_lazy_package_attributes(self):
+        """Test that public names are still importable from the package."""
+        assert parcelpending.ParcelPendingClient is ParcelPendingClient
+        assert "JobQueue" in dir(parcelpending)
+        with pytest.raises(AttributeError):
+            parcelpending.NoSuchName
@@ -3,14 +3,24 @@ Tests for the ParcelPending client.
 """
 
 from datetime import datetime
+import math
 import re
+import time
 
 import pytest
 import responses
 import requests
 
-from parcelpending import ParcelPendingClient
-from parcelpending.exceptions import AuthenticationError, ConnectionError
+from parcelpending import CancelHandle, HistoryCheckpoint, PageArchive, ParcelPendingClient
+from parcelpending.exceptions import (
+    AuthenticationError,
+    CancelledError,
+    ConnectionError,
+    ParcelPendingError,
+    TimeoutError,
+)
+
+from .test_transport import LOGIN_HTML
 
 
 class TestParcelPendingClient:
@@ -53,6 +63,18 @@ class TestParcelPendingClient:
         assert self.client.login() is True
         assert self.client.authenticated is True
 
+    @responses.activate
+    def test_login_debug_log_omits_password(self, caplog):
+        """Test that debug logging of the login form never includes the password."""
+        responses.add(responses.GET, self.login_url, body=LOGIN_HTML, status=200)
+        responses.add(responses.POST, self.login_url, body="<a href='/logout'>Sign Out</a>")
+
+        with caplog.at_level("DEBUG", logger="parcelpending.client"):
+            assert self.client.login() is True
+
+        assert "Prepared form data" in caplog.text
+        assert "password123" not in caplog.text
+
     @responses.activate
     def test_login_failure(self):
         """Test login failure with invalid credentials."""
@@ -391,3 +413,459 @@ class TestParcelPendingClient:
         assert len(data) == 2
         assert data[0]["package_code"] == "12345678"
         assert data[1]["courier"] == "Amazon"
+
+    def test_parse_table_rows_with_activity_dates(self):
+        """Test parsing the table layout including delivery and pickup times."""
+        from bs4 import BeautifulSoup
+
+        history_html = """
+        <html><table>
+            <tr>
+                <td>
+                    <div>Package Code: 12345678</div>
+                    <div>Package Status: <span id="status-1">Picked up</span></div>
+                    <div>Locker Box #: 42 (Medium)</div>
+                    <div>Courier: USPS</div>
+                    <div>Tracking: 9400111899223197428490</div>
+                </td>
+                <td class="parcel-activity">
+                    Delivered: 06/01/2023 10:00:00 am<br>
+                    Picked up: 06/02/2023 03:30:00 pm
+                </td>
+            </tr>
+        </table></html>
+        """
+        parcels = self.client._parse_parcels(BeautifulSoup(history_html, "html.parser"))
+
+        assert parcels == [
+            {
+                "package_code": "12345678",
+                "status": "Picked up",
+                "size": "Medium",
+                "locker_box": "42",
+                "courier": "USPS",
+                "tracking_number": "9400111899223197428490",
+                "delivery_date": datetime(2023, 6, 1, 10, 0),
+                "pickup_date": datetime(2023, 6, 2, 15, 30),
+            }
+        ]
+
+    def _mock_login(self):
+        """Register login page and login submission responses."""
+        login_html = """
+        <html>
+            <form method="POST" name="login" id="login">
+                <input type="hidden" name="token" value="abc123">
+                <input type="text" name="username">
+                <input type="password" name="password">
+            </form>
+        </html>
+        """
+        responses.add(
+            responses.GET, self.login_url, body=login_html, status=200, content_type="text/html"
+        )
+        responses.add(
+            responses.POST,
+            self.login_url,
+            body="<html><div>Welcome</div><a href='/logout'>Sign Out</a></html>",
+            status=200,
+            content_type="text/html",
+        )
+
+    @staticmethod
+    def _history_page(codes, total, first=1):
+        """Build a table-layout history page with DataTables paging info."""
+        rows = "".join(
+            f"<tr><td><div>Package Code: {code}</div>"
+            f"<div>Package Status: <span id='status-{code}'>Delivered</span></div>"
+            f"<div>Courier: USPS</div></td></tr>"
+            for code in codes
+        )
+        return (
+            f"<html><table>{rows}</table>"
+            f"<div class='dataTables_info'>"
+            f"Showing {first} to {first + len(codes) - 1} of {total} entries</div>"
+            f"<div class='dataTables_paginate'></div></html>"
+        )
+
+    def _history_pages(self, codes, page_size=20):
+        """Split parcels into history pages of page_size entries."""
+        return [
+            self._history_page(codes[i:i + page_size], len(codes), i + 1)
+            for i in range(0, len(codes), page_size)
+        ]
+
+    def _mock_history_pages(self, pages):
+        """Serve the given page bodies by their page query parameter."""
+
+        def callback(request):
+            page = int(request.params.get("page", 1))
+            return 200, {}, pages[page - 1]
+
+        responses.add_callback(
+            responses.GET, self.history_url, callback=callback, content_type="text/html"
+        )
+
+    @responses.activate
+    def test_get_parcel_history_with_parse_workers(self):
+        """Test process-pool parsing keeps results in page order."""
+        codes = [f"{n:08d}" for n in range(45)]
+        pages = self._history_pages(codes)
+        self._mock_login()
+        self._mock_history_pages(pages)
+
+        self.client.login()
+        parcels = self.client.get_parcel_history("06/01/2023", "06/30/2023", parse_workers=2)
+
+        assert [p["package_code"] for p in parcels] == codes
+        assert len(responses.calls) == 2 + 3
+
+        sequential = self.client.get_parcel_history("06/01/2023", "06/30/2023")
+        assert sequential == parcels
+
+    @responses.activate
+    @pytest.mark.parametrize("page_size", [10, 25])
+    def test_parse_workers_follow_page_size(self, page_size):
+        """Test process-pool parsing with pages of other than 20 entries."""
+        codes = [f"{n:08d}" for n in range(45)]
+        self._mock_login()
+        self._mock_history_pages(self._history_pages(codes, page_size))
+
+        self.client.login()
+        parcels = self.client.get_parcel_history("06/01/2023", "06/30/2023", parse_workers=2)
+
+        assert [p["package_code"] for p in parcels] == codes
+        assert len(responses.calls) == 2 + math.ceil(45 / page_size)
+
+    @responses.activate
+    def test_get_parcel_history_pipelined(self):
+        """Test pipelined fetching returns the same parcels and discards extra pages."""
+        codes = [f"{n:08d}" for n in range(45)]
+        pages = self._history_pages(codes)
+        pages.append(self._history_page(["99999999"], len(codes), len(codes) + 1))
+        self._mock_login()
+        self._mock_history_pages(pages)
+
+        self.client.login()
+        parcels = self.client.get_parcel_history("06/01/2023", "06/30/2023", pipeline=True)
+
+        assert [p["package_code"] for p in parcels] == codes
+
+    @responses.activate
+    def test_pipelined_recording_skips_discarded_pages(self, tmp_path):
+        """Test that speculatively fetched pages are not archived."""
+        codes = [f"{n:08d}" for n in range(25)]
+        pages = self._history_pages(codes)
+        pages.append(self._history_page(["99999999"], len(codes), len(codes) + 1))
+        self._mock_login()
+        self._mock_history_pages(pages)
+
+        client = ParcelPendingClient(
+            "test@example.com", "password123", record_to=str(tmp_path / "pages.pp")
+        )
+        parse = client._parse_parcels
+
+        def slow_parse(soup, html=None):
+            time.sleep(0.1)
+            return parse(soup, html)
+
+        client._parse_parcels = slow_parse
+        client.login()
+        client.get_parcel_history("06/01/2023", "06/30/2023", pipeline=True)
+
+        requested = [call.request.params.get("page", "1") for call in responses.calls[2:]]
+        assert requested == ["1", "2", "3"]
+        assert [page.page for page in PageArchive(tmp_path / "pages.pp")] == [1, 2]
+
+    @responses.activate
+    def test_resume_failed_history_fetch(self, tmp_path):
+        """Test that a failed fetch can be resumed from the failed page."""
+        codes = [f"{n:08d}" for n in range(45)]
+        pages = self._history_pages(codes)
+        requested = []
+        fail_pages = {2}
+
+        def callback(request):
+            page = int(request.params.get("page", 1))
+            requested.append(page)
+            if page in fail_pages:
+                fail_pages.discard(page)
+                raise requests.exceptions.ConnectionError("Connection reset")
+            return 200, {}, pages[page - 1]
+
+        self._mock_login()
+        responses.add_callback(
+            responses.GET, self.history_url, callback=callback, content_type="text/html"
+        )
+        self.client.login()
+
+        checkpoint_path = tmp_path / "history.checkpoint"
+        with pytest.raises(ConnectionError) as excinfo:
+            self.client.get_parcel_history(
+                "06/01/2023", "06/30/2023", checkpoint_path=checkpoint_path
+            )
+
+        token = excinfo.value.resume_token
+        assert token.next_page == 2
+        assert len(token.parcels) == 20
+        assert checkpoint_path.exists()
+
+        parcels = self.client.get_parcel_history(
+            "06/01/2023", "06/30/2023", resume=str(checkpoint_path)
+        )
+
+        assert [p["package_code"] for p in parcels] == codes
+        assert requested == [1, 2, 2, 3]
+        assert not checkpoint_path.exists()
+
+        with pytest.raises(ParcelPendingError):
+            self.client.get_parcel_history("07/01/2023", "07/30/2023", resume=token)
+
+    def test_checkpoint_appends_pages(self, tmp_path):
+        """Test that checkpoints append each page and survive a torn last line."""
+        path = tmp_path / "history.checkpoint"
+        checkpoint = HistoryCheckpoint({"start": "06/01/2023"}, path=path)
+        checkpoint.complete_page(1, [{"package_code": "1"}])
+        checkpoint.complete_page(2, [{"package_code": "2"}, {"package_code": "3"}])
+
+        assert len(path.read_text(encoding="utf-8").splitlines()) == 3
+        with open(path, "a", encoding="utf-8") as checkpoint_file:
+            checkpoint_file.write('{"page": 3, "parc')
+
+        loaded = HistoryCheckpoint.load(path)
+        assert loaded.next_page == 3
+        assert [p["package_code"] for p in loaded.parcels] == ["1", "2", "3"]
+
+        loaded.complete_page(3, [{"package_code": "4"}])
+        loaded.complete_page(4, [])
+        reloaded = HistoryCheckpoint.load(path)
+        assert reloaded.next_page == 5
+        assert [p["package_code"] for p in reloaded.parcels] == ["1", "2", "3", "4"]
+
+    @responses.activate
+    def test_get_parcel_history_with_filter(self):
+        """Test filter expressions are pushed down and applied to the results."""
+        pages = [self._history_page(["11111111", "22222222"], 2)]
+        self._mock_login()
+        self._mock_history_pages(pages)
+
+        self.client.login()
+        parcels = self.client.get_parcel_history(
+            "06/01/2023", "06/30/2023", filters="code = 22222222 and courier ~ usps"
+        )
+
+        assert [p["package_code"] for p in parcels] == ["22222222"]
+        assert responses.calls[-1].request.params["package_code"] == "22222222"
+
+    @responses.activate
+    def test_relogin_on_session_expiry(self):
+        """Test that an expired session mid-pagination is renewed and the page retried."""
+        codes = [f"{n:08d}" for n in range(45)]
+        pages = self._history_pages(codes)
+        requested = []
+        expire_pages = {2}
+
+        def callback(request):
+            page = int(request.params.get("page", 1))
+            requested.append(page)
+            if page in expire_pages:
+                expire_pages.discard(page)
+                return 302, {"Location": self.login_url}, ""
+            return 200, {}, pages[page - 1]
+
+        self._mock_login()
+        responses.add_callback(
+            responses.GET, self.history_url, callback=callback, content_type="text/html"
+        )
+        self.client.login()
+
+        parcels = self.client.get_parcel_history("06/01/2023", "06/30/2023")
+
+        assert [p["package_code"] for p in parcels] == codes
+        assert requested == [1, 2, 2, 3]
+        assert sum(call.request.method == "POST" for call in responses.calls) == 2
+
+    @responses.activate
+    def test_session_expiry_without_relogin(self):
+        """Test that a login page is reported instead of truncating the history."""
+        client = ParcelPendingClient("test@example.com", "password123", auto_relogin=False)
+        self._mock_login()
+        responses.add(responses.GET, self.history_url, body=LOGIN_HTML, status=200)
+        client.login()
+
+        with pytest.raises(AuthenticationError) as excinfo:
+            client.get_parcel_history("06/01/2023", "06/30/2023")
+
+        assert excinfo.value.resume_token.next_page == 1
+
+    @responses.activate
+    def test_get_parcel_history_streams_pages(self):
+        """Test that on_page receives each page's filtered parcels in order."""
+        codes = [f"{n:08d}" for n in range(45)]
+        pages = self._history_pages(codes)
+        self._mock_login()
+        self._mock_history_pages(pages)
+        self.client.login()
+
+        streamed = []
+        parcels = self.client.get_parcel_history(
+            "06/01/2023",
+            "06/30/2023",
+            filters="code !~ 0000000",
+            on_page=lambda page: streamed.append([p["package_code"] for p in page]),
+        )
+
+        assert streamed == [codes[10:20], codes[20:40], codes[40:]]
+        assert [p["package_code"] for p in parcels] == codes[10:]
+
+    @responses.activate
+    @pytest.mark.parametrize("expire", [False, True])
+    def test_get_parcel_history_streamed(self, expire):
+        """Test streamed parsing, including a session that expires mid-fetch."""
+        codes = [f"{n:08d}" for n in range(45)]
+        pages = self._history_pages(codes)
+        expire_pages = {2} if expire else set()
+
+        def callback(request):
+            page = int(request.params.get("page", 1))
+            if page in expire_pages:
+                expire_pages.discard(page)
+                return 200, {}, LOGIN_HTML
+            return 200, {}, pages[page - 1]
+
+        self._mock_login()
+        responses.add_callback(
+            responses.GET, self.history_url, callback=callback, content_type="text/html"
+        )
+        self.client.login()
+
+        parcels = self.client.get_parcel_history("06/01/2023", "06/30/2023", stream=True)
+
+        assert [p["package_code"] for p in parcels] == codes
+        assert self.client.parser.stats["table_rows"] == 3
+        logins = sum(call.request.method == "POST" for call in responses.calls)
+        assert logins == (2 if expire else 1)
+
+    @responses.activate
+    @pytest.mark.parametrize("partial", [False, True])
+    def test_get_parcel_history_timeout(self, partial):
+        """Test a timed out page raises with a resume token, or returns the pages so far."""
+        codes = [f"{n:08d}" for n in range(45)]
+        pages = self._history_pages(codes)
+
+        def callback(request):
+            page = int(request.params.get("page", 1))
+            if page == 2:
+                raise requests.exceptions.ReadTimeout("Read timed out")
+            return 200, {}, pages[page - 1]
+
+        client = ParcelPendingClient("test@example.com", "password123", timeout=5)
+        self._mock_login()
+        responses.add_callback(
+            responses.GET, self.history_url, callback=callback, content_type="text/html"
+        )
+        client.login()
+
+        if partial:
+            parcels = client.get_parcel_history("06/01/2023", "06/30/2023", partial=True)
+            assert [p["package_code"] for p in parcels] == codes[:20]
+        else:
+            with pytest.raises(TimeoutError) as excinfo:
+                client.get_parcel_history("06/01/2023", "06/30/2023")
+            assert excinfo.value.resume_token.next_page == 2
+        timeouts = [call.request.req_kwargs["timeout"] for call in responses.calls]
+        assert timeouts == [5, 5, (5, 5), (5, 5)]
+
+    @responses.activate
+    def test_get_parcel_history_deadline(self):
+        """Test the deadline is spread across the remaining pages as request timeouts."""
+        codes = [f"{n:08d}" for n in range(45)]
+        pages = self._history_pages(codes)
+        self._mock_login()
+        self._mock_history_pages(pages)
+        self.client.login()
+
+        parcels = self.client.get_parcel_history("06/01/2023", "06/30/2023", deadline=30)
+
+        assert [p["package_code"] for p in parcels] == codes
+        timeouts = [call.request.req_kwargs["timeout"] for call in responses.calls[2:]]
+        assert timeouts[0][0] == 10.0 and 29 < timeouts[0][1] <= 30
+        assert timeouts[1][0] == 10.0 and 14 < timeouts[1][1] <= 15
+        assert timeouts[2][0] == 10.0 and 28 < timeouts[2][1] <= 30
+
+        with pytest.raises(TimeoutError):
+            self.client.get_parcel_history("06/01/2023", "06/30/2023", deadline=0)
+
+    @responses.activate
+    def test_cancel_parcel_history(self):
+        """Test that a cancelled fetch stops before its next page."""
+        codes = [f"{n:08d}" for n in range(45)]
+        pages = self._history_pages(codes)
+        self._mock_login()
+        self._mock_history_pages(pages)
+        self.client.login()
+
+        handle = CancelHandle()
+        with pytest.raises(CancelledError) as excinfo:
+            self.client.get_parcel_history(
+                "06/01/2023", "06/30/2023", cancel=handle, on_page=lambda page: handle.cancel()
+            )
+
+        assert excinfo.value.resume_token.next_page == 2
+        assert len(responses.calls) == 2 + 1
+
+    @responses.activate
+    def test_count_parcels_reads_page_one(self):
+        """Test that counts the website can answer only download page 1."""
+        codes = [f"{n:08d}" for n in range(45)]
+        pages = self._history_pages(codes)
+
+        def callback(request):
+            code = request.params.get("package_code")
+            if code:
+                return 200, {}, self._history_page([code], 1)
+            return 200, {}, pages[int(request.params.get("page", 1)) - 1]
+
+        self._mock_login()
+        responses.add_callback(
+            responses.GET, self.history_url, callback=callback, content_type="text/html"
+        )
+        self.client.login()
+
+        assert self.client.count_parcels("06/01/2023", "06/30/2023") == 45
+        assert self.client.count_parcels("06/01/2023", "06/30/2023", "code = 00000003") == 1
+        assert len(responses.calls) == 2 + 2
+
+        counts = {"total": None, "code": "code = 00000003"}
+        summary = self.client.get_summary("06/01/2023", "06/30/2023", counts)
+
+        assert summary == {"total": 45, "code": 1}
+        assert len(responses.calls) == 2 + 2 + 2
+
+        counts.update({"active": "status = delivered", "usps": "courier ~ usps"})
+        summary = self.client.get_summary("06/01/2023", "06/30/2023", counts)
+
+        assert summary == {"total": 45, "code": 1, "active": 45, "usps": 45}
+        # The download the local counts need answers the others too
+        assert len(responses.calls) == 2 + 2 + 2 + 3
+
+    @responses.activate
+    def test_default_summary_reads_page_one(self):
+        """Test that the default summary reads only page 1 of two queries."""
+        codes = [f"{n:08d}" for n in range(45)]
+
+        def callback(request):
+            total = 30 if request.params.get("package_status") == "picked up" else 45
+            return 200, {}, self._history_page(codes[:20], total)
+
+        self._mock_login()
+        responses.add_callback(
+            responses.GET, self.history_url, callback=callback, content_type="text/html"
+        )
+        self.client.login()
+
+        summary = self.client.get_summary("06/01/2023", "06/30/2023")
+
+        assert summary == {"total": 45, "active": 15, "picked_up": 30}
+        assert len(responses.calls) == 2 + 2
+        assert all("page" not in call.request.params for call in responses.calls[2:])
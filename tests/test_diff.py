@@ -0,0 +1,70 @@
+"""
+Tests for snapshot diffing.
+"""
+
+from datetime import datetime, timedelta
+
+from parcelpending import ParcelChange, ParcelPendingClient, ParcelStore, diff_parcels
+from parcelpending.diff import NEW, REMOVED, STATUS_CHANGED
+
+YESTERDAY = [
+    {"package_code": "1", "status": "Delivered", "courier": "USPS"},
+    {"package_code": "2", "status": "Delivered", "courier": "Amazon"},
+    {"package_code": "3", "status": "Picked up", "courier": "FedEx"},
+]
+
+TODAY = [
+    {"package_code": "4", "status": "Delivered", "courier": "UPS"},
+    {"package_code": "1", "status": "Picked up", "courier": "USPS"},
+    {"package_code": "2", "status": "delivered", "courier": "Amazon"},
+    {"status": "No code"},
+]
+
+
+class TestDiff:
+    """Tests for diff_parcels and the client's store diff."""
+
+    def test_diff_parcels(self):
+        """Test new, status-changed and removed parcels, in that order."""
+        changes = list(diff_parcels(YESTERDAY, iter(TODAY)))
+
+        assert changes == [
+            ParcelChange(NEW, "4", new=TODAY[0]),
+            ParcelChange(STATUS_CHANGED, "1", old=YESTERDAY[0], new=TODAY[1]),
+            ParcelChange(REMOVED, "3", old=YESTERDAY[2]),
+        ]
+        assert (changes[1].old_status, changes[1].new_status) == ("Delivered", "Picked up")
+        assert changes[2].to_dict() == {
+            "change": REMOVED,
+            "package_code": "3",
+            "courier": "FedEx",
+            "old_status": "Picked up",
+            "new_status": None,
+        }
+
+    def test_identical_snapshots(self):
+        """Test that unchanged snapshots produce no changes."""
+        assert list(diff_parcels(YESTERDAY, YESTERDAY)) == []
+
+    def test_diff_with_store(self, monkeypatch):
+        """Test that the store snapshot is taken before the fetch updates it."""
+        delivered = datetime.now() - timedelta(days=1)
+        store = ParcelStore()
+        store.save_parcels([dict(parcel, delivery_date=delivered) for parcel in YESTERDAY])
+        client = ParcelPendingClient(store=store)
+
+        def fake_history(start_date, end_date, **kwargs):
+            parcels = [dict(parcel, delivery_date=delivered) for parcel in TODAY[:3]]
+            store.save_parcels(parcels)
+            return parcels
+
+        monkeypatch.setattr(client, "get_parcel_history", fake_history)
+
+        end = datetime.now()
+        changes = client.diff_with_store(end - timedelta(days=7), end)
+
+        assert [(change.kind, change.package_code) for change in changes] == [
+            (NEW, "4"),
+            (STATUS_CHANGED, "1"),
+            (REMOVED, "3"),
+        ]
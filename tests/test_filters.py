@@ -0,0 +1,118 @@
+"""
+Tests for parcel filter expressions.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from parcelpending import FilterError, ParcelFilter, compile_filter
+
+PARCELS = [
+    {"package_code": "1", "status": "Delivered", "courier": "USPS", "size": "L",
+     "locker_box": "42", "delivery_date": "06/28/2023 10:00:00 am"},
+    {"package_code": "2", "status": "Picked up", "courier": "Amazon", "size": "S",
+     "locker_box": "7", "delivery_date": "06/10/2023 10:00:00 am",
+     "pickup_date": datetime(2023, 6, 11, 9, 30)},
+    {"package_code": "3", "status": "Delivered", "courier": "FedEx Ground", "size": "M",
+     "tracking_number": "9400111899223197428490"},
+]
+
+
+def _codes(expression):
+    return [parcel["package_code"] for parcel in ParcelFilter(expression).apply(PARCELS)]
+
+
+class TestParcelFilter:
+    """Tests for the ParcelFilter class."""
+
+    @pytest.mark.parametrize(
+        "expression, codes",
+        [
+            ('status != "picked up"', ["1", "3"]),
+            ("courier in (usps, amazon)", ["1", "2"]),
+            ("courier not in (USPS, Amazon)", ["3"]),
+            ("courier ~ fedex", ["3"]),
+            ("courier !~ fedex", ["1", "2"]),
+            ("size = L or size = S and locker = 7", ["1", "2"]),
+            ("(size = L or size = S) and locker = 7", ["2"]),
+            ("not courier = USPS and status = delivered", ["3"]),
+            ("delivered >= 06/15/2023", ["1"]),
+            ("delivered < 2023-06-28", ["2"]),
+            ("picked_up <= 06/11/2023", ["2"]),
+            ("tracking ~ 8490", ["3"]),
+        ],
+    )
+    def test_matches(self, expression, codes):
+        """Test comparisons, boolean operators and precedence."""
+        assert _codes(expression) == codes
+
+    @pytest.mark.parametrize(
+        "expression",
+        [
+            "",
+            "weight = 3",
+            "courier usps",
+            "courier in (usps",
+            "courier = usps and",
+            "courier < usps",
+            "delivered > someday",
+            'status = "picked up',
+        ],
+    )
+    def test_invalid_expressions(self, expression):
+        """Test that invalid expressions raise FilterError."""
+        with pytest.raises(FilterError):
+            ParcelFilter(expression)
+
+    def test_server_params(self):
+        """Test that only equalities every match must satisfy are pushed down."""
+        assert ParcelFilter("code = 123 and courier = USPS").server_params == {
+            "package_code": "123"
+        }
+        assert ParcelFilter("tracking == 9400 and (order = 55 and size = L)").server_params == {
+            "tracking_number": "9400",
+            "order_number": "55",
+        }
+        assert ParcelFilter("code = 123 or code = 456").server_params == {}
+        assert ParcelFilter("not code = 123").server_params == {}
+        assert ParcelFilter("code = 123 and code = 456").server_params == {}
+
+    def test_status_and_pickup_date_server_params(self):
+        """Test that status equality and pickup date bounds are pushed down."""
+        parcel_filter = ParcelFilter('status = "picked up" and picked_up >= 06/01/2023')
+        assert parcel_filter.server_params == {
+            "package_status": "picked up",
+            "parcel_pickup_date_start": "06/01/2023",
+        }
+        assert parcel_filter.pushed_down
+
+        parcel_filter = ParcelFilter(
+            "pickup_date > 06/01/2023 and pickup_date < 06/30/2023 and pickup_date <= 06/15/2023"
+        )
+        assert parcel_filter.server_params == {
+            "parcel_pickup_date_start": "06/02/2023",
+            "parcel_pickup_date_end": "06/15/2023",
+        }
+        assert parcel_filter.pushed_down
+
+        assert ParcelFilter("delivered >= 06/01/2023").server_params == {}
+        assert not ParcelFilter("delivered >= 06/01/2023").pushed_down
+        assert not ParcelFilter('status != "picked up"').pushed_down
+        assert not ParcelFilter("status = delivered or pickup_date >= 06/01/2023").pushed_down
+
+    def test_pushed_down(self):
+        """Test detection of filters the website applies completely."""
+        assert ParcelFilter("code = 123").pushed_down
+        assert ParcelFilter("(tracking = 9400) and order = 55").pushed_down
+        assert not ParcelFilter("code = 123 and courier = USPS").pushed_down
+        assert not ParcelFilter("code = 123 or code = 456").pushed_down
+        assert not ParcelFilter("not code = 123").pushed_down
+        assert not ParcelFilter("code in (123)").pushed_down
+        assert not ParcelFilter("code = 123 and code = 456").pushed_down
+
+    def test_compile_filter(self):
+        """Test that compiled filters are passed through."""
+        parcel_filter = compile_filter("size = L")
+        assert compile_filter(parcel_filter) is parcel_filter
+        assert parcel_filter(PARCELS[0]) is True
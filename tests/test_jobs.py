@@ -0,0 +1,159 @@
+"""
+Tests for the shared job queue and its workers.
+"""
+
+import sqlite3
+import time
+
+from parcelpending import JobQueue, ParcelStore, Worker
+from parcelpending.exceptions import ConnectionError
+
+from .test_transport import FakeResponse, FakeTransport
+
+
+class FailingTransport(FakeTransport):
+    """FakeTransport whose history requests fail a number of times."""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def get(self, url, **kwargs):
+        if not url.endswith("/login") and self.failures:
+            self.failures -= 1
+            raise ConnectionError("Connection reset")
+        return super().get(url, **kwargs)
+
+
+class RejectingTransport(FakeTransport):
+    """FakeTransport that never accepts the login."""
+
+    def post(self, url, data=None, **kwargs):
+        self.requests.append(("POST", url, data))
+        return FakeResponse(url, "<html>Invalid username or password</html>")
+
+
+class TestJobQueue:
+    """Tests for JobQueue."""
+
+    def test_lease_is_exclusive(self, tmp_path):
+        """Test that workers sharing the queue file never lease the same job."""
+        path = tmp_path / "jobs.db"
+        with JobQueue(path) as first, JobQueue(path) as second:
+            job_id = first.enqueue("a@example.com", "2023-06-01", "2023-06-30")
+            assert first.enqueue("a@example.com", "06/01/2023", "06/30/2023") == job_id
+
+            job = first.lease("worker-1")
+            assert job.id == job_id and job.attempts == 1
+            assert second.lease("worker-2") is None
+
+            assert first.heartbeat(job)
+            assert first.complete(job)
+            assert second.counts() == {"pending": 0, "leased": 0, "done": 1, "failed": 0}
+
+    def test_expired_lease_is_taken_over(self, tmp_path):
+        """Test that a job whose worker stopped heartbeating is leased again."""
+        with JobQueue(tmp_path / "jobs.db", lease_seconds=0.05) as queue:
+            queue.enqueue("a@example.com", "2023-06-01", "2023-06-30")
+            stale = queue.lease("worker-1")
+            time.sleep(0.1)
+
+            job = queue.lease("worker-2")
+            assert job.id == stale.id and job.attempts == 2
+            assert not queue.heartbeat(stale)
+            assert not queue.complete(stale)
+            assert queue.complete(job)
+
+    def test_retry_with_backoff(self, tmp_path):
+        """Test that failed jobs are retried after a delay until out of attempts."""
+        with JobQueue(tmp_path / "jobs.db", max_attempts=2, retry_delay=0.05) as queue:
+            queue.enqueue("a@example.com", "2023-06-01", "2023-06-30")
+
+            assert queue.fail(queue.lease("worker"), "Connection reset")
+            assert queue.lease("worker") is None
+            time.sleep(0.1)
+
+            assert queue.fail(queue.lease("worker"), "Connection reset")
+            assert queue.lease("worker") is None
+            assert queue.counts()["failed"] == 1
+
+
+class TestWorker:
+    """Tests for Worker."""
+
+    def test_workers_fill_shared_store(self, tmp_path):
+        """Test that jobs of several accounts end up in the shared store."""
+        store_path = tmp_path / "parcels.db"
+        credentials = {"a@example.com": "secret", "b@example.com": "secret"}
+        with JobQueue(tmp_path / "jobs.db") as queue:
+            for account in ["a@example.com", "b@example.com", "c@example.com"]:
+                queue.enqueue(account, "2023-06-01", "2023-06-30")
+
+            worker = Worker(queue, store_path, credentials, transport=FakeTransport())
+            assert worker.run(idle_timeout=0) == 2
+            worker.close()
+
+            assert queue.counts() == {"pending": 0, "leased": 0, "done": 2, "failed": 1}
+
+        for account in credentials:
+            with ParcelStore(store_path, account=account) as store:
+                assert store.get_parcel_by_code("12345678")["courier"] == "USPS"
+
+    def test_failed_job_is_retried(self, tmp_path):
+        """Test that a job failing on a connection error succeeds on its retry."""
+        with JobQueue(tmp_path / "jobs.db", retry_delay=0) as queue:
+            queue.enqueue("a@example.com", "2023-06-01", "2023-06-30")
+
+            worker = Worker(
+                queue,
+                tmp_path / "parcels.db",
+                {"a@example.com": "secret"},
+                transport=FailingTransport(failures=1),
+            )
+            assert worker.run(idle_timeout=0) == 1
+            worker.close()
+
+            assert queue.counts()["done"] == 1
+
+    def test_store_error_fails_job(self, tmp_path, monkeypatch):
+        """Test that an error saving to the shared store fails the job, not the worker."""
+        save_parcels = ParcelStore.save_parcels
+        failures = [sqlite3.OperationalError("database is locked")]
+
+        def flaky_save(store, parcels):
+            if failures:
+                raise failures.pop()
+            return save_parcels(store, parcels)
+
+        monkeypatch.setattr(ParcelStore, "save_parcels", flaky_save)
+        with JobQueue(tmp_path / "jobs.db", retry_delay=0) as queue:
+            queue.enqueue("a@example.com", "2023-06-01", "2023-06-30")
+
+            worker = Worker(
+                queue,
+                tmp_path / "parcels.db",
+                {"a@example.com": "secret"},
+                transport=FakeTransport(),
+            )
+            assert worker.run(idle_timeout=0) == 1
+            worker.close()
+
+            assert queue.counts() == {"pending": 0, "leased": 0, "done": 1, "failed": 0}
+
+    def test_failed_login_closes_store(self, tmp_path, monkeypatch):
+        """Test that the store opened for a client is closed when its login fails."""
+        closed = []
+        close = ParcelStore.close
+        monkeypatch.setattr(ParcelStore, "close", lambda store: closed.append(close(store)))
+
+        with JobQueue(tmp_path / "jobs.db") as queue:
+            queue.enqueue("a@example.com", "2023-06-01", "2023-06-30")
+
+            worker = Worker(
+                queue,
+                tmp_path / "parcels.db",
+                {"a@example.com": "wrong"},
+                transport=RejectingTransport(),
+            )
+            assert worker.run(idle_timeout=0) == 0
+            assert len(closed) == 1
@@ -0,0 +1,147 @@
+"""
+Tests for the parcel history parser.
+"""
+
+from bs4 import BeautifulSoup
+
+from parcelpending.parser import (
+    ParcelParser,
+    StreamingPageParser,
+    is_login_page,
+    layout_fingerprint,
+    parse_page,
+)
+
+TABLE_PAGE = """
+<html><body><div id="content"><div id="results"><table>
+    <tr><td><div>Package Code: {code}</div><div>Courier: USPS</div></td></tr>
+</table></div></div></body></html>
+"""
+
+SECTION_PAGE = """
+<html><body><div id="content"><div id="results">
+    <div class="parcel-section"><div>Package Code: {code}</div></div>
+</div></div></body></html>
+"""
+
+
+def _soup(template, code):
+    return BeautifulSoup(template.format(code=code), "html.parser")
+
+
+class TestParcelParser:
+    """Tests for the ParcelParser strategy memo."""
+
+    def test_remembered_strategy(self):
+        """Test that the strategy is memoized per layout."""
+        parcel_parser = ParcelParser()
+
+        first = parcel_parser.parse(_soup(TABLE_PAGE, "1"))
+        second = parcel_parser.parse(_soup(TABLE_PAGE, "2"))
+
+        assert first[0]["package_code"] == "1"
+        assert second[0]["package_code"] == "2"
+        assert parcel_parser.last_strategy == "table_rows"
+        assert parcel_parser.stats["table_rows"] == 2
+        assert parcel_parser.stats["memo_hits"] == 1
+
+    def test_falls_back_on_miss(self):
+        """Test falling down the chain when the remembered strategy finds nothing."""
+        parcel_parser = ParcelParser()
+        assert layout_fingerprint(_soup(TABLE_PAGE, "1")) == layout_fingerprint(
+            _soup(SECTION_PAGE, "2")
+        )
+
+        parcel_parser.parse(_soup(TABLE_PAGE, "1"))
+        parcels = parcel_parser.parse(_soup(SECTION_PAGE, "2"))
+
+        assert parcels == [{"package_code": "2"}]
+        assert parcel_parser.last_strategy == "parcel_sections"
+        assert parcel_parser.stats["memo_misses"] == 1
+
+    def test_no_strategy(self):
+        """Test metrics for pages without any parcel data."""
+        parcel_parser = ParcelParser()
+
+        assert parcel_parser.parse(BeautifulSoup("<html></html>", "html.parser")) == []
+        assert parcel_parser.last_strategy is None
+        assert parcel_parser.stats["none"] == 1
+
+    def test_snapshot_saved_once(self, tmp_path):
+        """Test that unparseable pages are saved once per layout."""
+        parcel_parser = ParcelParser(snapshot_dir=tmp_path / "snapshots")
+        html = "<html><body><p>Maintenance</p></body></html>"
+
+        for _ in range(2):
+            parcel_parser.parse(BeautifulSoup(html, "html.parser"), html)
+        parcel_parser.parse(_soup(TABLE_PAGE, "1"))
+
+        snapshots = list((tmp_path / "snapshots").iterdir())
+        assert len(snapshots) == 1
+        assert snapshots[0].read_text(encoding="utf-8") == html
+
+    def test_snapshot_from_worker_process_parser(self, tmp_path):
+        """Test snapshots of pages parsed with the module-level parser."""
+        html = "<html><body><p>Maintenance</p></body></html>"
+
+        assert parse_page(html, 1, snapshot_dir=str(tmp_path))[0] == []
+        assert parse_page(html, 2, snapshot_dir=str(tmp_path))[3] is None
+        assert len(list(tmp_path.iterdir())) == 1
+
+
+STREAMED_PAGE = """
+<html><body><table>
+    <tr><td><div>Package Code: 11111111</div>
+        <div>Package Status: <span id="status-1">Delivered</span></div>
+        <div>Courier: UPS &amp; Co</div></td>
+        <td class="parcel-activity">Delivered: 06/01/2023 10:00:00 am<br></td></tr>
+    <tr><td><table><tr><td>nested</td></tr></table>
+        <div>Package Code: 22222222</div><div>Locker Box #: 42 (Large)</div></td></tr>
+</table>
+<div class="dataTables_info">Showing 1 to 20 of 45 entries</div>
+<div class="dataTables_paginate"><ul><li class="next"><a href="#">Next</a></li></ul></div>
+</body></html>
+"""
+
+
+def _stream(html, chunk_size, parcel_parser=None):
+    page_parser = StreamingPageParser(1, parcel_parser)
+    streamed = []
+    for start in range(0, len(html), chunk_size):
+        streamed.append(page_parser.parse_chunk(html[start:start + chunk_size]))
+    return streamed, page_parser.finish()
+
+
+class TestStreamingPageParser:
+    """Tests for incremental page parsing."""
+
+    def test_rows_emitted_as_they_complete(self):
+        """Test that rows are parsed as their end tags arrive, like the full parse."""
+        streamed, (rest, has_next, total, strategy) = _stream(STREAMED_PAGE, 11)
+
+        parcels = [parcel for chunk in streamed for parcel in chunk] + rest
+        assert (parcels, has_next, total, strategy) == parse_page(STREAMED_PAGE, 1, ParcelParser())
+        assert parcels[0]["courier"] == "UPS & Co"
+        # The first row is out before the second row has been fed
+        second_row = STREAMED_PAGE.index("22222222") // 11
+        assert any(streamed[:second_row])
+
+    def test_other_layouts_fall_back(self):
+        """Test that pages without parcel rows are parsed as a whole."""
+        parcel_parser = ParcelParser()
+        _, (parcels, has_next, total, strategy) = _stream(
+            SECTION_PAGE.format(code="3"), 5, parcel_parser
+        )
+
+        assert parcels == [{"package_code": "3"}]
+        assert strategy == "parcel_sections"
+        assert parcel_parser.stats["parcel_sections"] == 1
+
+    def test_self_closing_password_input_is_login_page(self):
+        """Test that a self-closing password field flags the login page."""
+        html = '<html><form action="/signin"><input type="password" name="password"/></form></html>'
+        page_parser = StreamingPageParser(1)
+        page_parser.parse_chunk(html)
+
+        assert page_parser.login_page
+        assert is_login_page(html)
@@ -0,0 +1,56 @@
+"""
+Tests for the profiling mode.
+"""
+
+import io
+import time
+
+from parcelpending import ParcelPendingClient
+from parcelpending.profiling import Profiler
+
+from .test_transport import FakeTransport
+
+
+class TestProfiling:
+    """Tests for the Profiler and the client profile() context manager."""
+
+    def test_nested_phases(self):
+        """Test nested phase names, timings and memory."""
+        with Profiler() as profiler:
+            with profiler.phase("outer"):
+                with profiler.phase("inner"):
+                    data = [0] * 100000
+                    time.sleep(0.01)
+                del data
+
+        outer, inner = profiler.phases
+        assert (outer.name, inner.name) == ("outer", "outer > inner")
+        assert outer.wall >= inner.wall >= 0.01
+        assert outer.peak_memory >= inner.peak_memory > 0
+        assert "outer > inner" in profiler.report()
+
+    def test_client_profile(self, tmp_path):
+        """Test the per-phase breakdown and collapsed stacks of a client run."""
+        client = ParcelPendingClient(
+            "test@example.com", "password123", transport=FakeTransport()
+        )
+        collapsed = tmp_path / "stacks.txt"
+        output = io.StringIO()
+
+        with client.profile(collapsed_path=str(collapsed), output=output) as profiler:
+            client.login()
+            client.get_parcel_history("06/01/2023", "06/30/2023")
+            client.export_to_json([{"package_code": "1"}], str(tmp_path / "out.json"))
+
+        assert [phase.name for phase in profiler.phases] == [
+            "login",
+            "page 1 network",
+            "page 1 parse",
+            "page 1 pagination",
+            "export",
+        ]
+        assert "page 1 parse" in output.getvalue()
+        for line in collapsed.read_text().splitlines():
+            stack, count = line.rsplit(" ", 1)
+            assert stack.startswith("MainThread") and int(count) > 0
+        assert client.profile_phase("idle") is not None
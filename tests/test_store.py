@@ -0,0 +1,219 @@
+"""
+Tests for the local parcel store.
+"""
+
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+
+from parcelpending import ParcelPendingClient, ParcelStore, analytics
+from parcelpending.exceptions import ParcelPendingError
+
+
+def _timestamp(days_ago):
+    return (datetime.now() - timedelta(days=days_ago)).strftime("%m/%d/%Y %I:%M:%S %p").lower()
+
+
+class TestParcelStore:
+    """Tests for the ParcelStore class."""
+
+    def setup_method(self):
+        self.parcels = [
+            {
+                "package_code": "12345678",
+                "status": "Picked up",
+                "locker_box": "42",
+                "size": "Medium",
+                "courier": "USPS",
+                "delivery_date": _timestamp(2),
+            },
+            {
+                "package_code": "87654321",
+                "status": "Ready for pickup",
+                "locker_box": "24",
+                "size": "Large",
+                "courier": "Amazon",
+                "delivery_date": _timestamp(1),
+            },
+            {
+                "package_code": "11223344",
+                "status": "Delivered",
+                "locker_box": "15",
+                "size": "Small",
+                "courier": "USPS Priority",
+                "delivery_date": _timestamp(45),
+            },
+        ]
+        self.store = ParcelStore()
+        self.store.save_parcels(self.parcels)
+
+    def teardown_method(self):
+        self.store.close()
+
+    def test_save_is_keyed_by_package_code(self):
+        """Saving a parcel again updates it in place."""
+        updated = dict(self.parcels[1], status="Picked up")
+        self.store.save_parcels([updated, {"status": "No code"}])
+
+        assert len(self.store) == 3
+        assert self.store.get_parcel_by_code("87654321")["status"] == "Picked up"
+
+    def test_timestamps_round_trip(self):
+        """Test that datetimes are stored and loaded back as datetimes."""
+        delivered = datetime(2023, 6, 1, 10, 0)
+        self.store.save_parcels([{"package_code": "99", "delivery_date": delivered}])
+
+        assert self.store.get_parcel_by_code("99", days=100000)["delivery_date"] == delivered
+        assert isinstance(self.store.get_parcel_by_code("12345678")["delivery_date"], datetime)
+
+    def test_query_filters_sorting_and_pagination(self):
+        """Test combined filters, ordering and limit/offset."""
+        parcels = self.store.query(courier=["usps", "usps priority"], order_by="delivery_date")
+        assert [p["package_code"] for p in parcels] == ["12345678", "11223344"]
+
+        parcels = self.store.query(order_by="locker_box", descending=False, limit=2, offset=1)
+        assert [p["locker_box"] for p in parcels] == ["24", "42"]
+
+        start = datetime.now() - timedelta(days=10)
+        parcels = self.store.query(start_date=start, status="picked up")
+        assert [p["package_code"] for p in parcels] == ["12345678"]
+
+        with pytest.raises(ParcelPendingError):
+            self.store.query(order_by="unknown")
+
+    def test_offline_helpers(self):
+        """Test the client helpers answered from the store."""
+        client = ParcelPendingClient(store=self.store, offline=True)
+
+        active = client.get_active_parcels(days=30)
+        assert [p["package_code"] for p in active] == ["87654321"]
+
+        usps = client.get_parcels_by_courier("usps", days=60)
+        assert {p["package_code"] for p in usps} == {"12345678", "11223344"}
+
+        assert client.get_parcel_by_code("11223344", days=30) is None
+        assert client.get_parcel_by_code("11223344", days=90)["courier"] == "USPS Priority"
+
+    def test_offline_requires_store(self):
+        """Test that offline mode cannot be enabled without a store."""
+        with pytest.raises(ParcelPendingError):
+            ParcelPendingClient(offline=True)
+
+    def test_shared_between_threads(self):
+        """Test that one store can be used from several threads."""
+        def save_and_count(number):
+            self.store.save_parcels([{"package_code": f"thread-{number}", "status": "Delivered"}])
+            return len(self.store.query())
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(save_and_count, range(8)))
+
+        assert len(self.store) == 3 + 8
+
+    def test_aggregates_follow_writes(self):
+        """Test that the aggregates match analytics over the history after every write."""
+
+        def check():
+            history = self.store.query()
+            assert self.store.daily_counts_by_courier() == analytics.daily_counts_by_courier(
+                history
+            )
+            active = [parcel for parcel in history if parcel["status"].lower() != "picked up"]
+            assert self.store.active_counts_by_size() == analytics.size_distribution(active)
+            dwell = analytics.dwell_times(history)
+            expected = sum(dwell) / len(dwell) if len(dwell) else None
+            assert self.store.average_dwell_time() == pytest.approx(expected)
+
+        check()
+        assert self.store.average_dwell_time() is None
+
+        delivered = datetime(2023, 6, 1, 10, 0)
+        picked_up = datetime.now().replace(microsecond=0)
+        self.store.save_parcels(
+            [
+                dict(self.parcels[1], status="Picked up", pickup_date=picked_up),
+                {"package_code": "1", "status": "Picked up", "courier": "UPS", "size": "Small",
+                 "delivery_date": delivered, "pickup_date": delivered + timedelta(hours=6)},
+            ]
+        )
+        check()
+        assert self.store.active_counts_by_size() == {"Small": 1}
+        assert self.store.daily_counts_by_courier("06/01/2023", "06/01/2023") == {
+            "UPS": {delivered.date(): 1}
+        }
+        assert self.store.rebuild_aggregates() == []
+
+        other = ParcelStore(self.store.path)
+        assert other.active_counts_by_size() == {}
+        self.store._conn.execute("DELETE FROM agg_active_sizes")
+        assert self.store.rebuild_aggregates() == ["agg_active_sizes"]
+        assert self.store.active_counts_by_size() == {"Small": 1}
+
+    def test_aggregates_built_for_older_stores(self, tmp_path):
+        """Test that opening a store from before the aggregates builds them."""
+        path = tmp_path / "parcels.db"
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE parcels (account TEXT NOT NULL DEFAULT '', package_code TEXT NOT NULL, "
+            "status TEXT, status_key TEXT, courier TEXT, courier_key TEXT, locker_box TEXT, "
+            "size TEXT, tracking_number TEXT, delivered_at TEXT, data TEXT NOT NULL, "
+            "PRIMARY KEY (account, package_code))"
+        )
+        conn.execute(
+            "INSERT INTO parcels VALUES ('', '1', 'Picked up', 'picked up', 'USPS', 'usps', '4', "
+            "'Small', NULL, '2023-06-01 10:00:00', ?)",
+            ('{"package_code": "1", "pickup_date": "2023-06-01T12:30:00"}',),
+        )
+        conn.commit()
+        conn.close()
+
+        with ParcelStore(path) as store:
+            assert store.daily_counts_by_courier() == {"USPS": {datetime(2023, 6, 1).date(): 1}}
+            assert store.average_dwell_time() == 2.5
+            assert store.search("1")[0]["package_code"] == "1"
+
+    def test_outdated_triggers_are_replaced(self, tmp_path):
+        """Test that triggers created by an older version are replaced on open."""
+        path = tmp_path / "parcels.db"
+        ParcelStore(path).close()
+        conn = sqlite3.connect(path)
+        conn.execute("DROP TRIGGER parcels_aggregate_insert")
+        conn.execute(
+            "CREATE TRIGGER parcels_aggregate_insert AFTER INSERT ON parcels BEGIN "
+            "DELETE FROM agg_dwell WHERE parcels = 0; END"
+        )
+        conn.commit()
+        conn.close()
+
+        with ParcelStore(path) as store:
+            store.save_parcels(
+                [{"package_code": "1", "courier": "USPS", "delivery_date": datetime(2023, 6, 1)}]
+            )
+            assert store.daily_counts_by_courier() == {"USPS": {datetime(2023, 6, 1).date(): 1}}
+            assert store.rebuild_aggregates() == []
+
+    def test_search(self):
+        """Test partial lookups of tracking, package and order numbers."""
+        self.store.save_parcels(
+            [
+                {"package_code": "55", "tracking_number": "9400111899223344", "order_number": "A-7",
+                 "delivery_date": _timestamp(5)},
+                {"package_code": "56", "tracking_number": "1Z999AA10123456784",
+                 "delivery_date": _timestamp(3)},
+            ]
+        )
+
+        assert [p["package_code"] for p in self.store.search("3344")] == ["55", "11223344"]
+        assert [p["package_code"] for p in self.store.search("1z999")] == ["56"]
+        assert [p["package_code"] for p in self.store.search("a-")] == ["55"]
+        assert [p["package_code"] for p in self.store.search("784")] == ["56"]
+        assert self.store.search("3344", limit=1)[0]["package_code"] == "55"
+        # The only n-gram of the fragment occurs in 56, but the fragment doesn't
+        assert self.store.search("9999") == []
+        assert self.store.search("") == []
+
+        self.store.save_parcels([{"package_code": "56", "tracking_number": "777"}])
+        assert self.store.search("1z999") == []
+        assert [p["package_code"] for p in self.store.search("77")] == ["56"]
@@ -0,0 +1,223 @@
+"""
+Tests for the HTTP transports.
+"""
+
+import gc
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from parcelpending import ParcelPendingClient, RequestsTransport, Transport
+
+LOGIN_HTML = """
+<html>
+    <form method="POST" name="login" id="login">
+        <input type="hidden" name="token" value="abc123">
+        <input type="text" name="username">
+        <input type="password" name="password">
+    </form>
+</html>
+"""
+
+HISTORY_HTML = """
+<html>
+    <div class="parcel-section">
+        <div>Package Code: 12345678</div>
+        <div>Package Status: Picked up</div>
+        <div>Courier: USPS</div>
+    </div>
+</html>
+"""
+
+
+class FakeResponse:
+    """Minimal response object served by FakeTransport."""
+
+    def __init__(self, url, text, status_code=200):
+        self.url = url
+        self.text = text
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} for {self.url}")
+
+
+class FakeTransport(Transport):
+    """In-memory stand-in for the ParcelPending website."""
+
+    def __init__(self):
+        self.requests = []
+        self.resets = 0
+
+    def get(self, url, **kwargs):
+        self.requests.append(("GET", url, kwargs.get("params")))
+        if url.endswith("/login"):
+            return FakeResponse(url, LOGIN_HTML)
+        return FakeResponse(url, HISTORY_HTML)
+
+    def post(self, url, data=None, **kwargs):
+        self.requests.append(("POST", url, data))
+        return FakeResponse(url, "<html><a href='/logout'>Sign Out</a></html>")
+
+    def reset(self):
+        self.resets += 1
+
+
+class ExpiringTransport(FakeTransport):
+    """FakeTransport whose session can expire, redirecting history requests to login."""
+
+    def __init__(self, login_delay=0):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.logged_in = False
+        self.login_delay = login_delay
+
+    def expire(self):
+        self.logged_in = False
+
+    def get(self, url, **kwargs):
+        if not url.endswith("/login") and not self.logged_in:
+            with self.lock:
+                self.requests.append(("GET", url, kwargs.get("params")))
+            return FakeResponse(url.rsplit("/", 1)[0] + "/login", LOGIN_HTML)
+        with self.lock:
+            return super().get(url, **kwargs)
+
+    def post(self, url, data=None, **kwargs):
+        time.sleep(self.login_delay)
+        with self.lock:
+            self.logged_in = True
+            return super().post(url, data, **kwargs)
+
+    def reset(self):
+        super().reset()
+        self.logged_in = False
+
+
+class TestTransport:
+    """Tests for the transport layer."""
+
+    def test_requests_transport_pool_and_headers(self):
+        """Test the mounted adapter and default headers."""
+        transport = RequestsTransport(pool_size=4, headers={"User-Agent": "parcelpending-tests"})
+
+        adapter = transport.session.get_adapter("https://my.parcelpending.com")
+        assert adapter._pool_maxsize == 4
+        assert "gzip" in transport.session.headers["Accept-Encoding"]
+        assert transport.session.headers["User-Agent"] == "parcelpending-tests"
+
+    def test_reset_keeps_session(self):
+        """Test that re-login state reset keeps the pooled session."""
+        transport = RequestsTransport()
+        session = transport.session
+        session.cookies.set("PHPSESSID", "abc")
+
+        transport.reset()
+
+        assert transport.session is session
+        assert len(session.cookies) == 0
+
+    def test_thread_sessions_share_cookies(self):
+        """Test that each thread gets its own session, all sharing one cookie jar."""
+        transport = RequestsTransport()
+        transport.session.cookies.set("PHPSESSID", "abc")
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            other = pool.submit(lambda: transport.session).result()
+
+        assert other is not transport.session
+        assert other.get_adapter("https://x") is transport.session.get_adapter("https://x")
+        assert other.cookies.get("PHPSESSID") == "abc"
+
+        transport.reset()
+        assert len(other.cookies) == 0
+
+        # The pool thread has exited, so nothing but this test keeps its session alive
+        other = weakref.ref(other)
+        gc.collect()
+        assert other() is None
+        transport.close()
+
+    def test_short_lived_threads_reuse_connections(self):
+        """Test that threads started per fetch reuse the pooled keep-alive connection."""
+        ports = set()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                ports.add(self.client_address[1])
+                self.send_response(200)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"ok")
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/"
+        transport = RequestsTransport()
+        try:
+            for _ in range(3):
+                with ThreadPoolExecutor(max_workers=1) as pool:
+                    assert pool.submit(transport.get, url).result().text == "ok"
+        finally:
+            transport.close()
+            server.shutdown()
+            server.server_close()
+
+        assert len(ports) == 1
+
+    def test_concurrent_logins_are_single_flight(self):
+        """Test that threads logging in at the same time share one login."""
+        transport = ExpiringTransport(login_delay=0.05)
+        client = ParcelPendingClient("test@example.com", "password123", transport=transport)
+        barrier = threading.Barrier(4)
+
+        def login():
+            barrier.wait()
+            return client.login()
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            assert list(pool.map(lambda _: login(), range(4))) == [True] * 4
+
+        assert sum(method == "POST" for method, _, _ in transport.requests) == 1
+
+    def test_custom_transport(self):
+        """Test the client running entirely against a stand-in transport."""
+        transport = FakeTransport()
+        client = ParcelPendingClient("test@example.com", "password123", transport=transport)
+
+        client.login()
+        parcels = client.get_parcel_history("06/01/2023", "06/30/2023")
+
+        assert client.session is None
+        assert transport.resets == 1
+        assert parcels == [{"package_code": "12345678", "status": "Picked up", "courier": "USPS"}]
+        assert transport.requests[1][2]["username"] == "test@example.com"
+
+    def test_single_flight_relogin(self):
+        """Test that concurrent requests hitting an expired session share one re-login."""
+        transport = ExpiringTransport()
+        client = ParcelPendingClient("test@example.com", "password123", transport=transport)
+        client.login()
+        transport.expire()
+
+        barrier = threading.Barrier(4)
+
+        def fetch(page):
+            barrier.wait()
+            return client._fetch_page({}, page)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            pages = list(pool.map(fetch, range(1, 5)))
+
+        assert pages == [HISTORY_HTML] * 4
+        assert sum(method == "POST" for method, _, _ in transport.requests) == 2
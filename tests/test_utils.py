@@ -0,0 +1,81 @@
+"""
+Tests for the utility functions.
+"""
+
+import json
+from datetime import datetime
+
+import pytest
+
+from parcelpending.utils import (
+    DATE_SHAPES,
+    DateParser,
+    json_default,
+    parse_date,
+    parse_timestamp,
+    restore_dates,
+)
+
+
+class TestDateParsing:
+    """Tests for date and timestamp parsing."""
+
+    @pytest.mark.parametrize(
+        "value, expected",
+        [
+            ("2023-06-01", datetime(2023, 6, 1)),
+            ("06/01/2023", datetime(2023, 6, 1)),
+            ("6/1/2023", datetime(2023, 6, 1)),
+            ("25/12/2023", datetime(2023, 12, 25)),
+            ("25-12-2023", datetime(2023, 12, 25)),
+        ],
+    )
+    def test_parse_date(self, value, expected):
+        """Test the supported date formats, month first when ambiguous."""
+        assert parse_date(value) == expected
+
+    @pytest.mark.parametrize("value", ["", "June 1st", "2023-13-01", "31/31/2023"])
+    def test_parse_date_invalid(self, value):
+        """Test that unparseable dates raise ValueError."""
+        with pytest.raises(ValueError):
+            parse_date(value)
+
+    @pytest.mark.parametrize(
+        "value, expected",
+        [
+            ("06/01/2023 10:00:00 am", datetime(2023, 6, 1, 10, 0)),
+            (" 06/01/2023 12:05:09 AM ", datetime(2023, 6, 1, 0, 5, 9)),
+            ("06/01/2023 12:30:00 pm", datetime(2023, 6, 1, 12, 30)),
+            ("06/01/2023 03:30:00 pm", datetime(2023, 6, 1, 15, 30)),
+            ("2023-06-01T15:30:00", datetime(2023, 6, 1, 15, 30)),
+            (datetime(2023, 6, 1), datetime(2023, 6, 1)),
+            ("06/01/2023 13:00:00 pm", None),
+            ("", None),
+            (None, None),
+        ],
+    )
+    def test_parse_timestamp(self, value, expected):
+        """Test site and ISO timestamps."""
+        assert parse_timestamp(value) == expected
+
+    def test_format_inferred_once(self):
+        """Test that the inferred shape is kept while it matches."""
+        parser = DateParser(DATE_SHAPES)
+
+        assert parser.parse("25/12/2023") == datetime(2023, 12, 25)
+        assert parser.shape is DATE_SHAPES[1]
+        # Still month first, like the formats were tried in order before
+        assert parser.parse("02/03/2023") == datetime(2023, 2, 3)
+        assert parser.parse("2023-02-03") == datetime(2023, 2, 3)
+        assert parser.shape is DATE_SHAPES[0]
+
+    def test_json_round_trip(self):
+        """Test serializing parcel timestamps and restoring them."""
+        parcel = {"package_code": "1", "delivery_date": datetime(2023, 6, 1, 10, 0)}
+
+        data = json.loads(json.dumps(parcel, default=json_default))
+        assert data["delivery_date"] == "2023-06-01T10:00:00"
+        assert restore_dates(data) == parcel
+
+        with pytest.raises(TypeError):
+            json_default(object())